@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+比较引擎性能基准 - 比较vectorized引擎与不同进程数量的parallel引擎的耗时
+
+用法: python benchmark_compare_engines.py [行数，默认1000000] [重复次数，默认3]
+
+每种配置重复运行，取最短耗时；parallel引擎的第一次运行包含创建进程池的开销，
+之后的运行复用同一个进程池。
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from routes.data import parallel_compare
+from routes.data.parallel_compare import compare_dataframes_parallel
+from routes.data.vectorized_compare import compare_dataframes_vectorized
+
+FIELD_MAPPING = {'id': 'id', 'name': 'name', 'city': 'city', 'amount': 'amount', 'score': 'score'}
+
+
+def make_frames(rows: int, seed: int = 0):
+    """生成源表和目标表：目标表缺少1%的记录，多出1%的记录，5%的记录有一个字段不同"""
+    rng = np.random.default_rng(seed)
+    source_df = pd.DataFrame({
+        'id': np.arange(rows),
+        'name': pd.Series([f'user_{i}' for i in range(rows)], dtype=object),
+        'city': rng.choice(['Beijing', 'Shanghai', 'Shenzhen', 'Hangzhou'], rows).astype(object),
+        'amount': rng.integers(0, 100000, rows),
+        'score': rng.random(rows),
+    })
+    target_df = source_df.sample(frac=0.99, random_state=seed).sort_values('id').reset_index(drop=True)
+    changed = rng.random(len(target_df)) < 0.05
+    target_df.loc[changed, 'amount'] += 1
+    extra = source_df.iloc[:rows // 100].assign(id=np.arange(rows, rows + rows // 100))
+    return source_df, pd.concat([target_df, extra], ignore_index=True)
+
+
+def best_time(run, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    source_df, target_df = make_frames(rows)
+    print(f"{rows} rows, {os.cpu_count()} CPUs, best of {repeat}")
+
+    baseline = best_time(lambda: compare_dataframes_vectorized(source_df, target_df, FIELD_MAPPING, ['id']),
+                         repeat)
+    print(f"vectorized            {baseline:8.2f}s")
+
+    original = parallel_compare.MIN_PARALLEL_ROWS
+    parallel_compare.MIN_PARALLEL_ROWS = 0
+    try:
+        for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+            elapsed = best_time(lambda: compare_dataframes_parallel(source_df, target_df, FIELD_MAPPING, ['id'],
+                                                                    max_workers=workers), repeat)
+            print(f"parallel ({workers:2d} workers) {elapsed:8.2f}s  speedup {baseline / elapsed:.2f}x")
+    finally:
+        parallel_compare.MIN_PARALLEL_ROWS = original
+        parallel_compare.shutdown_executor()
+
+
+if __name__ == '__main__':
+    main()
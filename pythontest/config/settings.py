@@ -2,6 +2,7 @@
 应用配置文件
 """
 import os
+import tempfile
 from typing import Dict, Any
 
 class Config:
@@ -25,6 +26,25 @@ class Config:
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     
+    # 数据比较配置
+    COMPARE_ENGINE = os.getenv('COMPARE_ENGINE', 'vectorized')
+    EXTERNAL_COMPARE_MEMORY_MB = int(os.getenv('EXTERNAL_COMPARE_MEMORY_MB', 512))
+    PREVIEW_SAMPLE_RATE = float(os.getenv('PREVIEW_SAMPLE_RATE', 0.01))
+    
+    # 解析后数据集缓存配置
+    DATASET_CACHE_ENABLED = os.getenv('DATASET_CACHE_ENABLED', '1') == '1'
+    DATASET_CACHE_DIR = os.getenv('DATASET_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'csv_compare_datasets'))
+    DATASET_CACHE_MAX_MB = int(os.getenv('DATASET_CACHE_MAX_MB', 10240))
+    
+    # 比较结果缓存配置
+    RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', '1') == '1'
+    RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'csv_compare_results'))
+    RESULT_CACHE_MAX_MB = int(os.getenv('RESULT_CACHE_MAX_MB', 1024))
+    RESULT_CACHE_TTL_SECONDS = int(os.getenv('RESULT_CACHE_TTL_SECONDS', 3600))
+    
+    # 增量比较快照目录
+    INCREMENTAL_SNAPSHOT_DIR = os.getenv('INCREMENTAL_SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'csv_compare_snapshots'))
+    
     # API配置
     API_TITLE = 'Python Test API'
     API_VERSION = '1.0.0'
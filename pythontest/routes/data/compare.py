@@ -1,17 +1,40 @@
 """
 CSV数据比较路由
 """
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, current_app
 import pandas as pd
 import io
 import logging
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Optional
 import tempfile
 import os
 from datetime import datetime
-import openpyxl.styles
+import numpy as np
 import csv
 import json
+import zipfile
+from routes.data.vectorized_compare import compare_dataframes_vectorized, join_key_codes, check_duplicate_order
+from routes.data.key_codes import shared_key_codes, duplicate_key_groups, occurrence_key_codes
+from routes.data.compare_rules import compile_compare_rules
+from routes.data.result_model import CompareResult, summarize_result
+from routes.data.external_compare import compare_csv_files_external, MemoryBudgetExceeded
+from routes.data.parallel_compare import compare_dataframes_parallel
+from routes.data.digest_compare import compare_dataframes_digest
+from routes.data.multiset_compare import compare_dataframes_multiset
+from routes.data.positional_compare import compare_dataframes_positional
+from routes.data.multi_target_compare import compare_dataframes_multi
+from routes.data.excel_report import (
+    ReportSheet, SHEET_MAX_ROWS, WORKBOOK_MAX_ROWS, plan_report, write_excel_report, write_report_archive
+)
+from routes.data.report_export import (
+    EXCEL_FORMAT, EXPORT_FORMATS, REPORT_MEDIA_TYPES, negotiate_report_format, parquet_available,
+    write_export_archive
+)
+from routes.data.ingest import read_mapped_csv, compare_read_plan, FieldTypeError
+from routes.data.dataset_cache import get_dataset_cache, file_digest
+from routes.data.result_cache import get_result_cache, bypass_requested, ResultCache
+from routes.data.incremental_compare import compare_incremental, get_snapshot_store, SnapshotStore
+from routes.data.preview_compare import preview_compare_csv
 
 # 创建蓝图
 data_compare_bp = Blueprint('data_compare', __name__, url_prefix='/data')
@@ -43,9 +66,31 @@ def compare_csv():
     - target_csv: 目标CSV文件  
     - field_mapping: 字段映射关系 (JSON格式)
     - key_fields: 关键字段列表 (用于关联记录)
+    - engine: 比较引擎 (python / vectorized / parallel / digest / multiset / positional / external，可选，
+      默认取配置COMPARE_ENGINE)，multiset不使用关键字段，按整行哈希的多重集比较；positional不使用关键字段，
+      按行顺序比较有序文件
+    - memory_budget_mb: external引擎的内存预算 (MB，可选，默认取配置EXTERNAL_COMPARE_MEMORY_MB)，
+      不能在预算内完成比较时返回413
+    - baseline: 增量比较的基线名称 (可选)，指定后只重新比较与上一次快照相比变化的关键字段；
+      增量比较由vectorized引擎实现，未指定engine时使用vectorized引擎，指定其它引擎时返回400
+    - preview: 为1/true时只比较抽样的关键字段，返回差异率估计 (JSON)，不生成Excel报告
+    - summary_only: 为1/true时只返回摘要计数和各字段差异数 (JSON)，不生成逐条记录和Excel报告
+    - sample_rate: 预览抽样比例 (可选，默认取配置PREVIEW_SAMPLE_RATE)
+    - seed: 预览随机种子 (可选，默认0)，相同种子抽中相同的键
+    - duplicate_match: 重复键的配对方式 (可选，all / ordered，默认all)，all按多对多展开比较，
+      ordered在每个重复键内按duplicate_order字段排序后逐个配对
+    - duplicate_order: ordered配对时的排序字段 (可选，逗号分隔的源表字段名，为空时按原始行顺序)
+    - format: 报告格式 (可选，xlsx / csv / parquet / ndjson)，未指定时按Accept请求头协商，默认xlsx；
+      csv/parquet/ndjson为每个差异集合一个文件（.csv.gz / .parquet / .ndjson.gz）和summary.json的zip
+      (Content-Type为application/zip)
+    
+    请求头:
+    - Cache-Control: no-cache 或 X-Compare-Cache: bypass 跳过结果缓存，重新比较并刷新缓存
+    - Accept: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet 为xlsx，application/zip 为csv
+      格式的zip；都不可接受时返回406
     
     Returns:
-        Excel文件: 包含比较结果的Excel文件
+        报告文件: 默认为包含比较结果的Excel文件，响应头X-Compare-Cache标明缓存状态 (hit/miss/bypass/disabled)
     """
     try:
         # 检查是否有文件上传
@@ -67,48 +112,428 @@ def compare_csv():
                 'endpoint': '/data/compare'
             }), 400
         
-        # 获取字段映射和关键字段
-        mapping_file = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'mapping.csv')
-        import pandas as pd
-        if os.path.exists(mapping_file):
-            df = pd.read_csv(mapping_file, dtype=str).fillna('')
-            field_mapping = dict(zip(df['source1'], df['source2']))
-            key_fields = df.loc[df['is_key'].str.lower() == 'yes', 'source1'].tolist()
+        # 选择比较引擎（增量比较由vectorized引擎实现，指定基线且未指定引擎时使用vectorized引擎）
+        baseline = request.form.get('baseline')
+        engine = request.form.get('engine') or current_app.config.get('COMPARE_ENGINE', 'vectorized')
+        if baseline is not None and not request.form.get('engine'):
+            engine = INCREMENTAL_ENGINE
+        engines = list(COMPARE_ENGINES) + list(KEYLESS_COMPARE_ENGINES) + list(FILE_COMPARE_ENGINES)
+        if engine not in engines:
+            return jsonify({
+                'status': 'error',
+                'message': f'Unknown engine: {engine}, expected one of {engines}',
+                'endpoint': '/data/compare'
+            }), 400
+        
+        # 增量比较基线
+        if baseline is not None:
+            if not SnapshotStore.valid_name(baseline):
+                return jsonify({
+                    'status': 'error',
+                    'message': 'baseline must be 1-64 letters, digits, underscores or hyphens',
+                    'endpoint': '/data/compare'
+                }), 400
+            if engine != INCREMENTAL_ENGINE:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'baseline is not supported by the {engine} engine, '
+                               f'incremental compare uses the {INCREMENTAL_ENGINE} engine',
+                    'endpoint': '/data/compare'
+                }), 400
+        
+        if engine in KEYLESS_COMPARE_ENGINES and form_flag('preview'):
+            return jsonify({
+                'status': 'error',
+                'message': f'preview is not supported by the {engine} engine',
+                'endpoint': '/data/compare'
+            }), 400
+        
+        # 字段映射、关键字段、比较规则和重复键配对方式
+        options, error = parse_compare_options('/data/compare', engine)
+        if error is not None:
+            return error
+        field_mapping, key_fields, field_types, compare_rules, duplicate_order = options
+        
+        # 报告格式：format参数优先，否则按Accept请求头协商
+        report_format = negotiate_report_format(request.form.get('format'), request.accept_mimetypes)
+        if report_format is None:
+            return jsonify({
+                'status': 'error',
+                'message': f'Not acceptable: reports are served as {list(REPORT_MEDIA_TYPES)}, '
+                           f'use the format parameter to choose csv, parquet or ndjson',
+                'endpoint': '/data/compare'
+            }), 406
+        report_formats = [EXCEL_FORMAT] + list(EXPORT_FORMATS)
+        if report_format not in report_formats:
+            return jsonify({
+                'status': 'error',
+                'message': f'Unknown format: {report_format}, expected one of {report_formats}',
+                'endpoint': '/data/compare'
+            }), 400
+        if report_format == 'parquet' and not parquet_available():
+            return jsonify({
+                'status': 'error',
+                'message': 'parquet format requires pyarrow',
+                'endpoint': '/data/compare'
+            }), 400
+        
+        # 抽样预览：只比较抽中的关键字段，返回差异率估计
+        if form_flag('preview'):
+            try:
+                sample_rate = float(request.form.get('sample_rate')
+                                    or current_app.config.get('PREVIEW_SAMPLE_RATE', 0.01))
+                seed = int(request.form.get('seed') or 0)
+            except ValueError:
+                return jsonify({
+                    'status': 'error',
+                    'message': 'sample_rate must be a number and seed must be an integer',
+                    'endpoint': '/data/compare'
+                }), 400
+            if not 0 < sample_rate <= 1 or seed < 0:
+                return jsonify({
+                    'status': 'error',
+                    'message': 'sample_rate must be in (0, 1] and seed must be non-negative',
+                    'endpoint': '/data/compare'
+                }), 400
+            
+            preview = preview_compare_csv(source_file, target_file, field_mapping, key_fields,
+                                          field_types=field_types, sample_rate=sample_rate, seed=seed,
+                                          compare_rules=compare_rules, duplicate_order=duplicate_order)
+            return jsonify({
+                'status': 'success',
+                'data': preview,
+                'endpoint': '/data/compare'
+            })
+        
+        # 只统计计数时不生成报告，也不使用结果缓存
+        summary_only = form_flag('summary_only')
+        
+        # 结果缓存：输入文件、映射配置和引擎都相同时直接返回已生成的报告
+        result_cache = None if summary_only else get_result_cache()
+        source_digest = target_digest = cache_key = None
+        cache_status = 'disabled'
+        if result_cache:
+            source_digest = file_digest(source_file)
+            target_digest = file_digest(target_file)
+            cache_key = ResultCache.make_key(
+                source=source_digest, target=target_digest, field_mapping=field_mapping,
+                key_fields=key_fields, field_types=field_types, compare_rules=compare_rules,
+                duplicate_order=duplicate_order, engine=engine, baseline=baseline, report_format=report_format)
+            if bypass_requested(request.headers):
+                result_cache.record_bypass()
+                cache_status = 'bypass'
+            else:
+                cached_report = result_cache.get(cache_key)
+                if cached_report:
+                    logger.info(f"Result cache hit: {cache_key}")
+                    return send_report(cached_report, 'hit', report_format)
+                cache_status = 'miss'
+        
+        if engine in FILE_COMPARE_ENGINES:
+            # 基于文件的引擎：上传文件先落盘，由引擎分块读取
+            try:
+                memory_budget_mb = int(request.form.get('memory_budget_mb')
+                                       or current_app.config.get('EXTERNAL_COMPARE_MEMORY_MB', 512))
+            except ValueError:
+                return jsonify({
+                    'status': 'error',
+                    'message': 'memory_budget_mb must be an integer',
+                    'endpoint': '/data/compare'
+                }), 400
+            
+            with tempfile.TemporaryDirectory() as work_dir:
+                source_path = os.path.join(work_dir, 'source.csv')
+                target_path = os.path.join(work_dir, 'target.csv')
+                source_file.save(source_path)
+                target_file.save(target_path)
+                
+                comparison_result = FILE_COMPARE_ENGINES[engine](
+                    source_path, target_path, field_mapping, key_fields,
+                    memory_budget_mb=memory_budget_mb, work_dir=work_dir,
+                    field_types=field_types, prune_columns=True, compare_rules=compare_rules,
+                    duplicate_order=duplicate_order)
+        else:
+            # 读取CSV文件（只读取关键字段和映射字段，并按字段类型解析）
+            source_columns, source_types, target_columns, target_types = compare_read_plan(
+                field_mapping, key_fields, field_types)
+            # 相同内容的文件从数据集缓存加载，不再重新解析
+            dataset_cache = get_dataset_cache()
+            if dataset_cache:
+                source_df = dataset_cache.read_csv(source_file, source_columns, source_types, digest=source_digest)
+                target_df = dataset_cache.read_csv(target_file, target_columns, target_types, digest=target_digest)
+            else:
+                source_df = read_mapped_csv(source_file, source_columns, source_types)
+                target_df = read_mapped_csv(target_file, target_columns, target_types)
+            
+            logger.info(f"Source CSV loaded: {len(source_df)} rows, {len(source_df.columns)} columns")
+            logger.info(f"Target CSV loaded: {len(target_df)} rows, {len(target_df.columns)} columns")
+            
+            # 执行数据比较
+            if baseline is not None:
+                snapshot_store = get_snapshot_store()
+                comparison_result, snapshot = compare_incremental(
+                    source_df, target_df, field_mapping, key_fields, snapshot_store.load(baseline),
+                    compare_rules=compare_rules, duplicate_order=duplicate_order)
+                snapshot_store.save(baseline, snapshot)
+            elif engine in KEYLESS_COMPARE_ENGINES:
+                comparison_result = KEYLESS_COMPARE_ENGINES[engine](source_df, target_df, field_mapping)
+            else:
+                comparison_result = COMPARE_ENGINES[engine](source_df, target_df, field_mapping, key_fields,
+                                                            compare_rules=compare_rules,
+                                                            duplicate_order=duplicate_order)
+        
+        if summary_only:
+            return jsonify({
+                'status': 'success',
+                'data': summarize_result(comparison_result),
+                'endpoint': '/data/compare'
+            })
+        
+        # 生成报告（默认为Excel，机器可读格式直接从结果数据写出）
+        if report_format == EXCEL_FORMAT:
+            report_file = generate_excel_report(comparison_result)
         else:
-            field_mapping = {}
-            key_fields = []
+            report_file = generate_export_report(comparison_result, report_format)
+        if result_cache:
+            result_cache.put(cache_key, report_file, suffix=os.path.splitext(report_file)[1])
+        
+        # 返回报告文件
+        return send_report(report_file, cache_status, report_format)
+        
+    except FieldTypeError as e:
+        # 字段值与mapping.csv中声明的类型不符是输入数据的问题
+        logger.warning(f"Invalid field value: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e),
+            'endpoint': '/data/compare'
+        }), 400
+        
+    except MemoryBudgetExceeded as e:
+        # external引擎不能在memory_budget_mb内完成比较
+        logger.warning(f"Memory budget exceeded: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e),
+            'endpoint': '/data/compare'
+        }), 413
+        
+    except Exception as e:
+        logger.error(f"Error in CSV comparison: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e),
+            'endpoint': '/data/compare'
+        }), 500
+
+@data_compare_bp.route('/compare/multi', methods=['POST'])
+def compare_csv_multi():
+    """
+    一个源表与多个目标表的CSV数据比较端点
+    
+    源表只解析一次，关键字段字典和行指纹只计算一次，各目标表在线程池中并发比较。
+    
+    请求参数:
+    - source_csv: 源CSV文件
+    - target_csv: 目标CSV文件 (可重复，每个文件一个目标表，以文件名（不含扩展名）命名)
+    - report: 报告形式 (可选，per_target / combined，默认per_target)，per_target返回每个目标表
+      一个Excel报告的zip文件，combined返回一个合并的Excel报告（记录第一列为目标表名称）
+    - summary_only: 为1/true时只返回各目标表的摘要计数 (JSON)，不生成报告
+    - duplicate_match / duplicate_order: 同 /data/compare
+    
+    Returns:
+        zip或Excel文件
+    """
+    try:
+        target_files = request.files.getlist('target_csv')
+        if 'source_csv' not in request.files or not target_files:
+            return jsonify({
+                'status': 'error',
+                'message': 'source_csv and at least one target_csv file are required',
+                'endpoint': '/data/compare/multi'
+            }), 400
+        
+        source_file = request.files['source_csv']
+        if not all(f.filename.endswith('.csv') for f in [source_file] + target_files):
+            return jsonify({
+                'status': 'error',
+                'message': 'All files must be CSV format',
+                'endpoint': '/data/compare/multi'
+            }), 400
+        
+        report = request.form.get('report') or 'per_target'
+        if report not in ('per_target', 'combined'):
+            return jsonify({
+                'status': 'error',
+                'message': 'report must be per_target or combined',
+                'endpoint': '/data/compare/multi'
+            }), 400
+        
+        # 所有目标表按vectorized引擎比较
+        options, error = parse_compare_options('/data/compare/multi', 'vectorized')
+        if error is not None:
+            return error
+        field_mapping, key_fields, field_types, compare_rules, duplicate_order = options
         
-        # 读取CSV文件
-        source_df = pd.read_csv(source_file)
-        target_df = pd.read_csv(target_file)
+        # 源表只读取一次；目标表以文件名命名，重名时加序号
+        source_columns, source_types, target_columns, target_types = compare_read_plan(
+            field_mapping, key_fields, field_types)
+        dataset_cache = get_dataset_cache()
+        read_csv = dataset_cache.read_csv if dataset_cache else read_mapped_csv
+        source_df = read_csv(source_file, source_columns, source_types)
+        target_dfs = {}
+        for target_file in target_files:
+            stem = os.path.splitext(os.path.basename(target_file.filename))[0] or 'target'
+            name, suffix = stem, 2
+            while name in target_dfs:
+                name, suffix = f'{stem}_{suffix}', suffix + 1
+            target_dfs[name] = read_csv(target_file, target_columns, target_types)
         
-        logger.info(f"Source CSV loaded: {len(source_df)} rows, {len(source_df.columns)} columns")
-        logger.info(f"Target CSV loaded: {len(target_df)} rows, {len(target_df.columns)} columns")
+        logger.info(f"Source CSV loaded: {len(source_df)} rows, comparing against {len(target_dfs)} targets")
         
-        # 执行数据比较
-        comparison_result = compare_dataframes(source_df, target_df, field_mapping, key_fields)
+        comparison_results = compare_dataframes_multi(source_df, target_dfs, field_mapping, key_fields,
+                                                      compare_rules=compare_rules,
+                                                      duplicate_order=duplicate_order)
         
-        # 生成Excel报告
-        excel_file = generate_excel_report(comparison_result)
+        if form_flag('summary_only'):
+            return jsonify({
+                'status': 'success',
+                'data': {name: summarize_result(result) for name, result in comparison_results.items()},
+                'endpoint': '/data/compare/multi'
+            })
         
-        # 返回Excel文件
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if report == 'combined':
+            return send_report(generate_combined_excel_report(comparison_results), 'disabled')
         return send_file(
-            excel_file,
+            generate_report_archive(comparison_results),
             as_attachment=True,
-            download_name=f'csv_comparison_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx',
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            download_name=f'csv_comparison_reports_{timestamp}.zip',
+            mimetype='application/zip'
         )
         
+    except FieldTypeError as e:
+        # 字段值与mapping.csv中声明的类型不符是输入数据的问题
+        logger.warning(f"Invalid field value: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e),
+            'endpoint': '/data/compare/multi'
+        }), 400
+        
     except Exception as e:
-        logger.error(f"Error in CSV comparison: {e}")
+        logger.error(f"Error in multi-target CSV comparison: {e}")
         return jsonify({
             'status': 'error',
             'message': str(e),
-            'endpoint': '/data/compare'
+            'endpoint': '/data/compare/multi'
         }), 500
 
+@data_compare_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """结果缓存和数据集缓存的统计信息（命中/未命中等），供监控使用"""
+    result_cache = get_result_cache()
+    dataset_cache = get_dataset_cache()
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'result_cache': result_cache.stats() if result_cache else None,
+            'dataset_cache': dataset_cache.stats() if dataset_cache else None
+        },
+        'endpoint': '/data/cache/stats'
+    })
+
+def form_flag(name: str) -> bool:
+    """表单中的布尔参数（1/true/yes）"""
+    return request.form.get(name, '').lower() in ('1', 'true', 'yes')
+
+def parse_compare_options(endpoint: str, engine: str) -> Tuple[Optional[tuple], Optional[Any]]:
+    """
+    读取mapping.csv并校验两个比较端点共用的请求选项
+    
+    校验比较规则能否编译、所选引擎是否支持比较规则和重复键配对方式，并解析
+    duplicate_match / duplicate_order 表单参数。
+    
+    Args:
+        endpoint: 错误响应中的端点名称
+        engine: 比较引擎名称（已校验存在）
+        
+    Returns:
+        ((字段映射, 关键字段列表, 字段类型, 字段比较规则, 重复键排序字段), None)；
+        校验失败时为 (None, 400错误响应)
+    """
+    def bad_request(message: str):
+        return None, (jsonify({'status': 'error', 'message': message, 'endpoint': endpoint}), 400)
+    
+    field_mapping, key_fields, field_types, compare_rules = load_mapping_config()
+    try:
+        compile_compare_rules(compare_rules)
+    except ValueError as e:
+        return bad_request(str(e))
+    if compare_rules and (engine == 'python' or engine in KEYLESS_COMPARE_ENGINES):
+        return bad_request(f'compare rules in mapping.csv are not supported by the {engine} engine')
+    
+    # 重复键配对方式
+    duplicate_match = request.form.get('duplicate_match') or 'all'
+    if duplicate_match not in ('all', 'ordered'):
+        return bad_request('duplicate_match must be all or ordered')
+    if duplicate_match == 'ordered' and engine in KEYLESS_COMPARE_ENGINES:
+        return bad_request(f'duplicate_match is not supported by the {engine} engine')
+    duplicate_order = None
+    if duplicate_match == 'ordered':
+        duplicate_order = [field.strip() for field in request.form.get('duplicate_order', '').split(',')
+                           if field.strip()]
+        unmapped = [field for field in duplicate_order if field_mapping and field not in field_mapping]
+        if unmapped:
+            return bad_request(f'duplicate_order fields must be mapped in mapping.csv: {unmapped}')
+    
+    return (field_mapping, key_fields, field_types, compare_rules, duplicate_order), None
+
+def load_mapping_config() -> Tuple[Dict[str, str], List[str], Dict[str, str], Dict[str, str]]:
+    """
+    读取mapping.csv
+
+    Returns:
+        (字段映射, 关键字段列表, 字段类型, 字段比较规则)，文件不存在时均为空
+    """
+    mapping_file = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'mapping.csv')
+    if not os.path.exists(mapping_file):
+        return {}, [], {}, {}
+    df = pd.read_csv(mapping_file, dtype=str).fillna('')
+    field_mapping = dict(zip(df['source1'], df['source2']))
+    key_fields = df.loc[df['is_key'].str.lower() == 'yes', 'source1'].tolist()
+    # 可选的dtype列: int / decimal / date / category / string
+    field_types = {field: field_type.lower() for field, field_type
+                   in zip(df['source1'], df.get('dtype', [''] * len(df))) if field_type}
+    # 可选的compare列: 字段比较规则，如 abs:0.01 / date:%Y-%m-%d / icase;trim
+    compare_rules = {field: rule for field, rule
+                     in zip(df['source1'], df.get('compare', [''] * len(df))) if rule}
+    return field_mapping, key_fields, field_types, compare_rules
+
+def send_report(report_file: str, cache_status: str, report_format: str = EXCEL_FORMAT):
+    """
+    返回报告文件，并在响应头中标明结果缓存状态
+    
+    Excel报告拆分为多个工作簿、以及csv/parquet/ndjson格式的报告为zip文件。
+    """
+    suffix = os.path.splitext(report_file)[1]
+    name = 'csv_comparison_report' if report_format == EXCEL_FORMAT else f'csv_comparison_{report_format}'
+    response = send_file(
+        report_file,
+        as_attachment=True,
+        download_name=f'{name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}{suffix}',
+        mimetype='application/zip' if suffix == '.zip'
+        else 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+    response.headers['X-Compare-Cache'] = cache_status
+    # 报告格式可能由Accept请求头决定
+    response.vary.add('Accept')
+    return response
+
 def compare_dataframes(source_df: pd.DataFrame, target_df: pd.DataFrame, 
-                      field_mapping: Dict[str, str], key_fields: List[str]) -> Dict[str, Any]:
+                      field_mapping: Dict[str, str], key_fields: List[str],
+                      compare_rules: Optional[Dict[str, str]] = None,
+                      duplicate_order: Optional[List[str]] = None) -> Dict[str, Any]:
     """
     比较两个DataFrame
     
@@ -117,13 +542,20 @@ def compare_dataframes(source_df: pd.DataFrame, target_df: pd.DataFrame,
         target_df: 目标数据框
         field_mapping: 字段映射关系
         key_fields: 关键字段列表
+        compare_rules: 字段比较规则，逐行比较不支持，只能为空
+        duplicate_order: 重复键的配对方式，None为多对多展开，字段列表为按这些字段排序后逐个配对
         
     Returns:
         比较结果字典
     """
+    if compile_compare_rules(compare_rules):
+        raise ValueError('compare rules are not supported by the python engine')
+    
     result = {
         'data_loss': [],
+        'target_only': [],
         'value_diff': [],
+        'duplicate_keys': [],
         'summary': {}
     }
     
@@ -149,49 +581,56 @@ def compare_dataframes(source_df: pd.DataFrame, target_df: pd.DataFrame,
         for target_field, source_field in reverse_mapping.items():
             if target_field in mapped_target_df.columns:
                 mapped_target_df = mapped_target_df.rename(columns={target_field: source_field})
-        
-        # 使用映射后的字段创建索引
-        source_index = source_df.set_index(key_fields)
-        target_index = mapped_target_df.set_index(key_fields)
     else:
         # 如果没有字段映射，直接使用原始字段
-        source_index = source_df.set_index(key_fields)
-        target_index = target_df.set_index(key_fields)
+        mapped_target_df = target_df
+    check_duplicate_order(source_df, mapped_target_df, duplicate_order)
+    
+    # 使用映射后的字段创建索引
+    source_index = source_df.set_index(key_fields)
+    target_index = mapped_target_df.set_index(key_fields)
+    
+    # 关键字段编码为共享字典上的int64代码，重复键一次计数找出，集合运算和配对都在代码数组上完成
+    source_codes, target_codes, num_keys = shared_key_codes(
+        source_index.index.to_frame(index=False), target_index.index.to_frame(index=False))
+    duplicate_keys = duplicate_key_groups(source_codes, target_codes, num_keys)
+    if duplicate_order is not None and len(duplicate_keys[0]):
+        source_codes, target_codes, num_keys = occurrence_key_codes(
+            source_codes, target_codes, source_df[duplicate_order], mapped_target_df[duplicate_order])
+    loss_positions, source_positions, target_positions, target_only_positions = join_key_codes(
+        source_codes, target_codes, num_keys)
     
     # 检查数据丢失 (源数据中有但目标数据中没有的记录)
-    source_keys = set(source_index.index)
-    target_keys = set(target_index.index)
-    
-    data_loss_keys = source_keys - target_keys
-    if data_loss_keys:
-        for key in data_loss_keys:
-            if isinstance(key, tuple):
-                key_dict = dict(zip(key_fields, key))
-            else:
-                key_dict = {key_fields[0]: key}
-            
-            # 获取源数据记录
-            source_record = source_index.loc[key]
-            if isinstance(source_record, pd.Series):
-                source_record = source_record.to_dict()
-            
-            result['data_loss'].append({
-                'key': key_dict,
-                'source_data': source_record,
-                'reason': 'Record exists in source but not in target'
-            })
+    for position in loss_positions:
+        result['data_loss'].append({
+            'key': _key_dict(source_index.index[position], key_fields),
+            'source_data': source_index.iloc[position].to_dict(),
+            'reason': 'Record exists in source but not in target'
+        })
     
-    # 检查值差异 (两个表中都存在但值不匹配的记录)
-    common_keys = source_keys & target_keys
+    # 检查仅目标表存在的记录 (目标数据中有但源数据中没有的记录)
+    for position in target_only_positions:
+        result['target_only'].append({
+            'key': _key_dict(target_index.index[position], key_fields),
+            'target_data': target_index.iloc[position].to_dict(),
+            'reason': 'Record exists in target but not in source'
+        })
     
-    for key in common_keys:
-        source_record = source_index.loc[key]
-        target_record = target_index.loc[key]
-        
-        if isinstance(source_record, pd.Series):
-            source_record = source_record.to_dict()
-        if isinstance(target_record, pd.Series):
-            target_record = target_record.to_dict()
+    # 报告重复键 (在任一表中出现多次的关键字段)
+    for source_position, target_position, source_count, target_count in zip(*duplicate_keys):
+        key = (source_index.index[source_position] if source_position >= 0
+               else target_index.index[target_position])
+        result['duplicate_keys'].append({
+            'key': _key_dict(key, key_fields),
+            'source_count': int(source_count),
+            'target_count': int(target_count)
+        })
+    
+    # 检查值差异 (两个表中都存在但值不匹配的记录，重复键的每一对记录分别比较)
+    for source_position, target_position in zip(source_positions, target_positions):
+        key = source_index.index[source_position]
+        source_record = source_index.iloc[source_position].to_dict()
+        target_record = target_index.iloc[target_position].to_dict()
         
         differences = {}
         has_diff = False
@@ -247,13 +686,8 @@ def compare_dataframes(source_df: pd.DataFrame, target_df: pd.DataFrame,
                         has_diff = True
         
         if has_diff:
-            if isinstance(key, tuple):
-                key_dict = dict(zip(key_fields, key))
-            else:
-                key_dict = {key_fields[0]: key}
-            
             result['value_diff'].append({
-                'key': key_dict,
+                'key': _key_dict(key, key_fields),
                 'source_data': source_record,
                 'target_data': target_record,
                 'differences': differences
@@ -264,8 +698,10 @@ def compare_dataframes(source_df: pd.DataFrame, target_df: pd.DataFrame,
         'source_total_records': len(source_df),
         'target_total_records': len(target_df),
         'data_loss_count': len(result['data_loss']),
+        'target_only_count': len(result['target_only']),
         'value_diff_count': len(result['value_diff']),
-        'matching_records': len(common_keys) - len(result['value_diff']),
+        'duplicate_key_count': len(result['duplicate_keys']),
+        'matching_records': len(source_positions) - len(result['value_diff']),
         'field_mapping': field_mapping,
         'key_fields': key_fields
     }
@@ -274,46 +710,224 @@ def compare_dataframes(source_df: pd.DataFrame, target_df: pd.DataFrame,
     
     return result
 
-def generate_excel_report(comparison_result: Dict[str, Any]) -> str:
+def _key_dict(key, key_fields: List[str]) -> Dict[str, Any]:
+    """索引中的键值转换为 {关键字段: 值}"""
+    if isinstance(key, tuple):
+        return dict(zip(key_fields, key))
+    return {key_fields[0]: key}
+
+# 可选的比较引擎，输出结构一致
+COMPARE_ENGINES = {
+    'python': compare_dataframes,
+    'vectorized': compare_dataframes_vectorized,
+    'parallel': compare_dataframes_parallel,
+    'digest': compare_dataframes_digest,
+}
+
+# 不使用关键字段的比较引擎（只接收字段映射），不支持比较规则、重复键配对、增量比较和抽样预览
+KEYLESS_COMPARE_ENGINES = {
+    'multiset': compare_dataframes_multiset,
+    'positional': compare_dataframes_positional,
+}
+
+# 直接读取CSV文件路径的比较引擎（不整体加载到内存）
+FILE_COMPARE_ENGINES = {
+    'external': compare_csv_files_external,
+}
+
+# 增量比较（baseline）按vectorized引擎的方式比较变化的关键字段，见 incremental_compare 模块
+INCREMENTAL_ENGINE = 'vectorized'
+
+def generate_excel_report(comparison_result: Dict[str, Any], sheet_max_rows: int = SHEET_MAX_ROWS,
+                          workbook_max_rows: int = WORKBOOK_MAX_ROWS) -> str:
     """
     生成Excel报告
     
+    报告逐段流式写出（见 excel_report 模块），内存与报告行数无关。超过Excel行数上限的
+    工作表拆分为编号工作表，数据行超过 workbook_max_rows 时拆分为多个工作簿打包为zip。
+    
+    Args:
+        comparison_result: 比较结果（字典或列式CompareResult）
+        sheet_max_rows: 每个工作表的最多数据行数
+        workbook_max_rows: 每个工作簿的最多数据行数
+        
+    Returns:
+        报告文件路径（.xlsx，拆分为多个工作簿时为.zip）
+    """
+    try:
+        report_file = write_report(report_sheets(comparison_result), sheet_max_rows, workbook_max_rows)
+        logger.info(f"Excel report generated: {report_file}")
+        return report_file
+        
+    except Exception as e:
+        logger.error(f"Error generating Excel report: {e}")
+        raise
+
+def generate_export_report(comparison_result: Dict[str, Any], report_format: str) -> str:
+    """
+    生成机器可读格式的报告（见 report_export 模块）
+    
+    差异集合按段直接从结果数据写出，不经过openpyxl，也没有Excel的行数上限。
+    
     Args:
-        comparison_result: 比较结果
+        comparison_result: 比较结果（字典或列式CompareResult）
+        report_format: csv / parquet / ndjson
         
     Returns:
-        Excel文件路径
+        zip文件路径，每个差异集合一个文件，另有summary.json
     """
     try:
-        # 创建临时文件
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
         temp_file.close()
         
-        with pd.ExcelWriter(temp_file.name, engine='openpyxl') as writer:
-            # 创建数据丢失工作表
-            if comparison_result['data_loss']:
-                data_loss_df = create_data_loss_dataframe(comparison_result['data_loss'])
-                data_loss_df.to_excel(writer, sheet_name='Data_Loss', index=False)
-                apply_data_loss_styling(writer, data_loss_df)
-            
-            # 创建值差异工作表
-            if comparison_result['value_diff']:
-                value_diff_df = create_value_diff_dataframe(comparison_result['value_diff'])
-                value_diff_df.to_excel(writer, sheet_name='Value_Differences', index=False)
-                apply_value_diff_styling(writer, value_diff_df)
-            
-            # 创建摘要工作表
-            summary_df = create_summary_dataframe(comparison_result['summary'])
-            summary_df.to_excel(writer, sheet_name='Summary', index=False)
-            apply_summary_styling(writer, summary_df)
+        sheets = [sheet for sheet in report_sheets(comparison_result) if sheet.name != 'Summary']
+        write_export_archive(temp_file.name, sheets, summarize_result(comparison_result), report_format)
         
-        logger.info(f"Excel report generated: {temp_file.name}")
+        logger.info(f"{report_format} report generated: {temp_file.name}")
         return temp_file.name
         
     except Exception as e:
-        logger.error(f"Error generating Excel report: {e}")
+        logger.error(f"Error generating {report_format} report: {e}")
+        raise
+
+def write_report(sheets: List[ReportSheet], sheet_max_rows: int = SHEET_MAX_ROWS,
+                 workbook_max_rows: int = WORKBOOK_MAX_ROWS) -> str:
+    """
+    按结果计数规划后写出报告到临时文件
+    
+    Returns:
+        只有一个工作簿时为.xlsx文件路径，否则为包含各工作簿和index.xlsx的.zip文件路径
+    """
+    workbooks = plan_report(sheets, sheet_max_rows, workbook_max_rows)
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx' if len(workbooks) == 1 else '.zip')
+    temp_file.close()
+    if len(workbooks) == 1:
+        write_excel_report(temp_file.name, workbooks[0][1])
+    else:
+        write_report_archive(temp_file.name, workbooks)
+    return temp_file.name
+
+def report_sheets(comparison_result: Dict[str, Any]) -> List[ReportSheet]:
+    """
+    报告中的工作表
+    
+    Returns:
+        按顺序排列的工作表，没有记录的工作表跳过，摘要在最后
+    """
+    # 列式结果直接从原始数据框按行位置分段生成工作表，不经过逐条记录的字典
+    columnar = isinstance(comparison_result, CompareResult)
+    summary = comparison_result['summary']
+    sheets = []
+    
+    # 数据丢失工作表
+    if summary['data_loss_count']:
+        sheets.append(ReportSheet.from_renderer('Data_Loss', comparison_result.data_loss_frame,
+                                                summary['data_loss_count']) if columnar
+                      else ReportSheet.from_frame('Data_Loss',
+                                                  create_data_loss_dataframe(comparison_result['data_loss'])))
+    
+    # 仅目标表存在的记录工作表（旧结果中没有该项时跳过）
+    if summary.get('target_only_count'):
+        sheets.append(ReportSheet.from_renderer('Target_Only', comparison_result.target_only_frame,
+                                                summary['target_only_count']) if columnar
+                      else ReportSheet.from_frame('Target_Only',
+                                                  create_target_only_dataframe(comparison_result['target_only'])))
+    
+    # 值差异工作表
+    if summary['value_diff_count']:
+        sheets.append(ReportSheet.from_renderer('Value_Differences', comparison_result.value_diff_frame,
+                                                summary['value_diff_count']) if columnar
+                      else ReportSheet.from_frame('Value_Differences',
+                                                  create_value_diff_dataframe(comparison_result['value_diff'])))
+    
+    # 重复键工作表（旧结果中没有该项时跳过）
+    if summary.get('duplicate_key_count'):
+        sheets.append(ReportSheet.from_renderer('Duplicate_Keys', comparison_result.duplicate_keys_frame,
+                                                summary['duplicate_key_count']) if columnar
+                      else ReportSheet.from_frame('Duplicate_Keys',
+                                                  create_duplicate_keys_dataframe(comparison_result['duplicate_keys'])))
+    
+    # 摘要工作表
+    sheets.append(ReportSheet.from_frame('Summary', create_summary_dataframe(summary)))
+    return sheets
+
+def generate_combined_excel_report(comparison_results: Dict[str, Any], sheet_max_rows: int = SHEET_MAX_ROWS,
+                                   workbook_max_rows: int = WORKBOOK_MAX_ROWS) -> str:
+    """
+    生成一个源表与多个目标表的合并Excel报告
+    
+    各目标表的同类记录合并在同一个工作表中，第一列Target为目标表名称（各目标表的Diff_列取并集）；
+    Summary工作表每个目标表一列。
+    
+    Args:
+        comparison_results: {目标表名称: 比较结果}
+        sheet_max_rows: 每个工作表的最多数据行数
+        workbook_max_rows: 每个工作簿的最多数据行数
+        
+    Returns:
+        报告文件路径（.xlsx，超过行数上限拆分为多个工作簿时为.zip）
+    """
+    try:
+        sections = {}
+        summaries = []
+        for name, comparison_result in comparison_results.items():
+            for sheet in report_sheets(comparison_result):
+                if sheet.name == 'Summary':
+                    summaries.append(next(sheet.chunks()).set_index('Metric')['Value'].rename(name))
+                else:
+                    sections.setdefault(sheet.name, []).append((name, sheet))
+        
+        sheets = [_combined_sheet(sheet_name, parts) for sheet_name, parts in sections.items()]
+        summary_df = pd.concat(summaries, axis=1).rename_axis('Metric').reset_index()
+        sheets.append(ReportSheet.from_frame('Summary', summary_df))
+        report_file = write_report(sheets, sheet_max_rows, workbook_max_rows)
+        
+        logger.info(f"Combined Excel report generated: {report_file}")
+        return report_file
+        
+    except Exception as e:
+        logger.error(f"Error generating combined Excel report: {e}")
         raise
 
+def _combined_sheet(sheet_name: str, parts: List[Tuple[str, ReportSheet]]) -> ReportSheet:
+    """把各目标表的同名工作表合并为一个，第一列为目标表名称"""
+    columns = ['Target']
+    for _, sheet in parts:
+        columns.extend(column for column in sheet.columns if column not in columns)
+    
+    offsets = np.cumsum([0] + [sheet.rows for _, sheet in parts])
+    
+    def render(start, stop):
+        frames = [sheet.render(max(start - offset, 0), min(stop - offset, sheet.rows)).assign(Target=name)
+                  for (name, sheet), offset in zip(parts, offsets) if start < offset + sheet.rows and stop > offset]
+        return pd.concat(frames, ignore_index=True).reindex(columns=columns) if frames \
+            else pd.DataFrame(columns=columns)
+    
+    def sample(rows):
+        return pd.concat([sheet.sample(rows).assign(Target=name) for name, sheet in parts],
+                         ignore_index=True).reindex(columns=columns)
+    
+    return ReportSheet(sheet_name, columns, render, int(offsets[-1]), sample=sample)
+
+def generate_report_archive(comparison_results: Dict[str, Any]) -> str:
+    """
+    生成每个目标表一个Excel报告的zip文件（<目标表名称>.xlsx，拆分为多个工作簿的报告为<目标表名称>.zip）
+    
+    Returns:
+        zip文件路径
+    """
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
+    temp_file.close()
+    with zipfile.ZipFile(temp_file.name, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, comparison_result in comparison_results.items():
+            excel_file = generate_excel_report(comparison_result)
+            try:
+                archive.write(excel_file, f'{name}{os.path.splitext(excel_file)[1]}')
+            finally:
+                os.remove(excel_file)
+    logger.info(f"Report archive generated: {temp_file.name}")
+    return temp_file.name
+
 def create_data_loss_dataframe(data_loss: List[Dict]) -> pd.DataFrame:
     """创建数据丢失DataFrame"""
     if not data_loss:
@@ -335,6 +949,45 @@ def create_data_loss_dataframe(data_loss: List[Dict]) -> pd.DataFrame:
     
     return pd.DataFrame(rows)
 
+def create_target_only_dataframe(target_only: List[Dict]) -> pd.DataFrame:
+    """创建仅目标表存在的记录DataFrame"""
+    if not target_only:
+        return pd.DataFrame()
+    
+    rows = []
+    for item in target_only:
+        row = {}
+        # 添加关键字段
+        for field, value in item['key'].items():
+            row[f'Key_{field}'] = value
+        
+        # 添加目标数据字段
+        for field, value in item['target_data'].items():
+            row[f'Target_{field}'] = value
+        
+        row['Reason'] = item['reason']
+        rows.append(row)
+    
+    return pd.DataFrame(rows)
+
+def create_duplicate_keys_dataframe(duplicate_keys: List[Dict]) -> pd.DataFrame:
+    """创建重复键DataFrame"""
+    if not duplicate_keys:
+        return pd.DataFrame()
+    
+    rows = []
+    for item in duplicate_keys:
+        row = {}
+        # 添加关键字段
+        for field, value in item['key'].items():
+            row[f'Key_{field}'] = value
+        
+        row['Source_Count'] = item['source_count']
+        row['Target_Count'] = item['target_count']
+        rows.append(row)
+    
+    return pd.DataFrame(rows)
+
 def create_value_diff_dataframe(value_diff: List[Dict]) -> pd.DataFrame:
     """创建值差异DataFrame"""
     if not value_diff:
@@ -386,217 +1039,4 @@ def create_summary_dataframe(summary: Dict) -> pd.DataFrame:
             'Value': 'Yes'
         })
     
-    return pd.DataFrame(summary_data) 
-
-def apply_data_loss_styling(writer, df):
-    """为数据丢失工作表应用样式"""
-    if df.empty:
-        return
-        
-    worksheet = writer.sheets['Data_Loss']
-    workbook = writer.book
-    
-    # 定义样式 - 使用openpyxl.styles直接创建样式对象
-    header_style = openpyxl.styles.NamedStyle(name='HeaderStyle')
-    header_style.font = openpyxl.styles.Font(bold=True, color='FFFFFF', size=12)
-    header_style.fill = openpyxl.styles.PatternFill(start_color='366092', end_color='366092', fill_type='solid')
-    header_style.alignment = openpyxl.styles.Alignment(horizontal='center', vertical='center')
-    header_style.border = openpyxl.styles.Border(
-        left=openpyxl.styles.Side(style='thin'),
-        right=openpyxl.styles.Side(style='thin'),
-        top=openpyxl.styles.Side(style='thin'),
-        bottom=openpyxl.styles.Side(style='thin')
-    )
-    
-    # 数据行样式
-    data_style = openpyxl.styles.NamedStyle(name='DataStyle')
-    data_style.fill = openpyxl.styles.PatternFill(start_color='FFE6E6', end_color='FFE6E6', fill_type='solid')
-    data_style.border = openpyxl.styles.Border(
-        left=openpyxl.styles.Side(style='thin'),
-        right=openpyxl.styles.Side(style='thin'),
-        top=openpyxl.styles.Side(style='thin'),
-        bottom=openpyxl.styles.Side(style='thin')
-    )
-    
-    # 应用表头样式
-    for col in range(1, len(df.columns) + 1):
-        cell = worksheet.cell(row=1, column=col)
-        cell.style = header_style
-    
-    # 应用数据行样式
-    for row in range(2, len(df) + 2):
-        for col in range(1, len(df.columns) + 1):
-            cell = worksheet.cell(row=row, column=col)
-            cell.style = data_style
-    
-    # 调整列宽
-    for column in worksheet.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        worksheet.column_dimensions[column_letter].width = adjusted_width
-
-def apply_value_diff_styling(writer, df):
-    """为值差异工作表应用样式"""
-    if df.empty:
-        return
-        
-    worksheet = writer.sheets['Value_Differences']
-    workbook = writer.book
-    
-    # 定义样式 - 使用openpyxl.styles直接创建样式对象
-    header_style = openpyxl.styles.NamedStyle(name='ValueHeaderStyle')
-    header_style.font = openpyxl.styles.Font(bold=True, color='FFFFFF', size=12)
-    header_style.fill = openpyxl.styles.PatternFill(start_color='C5504B', end_color='C5504B', fill_type='solid')
-    header_style.alignment = openpyxl.styles.Alignment(horizontal='center', vertical='center')
-    header_style.border = openpyxl.styles.Border(
-        left=openpyxl.styles.Side(style='thin'),
-        right=openpyxl.styles.Side(style='thin'),
-        top=openpyxl.styles.Side(style='thin'),
-        bottom=openpyxl.styles.Side(style='thin')
-    )
-    
-    # 关键字段样式
-    key_style = openpyxl.styles.NamedStyle(name='KeyStyle')
-    key_style.fill = openpyxl.styles.PatternFill(start_color='E6F3FF', end_color='E6F3FF', fill_type='solid')
-    key_style.border = openpyxl.styles.Border(
-        left=openpyxl.styles.Side(style='thin'),
-        right=openpyxl.styles.Side(style='thin'),
-        top=openpyxl.styles.Side(style='thin'),
-        bottom=openpyxl.styles.Side(style='thin')
-    )
-    
-    # 源数据样式
-    source_style = openpyxl.styles.NamedStyle(name='SourceStyle')
-    source_style.fill = openpyxl.styles.PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid')
-    source_style.border = openpyxl.styles.Border(
-        left=openpyxl.styles.Side(style='thin'),
-        right=openpyxl.styles.Side(style='thin'),
-        top=openpyxl.styles.Side(style='thin'),
-        bottom=openpyxl.styles.Side(style='thin')
-    )
-    
-    # 目标数据样式
-    target_style = openpyxl.styles.NamedStyle(name='TargetStyle')
-    target_style.fill = openpyxl.styles.PatternFill(start_color='E1D5E7', end_color='E1D5E7', fill_type='solid')
-    target_style.border = openpyxl.styles.Border(
-        left=openpyxl.styles.Side(style='thin'),
-        right=openpyxl.styles.Side(style='thin'),
-        top=openpyxl.styles.Side(style='thin'),
-        bottom=openpyxl.styles.Side(style='thin')
-    )
-    
-    # 差异值样式 - 突出显示
-    diff_style = openpyxl.styles.NamedStyle(name='DiffStyle')
-    diff_style.fill = openpyxl.styles.PatternFill(start_color='FF6B6B', end_color='FF6B6B', fill_type='solid')
-    diff_style.font = openpyxl.styles.Font(bold=True, color='FFFFFF')
-    diff_style.border = openpyxl.styles.Border(
-        left=openpyxl.styles.Side(style='thick', color='FF0000'),
-        right=openpyxl.styles.Side(style='thick', color='FF0000'),
-        top=openpyxl.styles.Side(style='thick', color='FF0000'),
-        bottom=openpyxl.styles.Side(style='thick', color='FF0000')
-    )
-    
-    # 应用表头样式
-    for col in range(1, len(df.columns) + 1):
-        cell = worksheet.cell(row=1, column=col)
-        cell.style = header_style
-    
-    # 应用数据行样式
-    for row in range(2, len(df) + 2):
-        for col in range(1, len(df.columns) + 1):
-            cell = worksheet.cell(row=row, column=col)
-            column_name = df.columns[col - 1]
-            
-            # 根据列名应用不同样式
-            if column_name.startswith('Key_'):
-                cell.style = key_style
-            elif column_name.startswith('Source_'):
-                cell.style = source_style
-            elif column_name.startswith('Target_'):
-                cell.style = target_style
-            elif column_name.startswith('Diff_'):
-                cell.style = diff_style
-            else:
-                # 默认样式
-                default_style = openpyxl.styles.NamedStyle(name='DefaultStyle')
-                default_style.border = openpyxl.styles.Border(
-                    left=openpyxl.styles.Side(style='thin'),
-                    right=openpyxl.styles.Side(style='thin'),
-                    top=openpyxl.styles.Side(style='thin'),
-                    bottom=openpyxl.styles.Side(style='thin')
-                )
-                cell.style = default_style
-    
-    # 调整列宽
-    for column in worksheet.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        worksheet.column_dimensions[column_letter].width = adjusted_width
-
-def apply_summary_styling(writer, df):
-    """为摘要工作表应用样式"""
-    if df.empty:
-        return
-        
-    worksheet = writer.sheets['Summary']
-    workbook = writer.book
-    
-    # 定义样式 - 使用openpyxl.styles直接创建样式对象
-    header_style = openpyxl.styles.NamedStyle(name='SummaryHeaderStyle')
-    header_style.font = openpyxl.styles.Font(bold=True, color='FFFFFF', size=12)
-    header_style.fill = openpyxl.styles.PatternFill(start_color='70AD47', end_color='70AD47', fill_type='solid')
-    header_style.alignment = openpyxl.styles.Alignment(horizontal='center', vertical='center')
-    header_style.border = openpyxl.styles.Border(
-        left=openpyxl.styles.Side(style='thin'),
-        right=openpyxl.styles.Side(style='thin'),
-        top=openpyxl.styles.Side(style='thin'),
-        bottom=openpyxl.styles.Side(style='thin')
-    )
-    
-    # 数据行样式
-    data_style = openpyxl.styles.NamedStyle(name='SummaryDataStyle')
-    data_style.fill = openpyxl.styles.PatternFill(start_color='F0F8FF', end_color='F0F8FF', fill_type='solid')
-    data_style.border = openpyxl.styles.Border(
-        left=openpyxl.styles.Side(style='thin'),
-        right=openpyxl.styles.Side(style='thin'),
-        top=openpyxl.styles.Side(style='thin'),
-        bottom=openpyxl.styles.Side(style='thin')
-    )
-    
-    # 应用表头样式
-    for col in range(1, len(df.columns) + 1):
-        cell = worksheet.cell(row=1, column=col)
-        cell.style = header_style
-    
-    # 应用数据行样式
-    for row in range(2, len(df) + 2):
-        for col in range(1, len(df.columns) + 1):
-            cell = worksheet.cell(row=row, column=col)
-            cell.style = data_style
-    
-    # 调整列宽
-    for column in worksheet.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        worksheet.column_dimensions[column_letter].width = adjusted_width
\ No newline at end of file
+    return pd.DataFrame(summary_data)
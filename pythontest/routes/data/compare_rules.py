@@ -0,0 +1,195 @@
+"""
+字段比较规则
+
+mapping.csv 的可选 compare 列为字段指定比较规则，多条规则用分号分隔：
+
+- abs:0.01          数值绝对容差，|源 - 目标| <= 0.01 视为相同
+- rel:0.001         数值相对容差，|源 - 目标| <= 0.001 * max(|源|, |目标|) 视为相同
+- date:%Y-%m-%d     按固定格式解析日期后比较；date:源格式|目标格式 分别指定两边的格式
+- icase             忽略大小写
+- trim              忽略首尾空白，连续空白视为一个空格
+- regex:模式=>替换   比较前对字符串形式做正则替换（省略 =>替换 时删除匹配内容），必须是最后一条规则
+
+每个字段的规则在比较开始前编译一次，比较时按整列执行。字符串规则只作用于各列的不同取值，
+数值和日期规则按列转换类型；无法解析为数值/日期的值按（规则处理后的）字符串形式比较。
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from routes.data.key_codes import shared_value_codes, dictionary_encodable
+
+# 多条规则之间的分隔符
+RULE_SEPARATOR = ';'
+
+# 正则规则中模式与替换内容的分隔符
+REGEX_REPLACEMENT_SEPARATOR = '=>'
+
+# trim规则中视为一个空格的连续空白
+WHITESPACE = re.compile(r'\s+')
+
+# 容差边界上的浮点误差（如 100.01 - 100.00 略大于 0.01）按相同处理
+TOLERANCE_SLACK = 1e-9
+
+
+class FieldComparator:
+    """单个字段编译后的比较规则"""
+
+    def __init__(self, field: str, spec: str):
+        """
+        Args:
+            field: 源字段名（用于错误信息）
+            spec: compare列中的规则文本
+        """
+        self.field = field
+        self.spec = spec
+        # 字符串规则 [(规则名, 正则, 替换内容)]，保存为数据而不是函数，编译结果可以传给子进程
+        self.normalizers: List[Tuple[str, Optional[re.Pattern], str]] = []
+        self.abs_tolerance: Optional[float] = None
+        self.rel_tolerance: Optional[float] = None
+        self.date_formats: Optional[Tuple[str, str]] = None
+        self._parse(spec)
+
+    def _parse(self, spec: str):
+        remaining = spec.strip()
+        while remaining:
+            if remaining.lower().startswith('regex:'):
+                pattern, _, replacement = remaining[len('regex:'):].partition(REGEX_REPLACEMENT_SEPARATOR)
+                try:
+                    compiled = re.compile(pattern)
+                except re.error as e:
+                    raise ValueError(f"Invalid regex in compare rule for field '{self.field}': {e}")
+                self.normalizers.append(('regex', compiled, replacement))
+                break
+
+            token, _, remaining = remaining.partition(RULE_SEPARATOR)
+            remaining = remaining.strip()
+            name, _, argument = token.strip().partition(':')
+            name, argument = name.strip().lower(), argument.strip()
+            if not name:
+                continue
+            if name in ('abs', 'rel'):
+                tolerance = self._parse_tolerance(name, argument)
+                if name == 'abs':
+                    self.abs_tolerance = tolerance
+                else:
+                    self.rel_tolerance = tolerance
+            elif name == 'date':
+                if not argument:
+                    raise ValueError(f"Compare rule 'date' for field '{self.field}' requires a format")
+                source_format, _, target_format = argument.partition('|')
+                self.date_formats = (source_format, target_format or source_format)
+            elif name == 'icase':
+                self.normalizers.append(('icase', None, ''))
+            elif name == 'trim':
+                self.normalizers.append(('trim', WHITESPACE, ' '))
+            else:
+                raise ValueError(f"Unsupported compare rule '{token.strip()}' for field '{self.field}', "
+                                 f"expected abs/rel/date/icase/trim/regex")
+
+        if self.date_formats and self.numeric:
+            raise ValueError(f"Compare rules for field '{self.field}' cannot combine date and numeric tolerance")
+
+    def _parse_tolerance(self, name: str, argument: str) -> float:
+        try:
+            tolerance = float(argument)
+        except ValueError:
+            tolerance = -1.0
+        if not tolerance >= 0:
+            raise ValueError(f"Compare rule '{name}' for field '{self.field}' requires a non-negative number")
+        return tolerance
+
+    @property
+    def active(self) -> bool:
+        """是否包含至少一条规则"""
+        return bool(self.normalizers) or self.numeric or self.date_formats is not None
+
+    @property
+    def numeric(self) -> bool:
+        return self.abs_tolerance is not None or self.rel_tolerance is not None
+
+    def normalize(self, values: pd.Index) -> pd.Index:
+        """对字符串形式依次执行字符串规则"""
+        for name, pattern, replacement in self.normalizers:
+            if name == 'icase':
+                values = values.str.casefold()
+            elif name == 'trim':
+                values = values.str.strip().str.replace(pattern, replacement, regex=True)
+            else:
+                values = values.str.replace(pattern, replacement, regex=True)
+        return values
+
+    def values_differ(self, source_values: pd.Series, target_values: pd.Series) -> np.ndarray:
+        """比较两列非空值（与vectorized_compare.values_differ相同的约定）"""
+        if not self.numeric and not self.date_formats:
+            if dictionary_encodable(source_values) and dictionary_encodable(target_values):
+                source_codes, target_codes = shared_value_codes(source_values, target_values, self.normalize)
+                return source_codes != target_codes
+            return (self._normalized_strings(source_values).to_numpy(dtype=object)
+                    != self._normalized_strings(target_values).to_numpy(dtype=object))
+
+        source_prepared, target_prepared = source_values, target_values
+        if self.normalizers:
+            source_prepared = self._normalized_strings(source_values)
+            target_prepared = self._normalized_strings(target_values)
+
+        if self.date_formats:
+            source_parsed = _parse_dates(source_prepared, self.date_formats[0])
+            target_parsed = _parse_dates(target_prepared, self.date_formats[1])
+            parsed = ~np.isnat(source_parsed) & ~np.isnat(target_parsed)
+            differs = np.zeros(len(source_values), dtype=bool)
+            differs[parsed] = source_parsed[parsed] != target_parsed[parsed]
+        else:
+            source_parsed = pd.to_numeric(pd.Series(source_prepared), errors='coerce').to_numpy(dtype=float)
+            target_parsed = pd.to_numeric(pd.Series(target_prepared), errors='coerce').to_numpy(dtype=float)
+            parsed = ~np.isnan(source_parsed) & ~np.isnan(target_parsed)
+            differs = np.zeros(len(source_values), dtype=bool)
+            differs[parsed] = self._outside_tolerance(source_parsed[parsed], target_parsed[parsed])
+
+        # 无法解析的值按字符串形式比较
+        unparsed = ~parsed
+        if unparsed.any():
+            source_strings = np.asarray(pd.Series(source_prepared).astype(str), dtype=object)
+            target_strings = np.asarray(pd.Series(target_prepared).astype(str), dtype=object)
+            differs[unparsed] = source_strings[unparsed] != target_strings[unparsed]
+        return differs
+
+    def _outside_tolerance(self, source: np.ndarray, target: np.ndarray) -> np.ndarray:
+        delta = np.abs(source - target)
+        allowed = np.zeros(len(delta))
+        if self.abs_tolerance is not None:
+            allowed = np.maximum(allowed, self.abs_tolerance)
+        if self.rel_tolerance is not None:
+            allowed = np.maximum(allowed, self.rel_tolerance * np.maximum(np.abs(source), np.abs(target)))
+        with np.errstate(invalid='ignore'):
+            return ~(delta <= allowed * (1 + TOLERANCE_SLACK))
+
+    def _normalized_strings(self, values: pd.Series) -> pd.Index:
+        return self.normalize(pd.Index(values.astype(str).to_numpy(dtype=object)))
+
+
+def compile_compare_rules(compare_rules: Optional[Dict[str, str]]) -> Dict[str, FieldComparator]:
+    """
+    编译字段比较规则
+
+    Args:
+        compare_rules: {源字段名: 规则文本}
+
+    Returns:
+        {源字段名: FieldComparator}
+
+    Raises:
+        ValueError: 规则无法解析
+    """
+    comparators = {field: FieldComparator(field, spec) for field, spec in (compare_rules or {}).items()}
+    return {field: comparator for field, comparator in comparators.items() if comparator.active}
+
+
+def _parse_dates(values, date_format: str) -> np.ndarray:
+    """按固定格式解析日期，已是日期类型的列直接使用；无法解析的值为NaT"""
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values.to_numpy(dtype='datetime64[ns]')
+    return pd.to_datetime(values.astype(str), format=date_format, errors='coerce').to_numpy(dtype='datetime64[ns]')
@@ -0,0 +1,186 @@
+"""
+解析后数据集缓存
+
+按上传文件内容的哈希把解析结果保存为Feather列式文件，同一文件再次上传时
+通过内存映射直接加载，不再重新解析CSV。缓存总大小有上限，按最近使用淘汰。
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Dict, List, Any, Optional
+
+import pandas as pd
+from flask import current_app
+
+from routes.data.ingest import read_mapped_csv
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow未安装时缓存不可用，直接解析CSV
+    feather = None
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 计算文件哈希时每次读取的字节数
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class DatasetCache:
+    """解析后数据集的磁盘缓存"""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def available() -> bool:
+        """是否安装了pyarrow"""
+        return feather is not None
+
+    def read_csv(self, file, columns: Optional[List[str]] = None,
+                 field_types: Optional[Dict[str, str]] = None,
+                 digest: Optional[str] = None) -> pd.DataFrame:
+        """
+        读取CSV文件，命中缓存时直接加载解析结果
+
+        Args:
+            file: 文件路径或可seek的文件对象
+            columns: 需要读取的列，None表示读取全部列
+            field_types: 字段类型 {列名: 类型}
+            digest: 已计算好的文件内容哈希，避免重复计算
+
+        Returns:
+            数据框
+        """
+        key = self.cache_key(digest or file_digest(file), columns, field_types)
+
+        df = self.get(key)
+        if df is not None:
+            self.hits += 1
+            logger.info(f"Dataset cache hit: {key}")
+            return df
+
+        self.misses += 1
+        df = read_mapped_csv(file, columns, field_types)
+        self.put(key, df)
+        return df
+
+    @staticmethod
+    def cache_key(digest: str, columns: Optional[List[str]], field_types: Optional[Dict[str, str]]) -> str:
+        """缓存键 = 文件内容哈希 + 读取参数（列裁剪和字段类型会影响解析结果）"""
+        options = json.dumps({'columns': sorted(columns) if columns is not None else None,
+                              'field_types': field_types or {}}, sort_keys=True)
+        return f"{digest}_{hashlib.sha256(options.encode('utf-8')).hexdigest()[:16]}"
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """读取缓存的数据集，不存在时返回None"""
+        path = self._path(key)
+        try:
+            table = feather.read_table(path, memory_map=True)
+            # 更新修改时间，作为最近使用时间
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to read cached dataset {key}: {e}")
+            return None
+        return table.to_pandas()
+
+    def put(self, key: str, df: pd.DataFrame):
+        """写入缓存并按最近使用淘汰超出上限的条目"""
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            # 不压缩，读取时才能内存映射
+            df.to_feather(temp_path, compression='uncompressed')
+            if os.path.getsize(temp_path) > self.max_bytes:
+                logger.info(f"Dataset {key} exceeds cache size limit, not cached")
+                return
+            os.replace(temp_path, self._path(key))
+        except Exception as e:
+            # 例如混合类型的object列无法转换为Arrow格式
+            logger.warning(f"Failed to cache dataset {key}: {e}")
+            return
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self.evict()
+
+    def evict(self):
+        """删除最久未使用的条目，直到总大小不超过上限"""
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.feather'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    logger.info(f"Evicted cached dataset: {os.path.basename(path)}")
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.feather')]
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(entries),
+            'size_bytes': sum(entry.stat().st_size for entry in entries),
+            'max_bytes': self.max_bytes
+        }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.feather')
+
+
+def file_digest(file) -> str:
+    """计算文件内容的SHA-256哈希（文件对象读取后回到开头）"""
+    digest = hashlib.sha256()
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+    else:
+        file.seek(0)
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block if isinstance(block, bytes) else block.encode('utf-8'))
+        file.seek(0)
+    return digest.hexdigest()
+
+
+def get_dataset_cache() -> Optional[DatasetCache]:
+    """
+    获取当前应用的数据集缓存
+
+    Returns:
+        DatasetCache实例；未启用或pyarrow未安装时返回None
+    """
+    if not current_app.config.get('DATASET_CACHE_ENABLED', False):
+        return None
+    if not DatasetCache.available():
+        logger.warning("pyarrow is not installed, dataset cache disabled")
+        return None
+
+    cache = current_app.extensions.get('dataset_cache')
+    if cache is None:
+        cache = DatasetCache(current_app.config['DATASET_CACHE_DIR'],
+                             current_app.config['DATASET_CACHE_MAX_MB'] * 1024 * 1024)
+        current_app.extensions['dataset_cache'] = cache
+    return cache
@@ -0,0 +1,192 @@
+"""
+分桶摘要（Merkle式）CSV数据比较
+
+按关键字段哈希的前缀把两个表划分为分桶，先比较每个分桶的行数和摘要（桶内各行
+“关键字段哈希 + 比较字段哈希”之和），摘要一致的分桶视为完全相同；摘要不一致且
+行数较多的分桶按更长的哈希前缀继续拆分，只有最终不一致的小分桶才逐行比较。
+大表基本一致时，只需计算一遍哈希即可确认结果，不需要为每对记录生成比较数据。
+关键字段在任一表中重复的行不参与分桶摘要，直接逐行比较并单独报告。
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from routes.data.vectorized_compare import (
+    resolve_compare_fields, apply_target_mapping, compare_mapped_columns
+)
+from routes.data.external_compare import key_hashes, HASH_KEYS
+from routes.data.compare_rules import compile_compare_rules
+from routes.data.result_model import CompareResult
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 第一层分桶使用的哈希前缀位数（4096个分桶）
+INITIAL_BUCKET_BITS = 12
+
+# 每次拆分增加的前缀位数（一个分桶拆为16个）
+SPLIT_BITS = 4
+
+# 两表合计行数不超过该值的不一致分桶直接逐行比较，不再拆分
+LEAF_ROWS = 10000
+
+# 把关键字段哈希与比较字段哈希合成一行摘要时使用的乘数（64位黄金比例常数）
+DIGEST_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def compare_dataframes_digest(source_df: pd.DataFrame, target_df: pd.DataFrame,
+                              field_mapping: Dict[str, str], key_fields: List[str],
+                              leaf_rows: int = LEAF_ROWS,
+                              compare_rules: Optional[Dict[str, str]] = None,
+                              duplicate_order: Optional[List[str]] = None) -> CompareResult:
+    """
+    分桶摘要比较两个DataFrame
+
+    Args:
+        source_df: 源数据框
+        target_df: 目标数据框
+        field_mapping: 字段映射关系
+        key_fields: 关键字段列表
+        leaf_rows: 不再拆分、直接逐行比较的分桶行数上限
+        compare_rules: 字段比较规则 {源字段名: 规则}，见 compare_rules 模块；
+            摘要一致的分桶各行值完全相同，不受规则影响
+        duplicate_order: 重复键的配对方式，None为多对多展开，字段列表为按这些字段排序后逐个配对
+
+    Returns:
+        列式比较结果（可按字典访问，结构同compare_dataframes，记录按源表行顺序排列）
+    """
+    field_mapping, key_fields = resolve_compare_fields(source_df, target_df, field_mapping, key_fields)
+
+    logger.info(f"Field mapping: {field_mapping}")
+    logger.info(f"Key fields: {key_fields}")
+
+    mapped_target_df = apply_target_mapping(target_df, field_mapping)
+    compare_columns = [
+        source_field for source_field in field_mapping
+        if source_field not in key_fields
+        and source_field in source_df.columns and source_field in mapped_target_df.columns
+    ]
+
+    source_keys = key_hashes(source_df[key_fields], HASH_KEYS[0])
+    target_keys = key_hashes(mapped_target_df[key_fields], HASH_KEYS[0])
+    source_digests, target_digests = row_digests(source_df, mapped_target_df, compare_columns)
+    source_digests = source_digests ^ (source_keys * DIGEST_MULTIPLIER)
+    target_digests = target_digests ^ (target_keys * DIGEST_MULTIPLIER)
+
+    # 重复键的行直接逐行比较，分桶摘要只覆盖两边都唯一的关键字段
+    duplicated = duplicated_hashes(source_keys, target_keys)
+    source_unique = np.flatnonzero(~np.isin(source_keys, duplicated))
+    target_unique = np.flatnonzero(~np.isin(target_keys, duplicated))
+
+    matched_positions, source_positions, target_positions = drill_down(
+        source_keys[source_unique], source_digests[source_unique],
+        target_keys[target_unique], target_digests[target_unique], leaf_rows)
+    source_positions = np.union1d(source_unique[source_positions],
+                                  np.setdiff1d(np.arange(len(source_keys)), source_unique, assume_unique=True))
+    target_positions = np.union1d(target_unique[target_positions],
+                                  np.setdiff1d(np.arange(len(target_keys)), target_unique, assume_unique=True))
+    logger.info(f"Digest compare: {len(source_positions)} source rows and {len(target_positions)} "
+                f"target rows in mismatched buckets or under duplicate keys")
+
+    result = compare_mapped_columns(source_df.iloc[source_positions],
+                                    mapped_target_df.iloc[target_positions],
+                                    field_mapping, key_fields, compile_compare_rules(compare_rules),
+                                    duplicate_order)
+
+    # 摘要一致的分桶中每个关键字段两边各一行且完全相同
+    result.summary['source_total_records'] = len(source_df)
+    result.summary['target_total_records'] = len(mapped_target_df)
+    result.summary['matching_records'] += len(matched_positions)
+
+    logger.info(f"Comparison completed: {result.summary}")
+
+    return result
+
+
+def row_digests(source_df: pd.DataFrame, mapped_target_df: pd.DataFrame,
+                compare_columns: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    计算两表每行在比较字段上的64位哈希
+
+    两边类型相同的列直接哈希；类型不同的列按字符串形式哈希，与逐列比较的规则一致。
+    哈希相同的行在比较字段上一定没有差异（哈希碰撞除外），哈希不同则需逐行确认。
+    """
+    if not compare_columns:
+        return np.zeros(len(source_df), dtype=np.uint64), np.zeros(len(mapped_target_df), dtype=np.uint64)
+
+    source_columns, target_columns = {}, {}
+    for column in compare_columns:
+        source_values, target_values = source_df[column], mapped_target_df[column]
+        if source_values.dtype != target_values.dtype:
+            source_values, target_values = source_values.astype(str), target_values.astype(str)
+        source_columns[column] = source_values
+        target_columns[column] = target_values
+
+    return (pd.util.hash_pandas_object(pd.DataFrame(source_columns), index=False, categorize=False).to_numpy(),
+            pd.util.hash_pandas_object(pd.DataFrame(target_columns), index=False, categorize=False).to_numpy())
+
+
+def drill_down(source_keys: np.ndarray, source_digests: np.ndarray,
+               target_keys: np.ndarray, target_digests: np.ndarray,
+               leaf_rows: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    逐层比较分桶摘要，拆分不一致的大分桶
+
+    Returns:
+        (摘要一致分桶中的源表行位置, 需逐行比较的源表行位置, 需逐行比较的目标表行位置)
+    """
+    source_candidates = np.arange(len(source_keys))
+    target_candidates = np.arange(len(target_keys))
+    empty = np.empty(0, dtype=np.int64)
+    matched, source_leaves, target_leaves = [empty], [empty], [empty]
+
+    bits = INITIAL_BUCKET_BITS
+    while len(source_candidates) or len(target_candidates):
+        shift = np.uint64(64 - bits)
+        source_prefix = source_keys[source_candidates] >> shift
+        target_prefix = target_keys[target_candidates] >> shift
+        if bits == INITIAL_BUCKET_BITS:
+            num_buckets = 1 << bits
+            source_buckets, target_buckets = source_prefix.astype(np.int64), target_prefix.astype(np.int64)
+        else:
+            prefixes, buckets = np.unique(np.concatenate([source_prefix, target_prefix]), return_inverse=True)
+            num_buckets = len(prefixes)
+            source_buckets, target_buckets = np.split(buckets.ravel(), [len(source_prefix)])
+
+        source_count, source_sum = bucket_digests(source_buckets, source_digests[source_candidates], num_buckets)
+        target_count, target_sum = bucket_digests(target_buckets, target_digests[target_candidates], num_buckets)
+        mismatched = (source_count != target_count) | (source_sum != target_sum)
+        # 哈希位数用尽时（例如重复键）不能再拆分
+        split = mismatched & (source_count + target_count > leaf_rows) & (bits < 64)
+        logger.debug(f"Digest level {bits} bits: {num_buckets} buckets, "
+                     f"{int(mismatched.sum())} mismatched, {int(split.sum())} split")
+
+        matched.append(source_candidates[~mismatched[source_buckets]])
+        source_leaves.append(source_candidates[mismatched[source_buckets] & ~split[source_buckets]])
+        target_leaves.append(target_candidates[mismatched[target_buckets] & ~split[target_buckets]])
+        source_candidates = source_candidates[split[source_buckets]]
+        target_candidates = target_candidates[split[target_buckets]]
+        bits = min(64, bits + SPLIT_BITS)
+
+    return (np.concatenate(matched),
+            np.sort(np.concatenate(source_leaves)),
+            np.sort(np.concatenate(target_leaves)))
+
+
+def duplicated_hashes(source_keys: np.ndarray, target_keys: np.ndarray) -> np.ndarray:
+    """在任一表中出现多次的关键字段哈希（排序后去重）"""
+    duplicated = []
+    for keys in (source_keys, target_keys):
+        sorted_keys = np.sort(keys)
+        duplicated.append(sorted_keys[1:][sorted_keys[1:] == sorted_keys[:-1]])
+    return np.unique(np.concatenate(duplicated))
+
+
+def bucket_digests(buckets: np.ndarray, digests: np.ndarray, num_buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """每个分桶的行数和摘要（行摘要按64位无符号整数求和，溢出回绕，与行顺序无关）"""
+    counts = np.bincount(buckets, minlength=num_buckets)
+    sums = np.zeros(num_buckets, dtype=np.uint64)
+    np.add.at(sums, buckets, digests)
+    return counts, sums
@@ -0,0 +1,323 @@
+"""
+流式写出Excel报告
+
+报告使用openpyxl的write-only模式逐行写出：工作表数据按段生成（列式结果见
+CompareResult.*_frame(start, stop)），每段的值立即追加到工作表，写出的行不再保留为
+单元格对象，内存与报告行数无关。
+
+数据行一般不逐个单元格设置样式：每组使用同一样式的相邻列写一条覆盖整个数据区域的条件格式
+（公式恒为TRUE），背景色、字体和边框由条件格式的差异样式（dxf）给出，同样的差异样式在
+工作簿中只保存一份。差异样式不能使用粗边框，所以值差异的Diff_列与表头一样使用命名样式，
+每列一个设置好样式的单元格，逐行只替换其中的值。
+列宽需要在写出第一行之前确定，按工作表前 WIDTH_SAMPLE_ROWS 行的字符串长度统计估计，
+不再对全部数据多遍历一次（见 utils.column_widths，桌面工具导出Excel时使用同一函数）。
+
+超过Excel行数上限的工作表按结果计数预先拆分为编号工作表，数据行太多时拆分为多个工作簿，
+逐个写入zip文件，并附带索引（见 plan_report）；不会先生成一个超限的工作簿。
+"""
+import logging
+import zipfile
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import openpyxl
+import pandas as pd
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import Rule
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.styles.differential import DifferentialStyle
+from openpyxl.utils import get_column_letter
+
+from utils.column_widths import WIDTH_SAMPLE_ROWS, frame_column_widths
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 每次生成并写出的行数
+REPORT_CHUNK_ROWS = 50000
+
+# 每个工作表的最多数据行数（Excel上限1048576行，减去表头）
+SHEET_MAX_ROWS = 1048575
+
+# 每个工作簿的最多数据行数，超过时报告拆分为多个工作簿打包为zip
+WORKBOOK_MAX_ROWS = 2 * SHEET_MAX_ROWS
+
+# 报告拆分为多个工作簿时与索引一起放在 index.xlsx 中的工作表
+INDEX_WORKBOOK_SHEETS = ('Summary',)
+
+
+def _fill(color: str) -> PatternFill:
+    return PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+
+def _border(style: str = 'thin', color: Optional[str] = None) -> Border:
+    side = Side(style=style, color=color)
+    return Border(left=side, right=side, top=side, bottom=side)
+
+
+def _header_style(name: str, color: str) -> NamedStyle:
+    return NamedStyle(name=name, font=Font(bold=True, color='FFFFFF', size=12), fill=_fill(color),
+                      alignment=Alignment(horizontal='center', vertical='center'), border=_border())
+
+
+def _data_format(color: Optional[str] = None, font: Optional[Font] = None,
+                 border: Optional[Border] = None) -> DifferentialStyle:
+    return DifferentialStyle(font=font, fill=_fill(color) if color else None, border=border or _border())
+
+
+def header_styles() -> List[NamedStyle]:
+    """各工作表表头的命名样式（颜色见 BEAUTIFIED_EXCEL_README.md）"""
+    return [
+        _header_style('HeaderStyle', '366092'),
+        _header_style('TargetOnlyHeaderStyle', '366092'),
+        _header_style('DuplicateKeysHeaderStyle', '366092'),
+        _header_style('ValueHeaderStyle', 'C5504B'),
+        _header_style('SummaryHeaderStyle', '70AD47'),
+    ]
+
+
+def cell_styles() -> List[NamedStyle]:
+    """数据行中逐个单元格设置的命名样式（条件格式的差异样式不支持粗边框）"""
+    return [
+        NamedStyle(name='DiffStyle', font=Font(bold=True, color='FFFFFF'), fill=_fill('FF6B6B'),
+                   border=_border('thick', 'FF0000')),
+    ]
+
+
+# 数据行的差异样式（用于条件格式），不在其中的数据行样式见 cell_styles
+DATA_FORMATS = {
+    'DataStyle': _data_format('FFE6E6'),
+    'TargetOnlyDataStyle': _data_format('E2EFDA'),
+    'DuplicateKeysDataStyle': _data_format('FCE4D6'),
+    'KeyStyle': _data_format('E6F3FF'),
+    'SourceStyle': _data_format('FFF2CC'),
+    'TargetStyle': _data_format('E1D5E7'),
+    'DefaultStyle': _data_format(),
+    'SummaryDataStyle': _data_format('F0F8FF'),
+}
+
+# 各工作表的 (表头样式, 数据行样式)，数据行样式为None时按列名前缀选择
+SHEET_STYLES = {
+    'Data_Loss': ('HeaderStyle', 'DataStyle'),
+    'Target_Only': ('TargetOnlyHeaderStyle', 'TargetOnlyDataStyle'),
+    'Duplicate_Keys': ('DuplicateKeysHeaderStyle', 'DuplicateKeysDataStyle'),
+    'Value_Differences': ('ValueHeaderStyle', None),
+    'Summary': ('SummaryHeaderStyle', 'SummaryDataStyle'),
+    'Index': ('SummaryHeaderStyle', 'SummaryDataStyle'),
+}
+
+# 值差异工作表按列名前缀选择的样式
+VALUE_DIFF_COLUMN_STYLES = (
+    ('Key_', 'KeyStyle'),
+    ('Source_', 'SourceStyle'),
+    ('Target_', 'TargetStyle'),
+    ('Diff_', 'DiffStyle'),
+)
+
+
+def column_data_styles(sheet_name: str, columns: List[str]) -> List[str]:
+    """工作表每列数据行的样式名称"""
+    data_style = SHEET_STYLES[sheet_name][1]
+    if data_style is not None:
+        return [data_style] * len(columns)
+    return [next((style for prefix, style in VALUE_DIFF_COLUMN_STYLES if str(column).startswith(prefix)),
+                 'DefaultStyle') for column in columns]
+
+
+class ReportSheet:
+    """
+    报告中的一个工作表
+
+    render(start, stop) 生成第 start 到 stop 行的数据框（列与 columns 一致），rows 为总行数；
+    sample(n) 返回不超过n行的样本，用于估计列宽，默认取前n行。
+    kind 为工作表类型（SHEET_STYLES的键），拆分后的编号工作表与原工作表相同；
+    first_row 为该工作表第一行在原工作表中的位置。
+    """
+
+    def __init__(self, name: str, columns: List[str], render: Callable[[int, int], pd.DataFrame], rows: int,
+                 chunk_rows: int = REPORT_CHUNK_ROWS, sample: Optional[Callable[[int], pd.DataFrame]] = None,
+                 kind: Optional[str] = None, first_row: int = 0):
+        self.name = name
+        self.columns = list(columns)
+        self.render = render
+        self.rows = rows
+        self.chunk_rows = chunk_rows
+        self.sample = sample or (lambda sample_rows: render(0, min(sample_rows, rows)))
+        self.kind = kind or name
+        self.first_row = first_row
+
+    @classmethod
+    def from_frame(cls, name: str, frame: pd.DataFrame, chunk_rows: int = REPORT_CHUNK_ROWS) -> 'ReportSheet':
+        """已完整生成的数据框（字典结构的结果、摘要）"""
+        return cls(name, frame.columns, lambda start, stop: frame.iloc[start:stop], len(frame), chunk_rows)
+
+    @classmethod
+    def from_renderer(cls, name: str, render: Callable[[int, Optional[int]], pd.DataFrame], rows: int,
+                      chunk_rows: int = REPORT_CHUNK_ROWS) -> 'ReportSheet':
+        """按段渲染的列式结果，render(start, stop) 同 CompareResult.*_frame"""
+        return cls(name, render(0, 0).columns, render, rows, chunk_rows)
+
+    def chunks(self) -> Iterator[pd.DataFrame]:
+        """从头按段生成数据框"""
+        for start in range(0, self.rows, self.chunk_rows):
+            yield self.render(start, min(start + self.chunk_rows, self.rows))
+
+    def split(self, max_rows: int) -> List['ReportSheet']:
+        """
+        按行数拆分为编号工作表（Data_Loss_1, Data_Loss_2, ...），不超过 max_rows 行时返回自身
+
+        编号工作表按行位置渲染原工作表的一段，列宽使用原工作表的样本估计，各部分一致。
+        """
+        if self.rows <= max_rows:
+            return [self]
+        return [ReportSheet(f'{self.name}_{number}', self.columns,
+                            lambda start, stop, offset=offset: self.render(offset + start, offset + stop),
+                            min(max_rows, self.rows - offset), self.chunk_rows, self.sample, self.kind,
+                            self.first_row + offset)
+                for number, offset in enumerate(range(0, self.rows, max_rows), start=1)]
+
+
+def plan_report(sheets: List[ReportSheet], sheet_max_rows: int = SHEET_MAX_ROWS,
+                workbook_max_rows: int = WORKBOOK_MAX_ROWS) -> List[Tuple[str, List[ReportSheet]]]:
+    """
+    按各工作表的行数预先规划报告的工作簿和工作表，不生成任何数据
+
+    超过 sheet_max_rows 行的工作表拆分为编号工作表。全部数据行不超过 workbook_max_rows 时
+    只有一个工作簿，有工作表被拆分时在最前面加一个 Index 工作表；否则各工作表按顺序装入
+    report_1.xlsx、report_2.xlsx ...（每个不超过 workbook_max_rows 行），index.xlsx 中的
+    Index 工作表列出每个工作表所在的文件和行范围，摘要（INDEX_WORKBOOK_SHEETS）也放在 index.xlsx 中。
+
+    Args:
+        sheets: 按顺序写出的工作表
+        sheet_max_rows: 每个工作表的最多数据行数（默认为Excel上限减去表头）
+        workbook_max_rows: 每个工作簿的最多数据行数
+
+    Returns:
+        [(文件名, 工作表列表)]，只有一个工作簿时文件名为 report.xlsx
+    """
+    parts = [part for sheet in sheets for part in sheet.split(min(sheet_max_rows, workbook_max_rows))]
+    if sum(part.rows for part in parts) <= workbook_max_rows:
+        if len(parts) == len(sheets):
+            return [('report.xlsx', parts)]
+        return [('report.xlsx', [index_sheet([('report.xlsx', parts)], with_file=False)] + parts)]
+
+    workbooks = []
+    workbook_rows = 0
+    for part in parts:
+        if part.kind in INDEX_WORKBOOK_SHEETS:
+            continue
+        if not workbooks or workbook_rows + part.rows > workbook_max_rows:
+            workbooks.append((f'report_{len(workbooks) + 1}.xlsx', []))
+            workbook_rows = 0
+        workbooks[-1][1].append(part)
+        workbook_rows += part.rows
+    overview = [part for part in parts if part.kind in INDEX_WORKBOOK_SHEETS]
+    index = index_sheet(workbooks + [('index.xlsx', overview)])
+    return [('index.xlsx', [index] + overview)] + workbooks
+
+
+def index_sheet(workbooks: List[Tuple[str, List[ReportSheet]]], with_file: bool = True) -> ReportSheet:
+    """报告的索引：每个工作表所在的文件、记录数和在原工作表中的行范围（从1开始）"""
+    index_df = pd.DataFrame([{'File': file_name, 'Sheet': sheet.name, 'Type': sheet.kind, 'Records': sheet.rows,
+                              'First_Record': sheet.first_row + 1, 'Last_Record': sheet.first_row + sheet.rows}
+                             for file_name, workbook_sheets in workbooks for sheet in workbook_sheets])
+    return ReportSheet.from_frame('Index', index_df if with_file else index_df.drop(columns='File'))
+
+
+def write_excel_report(path: str, sheets: Iterable[ReportSheet]):
+    """
+    逐段写出带样式的Excel报告
+
+    Args:
+        path: 输出文件路径或可写的文件对象
+        sheets: 按顺序写出的工作表
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    for style in header_styles() + cell_styles():
+        workbook.add_named_style(style)
+
+    for sheet in sheets:
+        worksheet = workbook.create_sheet(sheet.name)
+
+        for i, width in enumerate(column_widths(sheet), start=1):
+            worksheet.column_dimensions[get_column_letter(i)].width = width
+
+        worksheet.append([_styled_cell(worksheet, column, SHEET_STYLES[sheet.kind][0]) for column in sheet.columns])
+        styled_columns = _styled_columns(worksheet, column_data_styles(sheet.kind, sheet.columns))
+        rows = 0
+        for chunk in sheet.chunks():
+            for values in _cell_values(chunk):
+                worksheet.append(_styled_row(values, styled_columns) if styled_columns else values)
+            rows += len(chunk)
+
+        if rows:
+            for cell_range, style in column_style_ranges(sheet.kind, sheet.columns, rows):
+                worksheet.conditional_formatting.add(
+                    cell_range, Rule(type='expression', formula=['TRUE'], dxf=DATA_FORMATS[style]))
+        logger.debug(f"Sheet {sheet.name}: {rows} rows written")
+
+    workbook.save(path)
+
+
+def write_report_archive(path: str, workbooks: List[Tuple[str, List[ReportSheet]]]):
+    """
+    把规划好的多个工作簿依次写入zip文件
+
+    每个工作簿直接写入zip条目，不在磁盘上另存；xlsx本身已经压缩，条目不再压缩。
+
+    Args:
+        path: zip文件路径
+        workbooks: plan_report 返回的 [(文件名, 工作表列表)]
+    """
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for file_name, sheets in workbooks:
+            with archive.open(file_name, 'w', force_zip64=True) as entry:
+                write_excel_report(entry, sheets)
+            logger.info(f"Report part {file_name} written: {sum(sheet.rows for sheet in sheets)} rows")
+
+
+def column_style_ranges(sheet_name: str, columns: List[str], rows: int) -> List[tuple]:
+    """相邻同样式的列合并后的条件格式数据区域，如 [('B2:D101', 'SourceStyle')]（不含使用命名样式的列）"""
+    ranges = []
+    styles = column_data_styles(sheet_name, columns)
+    start = 0
+    for i in range(1, len(styles) + 1):
+        if i == len(styles) or styles[i] != styles[start]:
+            if styles[start] in DATA_FORMATS:
+                ranges.append((f'{get_column_letter(start + 1)}2:{get_column_letter(i)}{rows + 1}', styles[start]))
+            start = i
+    return ranges
+
+
+def column_widths(sheet: ReportSheet) -> List[float]:
+    """工作表各列的宽度，按不超过 WIDTH_SAMPLE_ROWS 行的样本估计"""
+    return frame_column_widths(sheet.sample(WIDTH_SAMPLE_ROWS).reindex(columns=sheet.columns))
+
+
+def _cell_values(chunk: pd.DataFrame) -> Iterator[tuple]:
+    """数据框的行（空值转换为None，写出为空单元格）"""
+    values = chunk.astype(object)
+    return values.where(chunk.notna(), None).itertuples(index=False, name=None)
+
+
+def _styled_cell(worksheet, value, style: str) -> WriteOnlyCell:
+    cell = WriteOnlyCell(worksheet, value)
+    cell.style = style
+    return cell
+
+
+def _styled_columns(worksheet, styles: List[str]) -> List[tuple]:
+    """
+    使用命名样式的列：[(列位置, 已设置样式的单元格)]
+
+    write-only工作表追加一行时立即写出，所以每列的单元格只设置一次样式，之后每行只替换值。
+    """
+    return [(i, _styled_cell(worksheet, None, style)) for i, style in enumerate(styles) if style not in DATA_FORMATS]
+
+
+def _styled_row(values: tuple, styled_columns: List[tuple]) -> list:
+    """一行的值，使用命名样式的列替换为该列的单元格"""
+    row = list(values)
+    for i, cell in styled_columns:
+        cell.value = row[i]
+        row[i] = cell
+    return row
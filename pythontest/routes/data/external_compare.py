@@ -0,0 +1,361 @@
+"""
+外存CSV数据比较
+
+按关键字段哈希把两个CSV分块写入磁盘分区，再逐个分区加载并比较，
+峰值内存由 memory_budget_mb 约束，适用于大于内存的文件。
+
+每个分区比较后只保留差异记录涉及的行，这些行占用的内存计入预算（见 MemoryBudget），
+后续分区按剩余的预算划分。预算不足时抛出 MemoryBudgetExceeded，不会超出预算继续比较：
+同一关键字段的行太多、用完全部哈希密钥重新分区后仍超出预算，或者差异记录本身超出预算。
+"""
+import hashlib
+import logging
+import math
+import os
+import shutil
+import tempfile
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from routes.data.vectorized_compare import (
+    resolve_compare_fields, map_target_columns, apply_target_mapping,
+    compare_mapped_columns, compact_partial, merge_partial_results
+)
+from routes.data.ingest import csv_read_options, apply_field_types, compare_read_plan
+from routes.data.compare_rules import FieldComparator, compile_compare_rules
+from routes.data.result_model import CompareResult
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 分区文件中记录原始行号的列
+ROW_ID = '__row_id__'
+
+# CSV字节数到内存DataFrame（含比较时的临时数据）的估算放大系数
+MEMORY_EXPANSION = 4
+
+# 分区数量上限（同时打开的分区文件数）
+MAX_PARTITIONS = 256
+
+# 分区仍然过大时重新分区的最大层数，每层使用不同的哈希密钥
+HASH_KEYS = ['csvcompare000000', 'csvcompare111111', 'csvcompare222222', 'csvcompare333333']
+
+# 每次读取的最少行数
+MIN_CHUNK_ROWS = 1000
+
+MB = 1024 * 1024
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """外存比较不能在内存预算内完成"""
+
+
+class MemoryBudget:
+    """外存比较的内存预算，已保留的差异记录占用的内存从可用预算中扣除"""
+
+    def __init__(self, total_bytes: int):
+        self.total_bytes = total_bytes
+        self.retained_bytes = 0
+
+    @property
+    def available_bytes(self) -> int:
+        return self.total_bytes - self.retained_bytes
+
+    def retain(self, frames: Iterable[pd.DataFrame]):
+        """计入保留的数据框，超出预算时抛出 MemoryBudgetExceeded"""
+        self.retained_bytes += sum(int(frame.memory_usage(index=True, deep=True).sum()) for frame in frames)
+        if self.retained_bytes > self.total_bytes:
+            raise MemoryBudgetExceeded(
+                f"Differing records need more than the memory budget of {self.total_bytes / MB:.2f} MB, "
+                f"increase memory_budget_mb")
+
+
+def compare_csv_files_external(source_path: str, target_path: str,
+                               field_mapping: Dict[str, str], key_fields: List[str],
+                               memory_budget_mb: float = 512,
+                               work_dir: Optional[str] = None,
+                               field_types: Optional[Dict[str, str]] = None,
+                               prune_columns: bool = False,
+                               compare_rules: Optional[Dict[str, str]] = None,
+                               duplicate_order: Optional[List[str]] = None) -> CompareResult:
+    """
+    外存方式比较两个CSV文件
+
+    Args:
+        source_path: 源CSV文件路径
+        target_path: 目标CSV文件路径
+        field_mapping: 字段映射关系
+        key_fields: 关键字段列表
+        memory_budget_mb: 内存预算 (MB)，决定分块大小和分区数量
+        work_dir: 分区临时文件所在目录，默认使用系统临时目录
+        field_types: 字段类型 {源字段名: 类型}，见 ingest.FIELD_TYPES
+        prune_columns: 是否只读取关键字段和映射字段
+        compare_rules: 字段比较规则 {源字段名: 规则}，见 compare_rules 模块
+        duplicate_order: 重复键的配对方式，None为多对多展开，字段列表为按这些字段排序后逐个配对
+
+    Returns:
+        列式比较结果（可按字典访问，结构同compare_dataframes，记录按源表行顺序排列），
+        只引用差异记录涉及的行
+
+    Raises:
+        MemoryBudgetExceeded: 比较不能在内存预算内完成
+    """
+    if memory_budget_mb <= 0:
+        raise ValueError('memory_budget_mb must be positive')
+    budget_bytes = int(memory_budget_mb * MB)
+    budget = MemoryBudget(budget_bytes)
+    comparators = compile_compare_rules(compare_rules)
+
+    source_read_columns, source_types, target_read_columns, target_types = compare_read_plan(
+        field_mapping, key_fields, field_types or {})
+    if not prune_columns:
+        source_read_columns = target_read_columns = None
+    source_options = csv_read_options(source_read_columns, source_types)
+    target_options = csv_read_options(target_read_columns, target_types)
+
+    source_columns = list(pd.read_csv(source_path, nrows=0, **source_options).columns)
+    target_columns = list(pd.read_csv(target_path, nrows=0, **target_options).columns)
+    field_mapping, key_fields = resolve_compare_fields(
+        pd.DataFrame(columns=source_columns), pd.DataFrame(columns=target_columns),
+        field_mapping, key_fields)
+
+    logger.info(f"Field mapping: {field_mapping}")
+    logger.info(f"Key fields: {key_fields}")
+
+    # 目标表中与关键字段对应的原始列名
+    mapped_target_columns = map_target_columns(target_columns, field_mapping)
+    missing = [field for field in key_fields
+               if field not in source_columns or field not in mapped_target_columns]
+    if missing:
+        raise KeyError(f"Key fields not found in both files: {missing}")
+    target_key_columns = [target_columns[mapped_target_columns.index(field)] for field in key_fields]
+
+    total_bytes = os.path.getsize(source_path) + os.path.getsize(target_path)
+    num_partitions = min(MAX_PARTITIONS, max(1, math.ceil(total_bytes * MEMORY_EXPANSION / budget_bytes)))
+
+    partition_dir = tempfile.mkdtemp(prefix='csv_compare_', dir=work_dir)
+    try:
+        source_parts, source_dtypes = partition_csv(
+            source_path, key_fields, num_partitions, budget_bytes, partition_dir, 'source', source_options)
+        target_parts, target_dtypes = partition_csv(
+            target_path, target_key_columns, num_partitions, budget_bytes, partition_dir, 'target',
+            target_options)
+
+        logger.info(f"External compare: {num_partitions} partitions, budget {memory_budget_mb} MB")
+
+        partials = []
+        for source_part, target_part in zip(source_parts, target_parts):
+            partials.extend(_compare_partition(
+                source_part, target_part, source_dtypes, target_dtypes,
+                key_fields, target_key_columns, field_mapping, budget, depth=1,
+                source_types=source_types, target_types=target_types, comparators=comparators,
+                duplicate_order=duplicate_order))
+    finally:
+        shutil.rmtree(partition_dir, ignore_errors=True)
+
+    # 保留的行按原始行号排列，部分结果中的行号转换为在其中的行位置
+    source_df = pd.concat([partial[0] for partial in partials]).sort_index()
+    mapped_target_df = pd.concat([partial[1] for partial in partials]).sort_index()
+    positions = [_label_positions(partial[2], source_df.index, mapped_target_df.index) for partial in partials]
+    result = merge_partial_results(positions, source_df, mapped_target_df, field_mapping, key_fields)
+
+    logger.info(f"Comparison completed: {result['summary']}")
+
+    return result
+
+
+def partition_csv(path: str, key_columns: List[str], num_partitions: int, budget_bytes: int,
+                  partition_dir: str, prefix: str,
+                  read_options: Optional[Dict[str, Any]] = None) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    分块读取CSV并按关键字段哈希写入分区文件
+
+    read_options 为 ingest.csv_read_options 生成的列裁剪和类型参数。
+
+    Returns:
+        (分区文件路径列表, 各列在整个文件上推断出的数据类型)
+    """
+    chunk_rows = _estimate_chunk_rows(path, budget_bytes)
+    dtypes = {}
+
+    def chunks():
+        row_offset = 0
+        for chunk in pd.read_csv(path, chunksize=chunk_rows, **(read_options or {})):
+            for column in chunk.columns:
+                dtypes[column] = _union_dtype(dtypes.get(column), chunk[column].dtype)
+            chunk.index = pd.RangeIndex(row_offset, row_offset + len(chunk), name=ROW_ID)
+            row_offset += len(chunk)
+            yield chunk
+
+    paths = _write_partitions(chunks(), key_columns, num_partitions, partition_dir, prefix, HASH_KEYS[0])
+    return paths, dtypes
+
+
+def _compare_partition(source_part: str, target_part: str,
+                       source_dtypes: Dict[str, Any], target_dtypes: Dict[str, Any],
+                       key_fields: List[str], target_key_columns: List[str],
+                       field_mapping: Dict[str, str], budget: MemoryBudget, depth: int,
+                       source_types: Optional[Dict[str, str]] = None,
+                       target_types: Optional[Dict[str, str]] = None,
+                       comparators: Optional[Dict[str, FieldComparator]] = None,
+                       duplicate_order: Optional[List[str]] = None
+                       ) -> List[Tuple[pd.DataFrame, pd.DataFrame, tuple]]:
+    """
+    比较一对分区；分区超出可用的内存预算时用新的哈希密钥再次分区
+
+    Returns:
+        每个（子）分区的 (差异记录涉及的源表行, 差异记录涉及的目标表行（列名已映射）,
+        行标签为原始行号的 compact_partial 结果)
+    """
+    part_bytes = os.path.getsize(source_part) + os.path.getsize(target_part)
+    if part_bytes * MEMORY_EXPANSION > budget.available_bytes:
+        if depth >= len(HASH_KEYS):
+            raise MemoryBudgetExceeded(
+                f"A partition of {part_bytes / MB:.2f} MB still exceeds the available memory budget of "
+                f"{budget.available_bytes / MB:.2f} MB ({budget.retained_bytes / MB:.2f} MB used by differing "
+                f"records) after {len(HASH_KEYS)} levels of re-partitioning; too many rows probably share the "
+                f"same key values, increase memory_budget_mb")
+        fanout = min(MAX_PARTITIONS, math.ceil(part_bytes * MEMORY_EXPANSION / budget.available_bytes))
+        partition_dir = os.path.dirname(source_part)
+        prefix = f'{os.path.basename(source_part)}_{depth}'
+        source_subparts = _write_partitions(
+            _read_partition_chunks(source_part, source_dtypes, budget.available_bytes),
+            key_fields, fanout, partition_dir, f'{prefix}_source', HASH_KEYS[depth])
+        target_subparts = _write_partitions(
+            _read_partition_chunks(target_part, target_dtypes, budget.available_bytes),
+            target_key_columns, fanout, partition_dir, f'{prefix}_target', HASH_KEYS[depth])
+        os.remove(source_part)
+        os.remove(target_part)
+
+        partials = []
+        for source_subpart, target_subpart in zip(source_subparts, target_subparts):
+            partials.extend(_compare_partition(
+                source_subpart, target_subpart, source_dtypes, target_dtypes,
+                key_fields, target_key_columns, field_mapping, budget, depth + 1,
+                source_types=source_types, target_types=target_types, comparators=comparators,
+                duplicate_order=duplicate_order))
+        return partials
+
+    source_df = apply_field_types(_read_partition(source_part, source_dtypes), source_types or {})
+    target_df = apply_field_types(_read_partition(target_part, target_dtypes), target_types or {})
+    mapped_target_df = apply_target_mapping(target_df, field_mapping)
+    result = compare_mapped_columns(source_df, mapped_target_df, field_mapping, key_fields, comparators,
+                                    duplicate_order)
+
+    # 只保留差异记录涉及的行
+    duplicate_rows = (result.duplicate_source_rows, result.duplicate_target_rows)
+    source_rows = np.unique(np.concatenate([result.loss_rows, result.diff_source_rows,
+                                            duplicate_rows[0][duplicate_rows[0] >= 0]]))
+    target_rows = np.unique(np.concatenate([result.target_only_rows, result.diff_target_rows,
+                                            duplicate_rows[1][duplicate_rows[1] >= 0]]))
+    retained = (source_df.iloc[source_rows], mapped_target_df.iloc[target_rows])
+    budget.retain(retained)
+    return [retained + (compact_partial(result),)]
+
+
+def _label_positions(partial: tuple, source_index: pd.Index, target_index: pd.Index) -> tuple:
+    """把 compact_partial 结果中的行标签（原始行号）转换为在按行号排列的保留行中的位置"""
+    def positions(index: pd.Index, labels: np.ndarray) -> np.ndarray:
+        found = labels >= 0
+        result = np.full(labels.shape, -1, dtype=np.int64)
+        result[found] = index.searchsorted(labels[found])
+        return result
+
+    (loss, target_only, diff_source, diff_target, diff_bits, duplicates,
+     duplicate_source_counts, duplicate_target_counts, summary) = partial
+    duplicates = np.column_stack([positions(source_index, duplicates[:, 0]),
+                                  positions(target_index, duplicates[:, 1])]) if len(duplicates) else duplicates
+    return (positions(source_index, loss), positions(target_index, target_only),
+            positions(source_index, diff_source), positions(target_index, diff_target), diff_bits,
+            duplicates, duplicate_source_counts, duplicate_target_counts, summary)
+
+
+def _write_partitions(chunks: Iterable[pd.DataFrame], key_columns: List[str], num_partitions: int,
+                      partition_dir: str, prefix: str, hash_key: str) -> List[str]:
+    """把数据块按关键字段哈希追加写入 num_partitions 个分区文件"""
+    paths = [os.path.join(partition_dir, f'{prefix}_{i}.csv') for i in range(num_partitions)]
+    handles = [open(path, 'w', encoding='utf-8', newline='') for path in paths]
+    header_written = [False] * num_partitions
+    header_frame = None
+    try:
+        for chunk in chunks:
+            if header_frame is None:
+                header_frame = chunk.iloc[:0]
+            partition_ids = key_partition_ids(chunk[key_columns], num_partitions, hash_key)
+            for partition_id, group in chunk.groupby(partition_ids, sort=False):
+                group.to_csv(handles[partition_id], header=not header_written[partition_id],
+                             index=True, index_label=ROW_ID)
+                header_written[partition_id] = True
+
+        # 没有分到数据的分区也要写表头，方便后续统一读取
+        for partition_id, written in enumerate(header_written):
+            if not written and header_frame is not None:
+                header_frame.to_csv(handles[partition_id], index=True, index_label=ROW_ID)
+    finally:
+        for handle in handles:
+            handle.close()
+    return paths
+
+
+def key_partition_ids(key_frame: pd.DataFrame, num_partitions: int, hash_key: str) -> np.ndarray:
+    """计算每行关键字段所属的分区编号"""
+    return (key_hashes(key_frame, hash_key) % np.uint64(num_partitions)).astype(np.int64)
+
+
+def key_hashes(key_frame: pd.DataFrame, hash_key: str) -> np.ndarray:
+    """
+    计算每行关键字段的64位哈希
+
+    数值型关键字段统一转为float64后再哈希，保证不同数据块中int/float推断不一致时
+    相等的键哈希仍然相同（与pandas按值连接的语义一致）。
+
+    pandas只在哈希字符串时使用hash_key，数值列的哈希与密钥无关，因此再用由密钥
+    派生的盐值混合一次（splitmix64终结函数），保证不同密钥得到互不相关的哈希。
+    """
+    normalized = {}
+    for column in key_frame.columns:
+        values = key_frame[column]
+        if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+            normalized[column] = values.astype('float64')
+        else:
+            normalized[column] = values.astype(object)
+    hashes = pd.util.hash_pandas_object(pd.DataFrame(normalized), index=False, hash_key=hash_key).to_numpy()
+
+    salt = np.uint64(int.from_bytes(hashlib.sha256(hash_key.encode('utf-8')).digest()[:8], 'little'))
+    hashes = hashes ^ salt
+    hashes = (hashes ^ (hashes >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    hashes = (hashes ^ (hashes >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return hashes ^ (hashes >> np.uint64(31))
+
+
+def _read_partition(path: str, dtypes: Dict[str, Any]) -> pd.DataFrame:
+    """读取分区文件，列类型使用整个文件上推断出的类型"""
+    return pd.read_csv(path, dtype=dtypes, index_col=ROW_ID)
+
+
+def _read_partition_chunks(path: str, dtypes: Dict[str, Any], budget_bytes: int) -> Iterable[pd.DataFrame]:
+    """分块读取分区文件（重新分区时使用）"""
+    return pd.read_csv(path, dtype=dtypes, index_col=ROW_ID,
+                       chunksize=_estimate_chunk_rows(path, budget_bytes))
+
+
+def _union_dtype(current, new):
+    """合并不同数据块推断出的列类型，结果与整文件读取时的推断一致"""
+    if current is None or current == new:
+        return new
+    numeric = (pd.api.types.is_numeric_dtype(current) and pd.api.types.is_numeric_dtype(new)
+               and not pd.api.types.is_bool_dtype(current) and not pd.api.types.is_bool_dtype(new))
+    if numeric:
+        return np.dtype('float64')
+    return np.dtype(object)
+
+
+def _estimate_chunk_rows(path: str, budget_bytes: int) -> int:
+    """根据文件开头的平均行长估算每次读取的行数"""
+    with open(path, 'rb') as f:
+        sample = f.read(1024 * 1024)
+    lines = max(1, sample.count(b'\n'))
+    row_bytes = max(1, len(sample) // lines)
+    return max(MIN_CHUNK_ROWS, budget_bytes // (MEMORY_EXPANSION * row_bytes))
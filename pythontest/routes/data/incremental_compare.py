@@ -0,0 +1,330 @@
+"""
+增量CSV数据比较
+
+保存上一次比较的快照：源表/目标表每个关键字段的行指纹，以及按关键字段分组的
+data_loss / target_only / value_diff / duplicate_keys 结果。新快照到来时只重新比较行指纹多重集
+发生变化、新增或消失的关键字段，并在保存的结果上更新，逐字段比较量与变更行数成正比。
+计算行指纹、检测变更的关键字段和按首次出现位置排列结果仍需扫描全表，但都是按列的哈希和
+分组操作，比逐字段比较便宜得多。
+"""
+import json
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from flask import current_app
+
+from routes.data.vectorized_compare import (
+    resolve_compare_fields, apply_target_mapping, compare_mapped_frames, row_fingerprints
+)
+from routes.data.compare_rules import compile_compare_rules
+from routes.data.key_codes import shared_key_codes
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 快照中保存行指纹的列
+FINGERPRINT = '__fingerprint__'
+
+# 每个关键字段的行指纹多重集摘要列，见 key_multisets
+MULTISET_COLUMNS = ['__rows__', '__sum__', '__mixed_sum__']
+
+# 快照结构版本，结构变化后旧快照自动失效
+SNAPSHOT_VERSION = 3
+
+# 快照名称只允许字母、数字、下划线和连字符（用作文件名）
+SNAPSHOT_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class SnapshotStore:
+    """增量比较快照的磁盘存储，每个基线名称对应一个文件"""
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self._lock = threading.Lock()
+        os.makedirs(store_dir, exist_ok=True)
+
+    @staticmethod
+    def valid_name(name: str) -> bool:
+        return bool(SNAPSHOT_NAME_PATTERN.match(name or ''))
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        """读取快照，不存在或无法读取时返回None（下一次比较将全量重建）"""
+        path = self._path(name)
+        try:
+            return pd.read_pickle(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to load snapshot {name}: {e}")
+            return None
+
+    def save(self, name: str, snapshot: Dict[str, Any]):
+        """原子写入快照"""
+        fd, temp_path = tempfile.mkstemp(dir=self.store_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            pd.to_pickle(snapshot, temp_path)
+            with self._lock:
+                os.replace(temp_path, self._path(name))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def delete(self, name: str):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def _path(self, name: str) -> str:
+        if not self.valid_name(name):
+            raise ValueError(f"Invalid snapshot name: {name!r}")
+        return os.path.join(self.store_dir, f'{name}.pkl')
+
+
+def compare_incremental(source_df: pd.DataFrame, target_df: pd.DataFrame,
+                        field_mapping: Dict[str, str], key_fields: List[str],
+                        snapshot: Optional[Dict[str, Any]] = None,
+                        compare_rules: Optional[Dict[str, str]] = None,
+                        duplicate_order: Optional[List[str]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    基于上一次快照增量比较两个DataFrame
+
+    快照不存在，或字段映射、关键字段、比较规则、重复键配对方式、列结构与快照不一致时
+    全量比较并重建快照。
+
+    Args:
+        source_df: 源数据框
+        target_df: 目标数据框
+        field_mapping: 字段映射关系
+        key_fields: 关键字段列表
+        snapshot: 上一次比较返回的快照
+        compare_rules: 字段比较规则 {源字段名: 规则}，见 compare_rules 模块
+        duplicate_order: 重复键的配对方式，None为多对多展开，字段列表为按这些字段排序后逐个配对
+
+    Returns:
+        (比较结果字典（结构同compare_dataframes，记录按源表行顺序排列）, 新快照)
+    """
+    field_mapping, key_fields = resolve_compare_fields(source_df, target_df, field_mapping, key_fields)
+    mapped_target_df = apply_target_mapping(target_df, field_mapping)
+    comparators = compile_compare_rules(compare_rules)
+
+    source_fingerprints = fingerprint_frame(source_df, key_fields)
+    target_fingerprints = fingerprint_frame(mapped_target_df, key_fields)
+    config = snapshot_config(source_df, mapped_target_df, field_mapping, key_fields, compare_rules,
+                             duplicate_order)
+
+    if snapshot is None or snapshot.get('config') != config:
+        logger.info("No compatible snapshot, running full comparison")
+        partial = compare_mapped_frames(source_df, mapped_target_df, field_mapping, key_fields, comparators,
+                                        duplicate_order)[0]
+        data_loss, target_only, value_diff, duplicate_keys = {}, {}, {}, {}
+        common_records = partial['summary']['matching_records'] + partial['summary']['value_diff_count']
+        changed_count = None
+    else:
+        changed_keys, old_source_changed, old_target_changed = changed_key_frame(
+            snapshot['source'], source_fingerprints, snapshot['target'], target_fingerprints, key_fields)
+        changed_index = pd.MultiIndex.from_frame(changed_keys)
+        changed_count = len(changed_keys)
+        logger.info(f"Incremental comparison: {changed_count} changed keys")
+
+        source_mask = key_index(source_df, key_fields).isin(changed_index)
+        target_mask = key_index(mapped_target_df, key_fields).isin(changed_index)
+        partial = compare_mapped_frames(source_df[source_mask], mapped_target_df[target_mask],
+                                        field_mapping, key_fields, comparators, duplicate_order)[0]
+
+        # 从保存的结果中移除变更键的旧记录，再加入重新比较的记录
+        data_loss = dict(snapshot['data_loss'])
+        target_only = dict(snapshot['target_only'])
+        value_diff = dict(snapshot['value_diff'])
+        duplicate_keys = dict(snapshot['duplicate_keys'])
+        for key in changed_index:
+            key = normalize_key(key)
+            data_loss.pop(key, None)
+            target_only.pop(key, None)
+            value_diff.pop(key, None)
+            duplicate_keys.pop(key, None)
+
+        old_common = common_pair_count(snapshot['source'][old_source_changed][key_fields],
+                                       snapshot['target'][old_target_changed][key_fields],
+                                       duplicate_order is not None)
+        common_records = (snapshot['common_records'] - old_common
+                          + partial['summary']['matching_records'] + partial['summary']['value_diff_count'])
+
+    for section, state in (('data_loss', data_loss), ('target_only', target_only), ('value_diff', value_diff),
+                           ('duplicate_keys', duplicate_keys)):
+        for item in partial[section]:
+            state.setdefault(item_key(item, key_fields), []).append(item)
+
+    # 重复键按在两表（先源表后目标表）中首次出现的位置排列
+    both_keys = pd.concat([source_df[key_fields], mapped_target_df[key_fields]], ignore_index=True)
+    result = {
+        'data_loss': order_by_first_row(data_loss, source_df, key_fields),
+        'target_only': order_by_first_row(target_only, mapped_target_df, key_fields),
+        'value_diff': order_by_first_row(value_diff, source_df, key_fields),
+        'duplicate_keys': order_by_first_row(duplicate_keys, both_keys, key_fields),
+        'summary': {}
+    }
+    result['summary'] = {
+        'source_total_records': len(source_df),
+        'target_total_records': len(mapped_target_df),
+        'data_loss_count': len(result['data_loss']),
+        'target_only_count': len(result['target_only']),
+        'value_diff_count': len(result['value_diff']),
+        'duplicate_key_count': len(result['duplicate_keys']),
+        'matching_records': common_records - len(result['value_diff']),
+        'field_mapping': field_mapping,
+        'key_fields': key_fields
+    }
+    if changed_count is not None:
+        result['summary']['incremental_changed_keys'] = changed_count
+
+    new_snapshot = {
+        'config': config,
+        'source': source_fingerprints,
+        'target': target_fingerprints,
+        'data_loss': data_loss,
+        'target_only': target_only,
+        'value_diff': value_diff,
+        'duplicate_keys': duplicate_keys,
+        'common_records': common_records
+    }
+
+    logger.info(f"Comparison completed: {result['summary']}")
+
+    return result, new_snapshot
+
+
+def fingerprint_frame(df: pd.DataFrame, key_fields: List[str]) -> pd.DataFrame:
+    """关键字段 + 整行指纹（包含未比较的列，因为报告中会输出整行数据）"""
+    frame = df[key_fields].reset_index(drop=True)
+    frame[FINGERPRINT] = row_fingerprints(df, list(df.columns))
+    return frame
+
+
+def snapshot_config(source_df: pd.DataFrame, mapped_target_df: pd.DataFrame,
+                    field_mapping: Dict[str, str], key_fields: List[str],
+                    compare_rules: Optional[Dict[str, str]] = None,
+                    duplicate_order: Optional[List[str]] = None) -> str:
+    """比较配置和列结构的哈希，不一致时快照不可复用"""
+    payload = json.dumps({
+        'version': SNAPSHOT_VERSION,
+        'field_mapping': field_mapping,
+        'key_fields': key_fields,
+        'compare_rules': compare_rules or {},
+        'duplicate_order': duplicate_order,
+        'source_columns': [(column, str(dtype)) for column, dtype in source_df.dtypes.items()],
+        'target_columns': [(column, str(dtype)) for column, dtype in mapped_target_df.dtypes.items()]
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def changed_key_frame(old_source: pd.DataFrame, new_source: pd.DataFrame,
+                      old_target: pd.DataFrame, new_target: pd.DataFrame,
+                      key_fields: List[str]) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """
+    找出指纹变化、新增或消失的关键字段
+
+    Returns:
+        (变更的关键字段（去重）, 旧源表快照中属于变更键的行掩码, 旧目标表快照中属于变更键的行掩码)
+    """
+    changed = pd.concat([_changed_keys(old_source, new_source, key_fields),
+                         _changed_keys(old_target, new_target, key_fields)],
+                        ignore_index=True).drop_duplicates(ignore_index=True)
+    changed_index = pd.MultiIndex.from_frame(changed)
+    return (changed,
+            key_index(old_source, key_fields).isin(changed_index),
+            key_index(old_target, key_fields).isin(changed_index))
+
+
+def _changed_keys(old: pd.DataFrame, new: pd.DataFrame, key_fields: List[str]) -> pd.DataFrame:
+    """
+    同一张表前后两个快照之间发生变化的关键字段
+
+    每个关键字段按其所有行指纹的多重集比较：行数、指纹之和与混合后指纹之和都相同才视为未变化，
+    所以重复键增加或减少一行相同的数据、或某一行变化都会被发现，与行顺序无关。
+    """
+    old_sets, new_sets = key_multisets(old, key_fields), key_multisets(new, key_fields)
+    # 外连接会把缺失一边的64位摘要转为浮点数，所以只按关键字段连接行位置，再比较摘要
+    joined = old_sets[key_fields].assign(__old__=np.arange(len(old_sets))).merge(
+        new_sets[key_fields].assign(__new__=np.arange(len(new_sets))), on=key_fields, how='outer')
+    both = joined['__old__'].notna().to_numpy() & joined['__new__'].notna().to_numpy()
+    changed = ~both
+    old_rows = joined.loc[both, '__old__'].to_numpy(dtype=np.int64)
+    new_rows = joined.loc[both, '__new__'].to_numpy(dtype=np.int64)
+    for column in MULTISET_COLUMNS:
+        changed[both] |= old_sets[column].to_numpy()[old_rows] != new_sets[column].to_numpy()[new_rows]
+    return joined.loc[changed, key_fields]
+
+
+def key_multisets(fingerprints: pd.DataFrame, key_fields: List[str]) -> pd.DataFrame:
+    """
+    每个关键字段的行指纹多重集摘要：行数、指纹之和、混合后指纹之和（按2^64取模，与行顺序无关）
+
+    只用指纹之和时不同的多重集容易相互抵消，再加一个经过非线性混合的和降低碰撞概率。
+    """
+    values = fingerprints[FINGERPRINT].to_numpy(dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        mixed = values ^ (values >> np.uint64(31))
+        mixed *= np.uint64(0x9E3779B97F4A7C15)
+        mixed ^= mixed >> np.uint64(29)
+    frame = fingerprints[key_fields].assign(__rows__=1, __sum__=values, __mixed_sum__=mixed)
+    return frame.groupby(key_fields, dropna=False, sort=False).agg(
+        __rows__=('__rows__', 'size'), __sum__=('__sum__', 'sum'), __mixed_sum__=('__mixed_sum__', 'sum')
+    ).reset_index()
+
+
+def common_pair_count(source_keys: pd.DataFrame, target_keys: pd.DataFrame, pair_in_order: bool) -> int:
+    """
+    两表关键字段连接后的共同记录数
+
+    重复键多对多展开时每个键贡献两边行数之积，逐个配对时贡献两边行数中的较小值。
+    """
+    source_codes, target_codes, num_keys = shared_key_codes(source_keys, target_keys)
+    source_counts = np.bincount(source_codes, minlength=num_keys)
+    target_counts = np.bincount(target_codes, minlength=num_keys)
+    if pair_in_order:
+        return int(np.minimum(source_counts, target_counts).sum())
+    return int((source_counts * target_counts).sum())
+
+
+def key_index(df: pd.DataFrame, key_fields: List[str]) -> pd.MultiIndex:
+    return pd.MultiIndex.from_frame(df[key_fields])
+
+
+def normalize_key(values) -> tuple:
+    """关键字段值元组，空值统一为None（NaN彼此不相等，不能直接作为字典键）"""
+    return tuple(None if pd.isna(value) else value for value in values)
+
+
+def item_key(item: Dict[str, Any], key_fields: List[str]) -> tuple:
+    return normalize_key(item['key'][field] for field in key_fields)
+
+
+def order_by_first_row(state: Dict[tuple, List[Dict[str, Any]]], df: pd.DataFrame,
+                       key_fields: List[str]) -> List[Dict[str, Any]]:
+    """按关键字段在表中首次出现的位置排列记录，与全量比较的顺序一致"""
+    if not state:
+        return []
+    keys = list(state)
+    index = key_index(df, key_fields)
+    first = ~index.duplicated()
+    positions = np.flatnonzero(first)[
+        index[first].get_indexer(pd.MultiIndex.from_tuples(keys, names=key_fields))]
+    return [item for i in np.argsort(positions, kind='stable') for item in state[keys[i]]]
+
+
+def get_snapshot_store() -> SnapshotStore:
+    """获取当前应用的增量比较快照存储"""
+    store = current_app.extensions.get('snapshot_store')
+    if store is None:
+        store = SnapshotStore(current_app.config['INCREMENTAL_SNAPSHOT_DIR'])
+        current_app.extensions['snapshot_store'] = store
+    return store
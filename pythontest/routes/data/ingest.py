@@ -0,0 +1,156 @@
+"""
+CSV数据读取
+
+根据mapping.csv只读取关键字段和映射字段，并按字段类型（dtype列）解析数据。
+"""
+import logging
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Any, Optional, Tuple
+
+import pandas as pd
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# mapping.csv中dtype列支持的字段类型及读取时使用的pandas类型
+# decimal/date/category先按字符串读取，再由apply_field_types转换
+FIELD_TYPES = {
+    'int': 'Int64',
+    'decimal': str,
+    'date': str,
+    'category': str,
+    'string': str,
+}
+
+# 字段值解析失败时错误信息中最多列出的值
+MAX_REPORTED_VALUES = 5
+
+
+class FieldTypeError(ValueError):
+    """字段的值不能按mapping.csv中声明的类型解析"""
+
+    def __init__(self, column: str, field_type: str, failed: pd.Series):
+        self.column = column
+        self.field_type = field_type
+        # 行号为数据行号（从1开始，不含表头），取自读取时保留的原始行标签
+        self.rows = [int(label) + 1 for label in failed.index]
+        examples = ', '.join(f'row {row}: {value!r}' for row, value
+                             in zip(self.rows[:MAX_REPORTED_VALUES], failed.iloc[:MAX_REPORTED_VALUES]))
+        more = f' and {len(self.rows) - MAX_REPORTED_VALUES} more' if len(self.rows) > MAX_REPORTED_VALUES else ''
+        super().__init__(f"Field '{column}' is declared as {field_type} but {len(self.rows)} value(s) "
+                         f"cannot be parsed ({examples}{more})")
+
+
+def csv_read_options(columns: Optional[List[str]], field_types: Dict[str, str]) -> Dict[str, Any]:
+    """
+    生成pd.read_csv的列裁剪和类型参数
+
+    Args:
+        columns: 需要读取的列，None表示读取全部列
+        field_types: 字段类型 {列名: 类型}
+
+    Returns:
+        可直接传给pd.read_csv的参数字典
+    """
+    options = {}
+    if columns is not None:
+        wanted = set(columns)
+        # 使用可调用对象，文件中不存在的映射字段直接忽略（与未裁剪时的行为一致）
+        options['usecols'] = lambda column: column in wanted
+
+    dtype = {}
+    for column, field_type in field_types.items():
+        if field_type not in FIELD_TYPES:
+            raise ValueError(f"Unsupported field type '{field_type}' for field '{column}', "
+                             f"expected one of {list(FIELD_TYPES)}")
+        dtype[column] = FIELD_TYPES[field_type]
+    if dtype:
+        options['dtype'] = dtype
+    return options
+
+
+def apply_field_types(df: pd.DataFrame, field_types: Dict[str, str]) -> pd.DataFrame:
+    """
+    把按字符串读取的decimal/date/category字段转换为对应类型
+
+    Raises:
+        FieldTypeError: 有值不能解析为声明的类型（错误信息中给出字段名和行号）
+    """
+    for column, field_type in field_types.items():
+        if column not in df.columns:
+            continue
+        if field_type == 'decimal':
+            df[column] = _parse_decimals(df[column], column)
+        elif field_type == 'date':
+            df[column] = _parse_dates(df[column], column)
+        elif field_type == 'category':
+            df[column] = df[column].astype('category')
+    return df
+
+
+def read_mapped_csv(file, columns: Optional[List[str]] = None,
+                    field_types: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    读取CSV文件，只保留指定列并按字段类型解析
+
+    Args:
+        file: 文件路径或文件对象
+        columns: 需要读取的列，None表示读取全部列
+        field_types: 字段类型 {列名: 类型}
+
+    Returns:
+        数据框
+    """
+    field_types = field_types or {}
+    df = pd.read_csv(file, **csv_read_options(columns, field_types))
+    return apply_field_types(df, field_types)
+
+
+def compare_read_plan(field_mapping: Dict[str, str], key_fields: List[str],
+                      field_types: Dict[str, str]) -> Tuple[Optional[List[str]], Dict[str, str],
+                                                            Optional[List[str]], Dict[str, str]]:
+    """
+    根据字段映射计算源表/目标表需要读取的列和各列类型
+
+    没有字段映射时读取全部列（比较时使用两表的交集字段）；没有关键字段时
+    比较会使用源表第一列作为关键字段，因此同样读取全部列。
+
+    Returns:
+        (源表列, 源表字段类型, 目标表列, 目标表字段类型)
+    """
+    source_types = dict(field_types)
+    target_types = {field_mapping[field]: field_type for field, field_type in field_types.items()
+                    if field in field_mapping}
+    if not field_mapping or not key_fields:
+        return None, source_types, None, target_types
+
+    source_columns = list(dict.fromkeys([*key_fields, *field_mapping]))
+    target_columns = list(dict.fromkeys(field_mapping.values()))
+    return source_columns, source_types, target_columns, target_types
+
+
+def _parse_decimals(values: pd.Series, column: str) -> pd.Series:
+    parsed = values.map(_to_decimal, na_action='ignore').astype(object)
+    failed = parsed.isna() & values.notna()
+    if failed.any():
+        raise FieldTypeError(column, 'decimal', values[failed])
+    return parsed
+
+
+def _parse_dates(values: pd.Series, column: str) -> pd.Series:
+    """按第一个值推断出的格式整列解析；格式不统一时逐个值解析，仍不能解析的值报错"""
+    try:
+        return pd.to_datetime(values)
+    except (ValueError, TypeError):
+        parsed = pd.to_datetime(values, format='mixed', errors='coerce')
+    failed = parsed.isna() & values.notna()
+    if failed.any():
+        raise FieldTypeError(column, 'date', values[failed])
+    return parsed
+
+
+def _to_decimal(value):
+    try:
+        return Decimal(str(value).strip())
+    except InvalidOperation:
+        return None
@@ -0,0 +1,233 @@
+"""
+共享字典编码
+
+把两表的关键字段（可以是多列组合）在同一个字典上编码为每行一个int64代码：
+每列先对两表拼接后的值做factorize，得到共享的列代码，再按混合进制把各列代码
+合成一个整数。代码相同当且仅当关键字段值相同（空值与空值视为相同，与pandas
+merge一致），不存在哈希碰撞；连接、差集和按键查找都在紧凑的数值数组上完成，
+不需要为每行生成Python元组。
+
+一个源表与多个目标表比较时，源表的字典只需建立一次（source_key_dictionary）。
+
+重复键同样在代码上一次计数找出；需要逐个配对时，把每行在组内的序号合入代码即可。
+
+需要按字符串形式比较的值列同样可以在两边取值的共享字典上编码，只对不同取值转换字符串。
+"""
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 合成代码时的上限，超过后先把已合成的代码重新编码为稠密代码
+MAX_CODE = np.iinfo(np.int64).max
+
+
+def shared_key_codes(source_keys: pd.DataFrame,
+                     target_keys: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    在共享字典上编码两表的关键字段
+
+    Args:
+        source_keys: 源表的关键字段列
+        target_keys: 目标表的关键字段列（列名与源表一致）
+
+    Returns:
+        (源表每行的代码, 目标表每行的代码, 代码取值个数)，代码取值范围为 [0, 代码取值个数)
+    """
+    columns = []
+    for column in source_keys.columns:
+        values = pd.concat([source_keys[column], target_keys[column]], ignore_index=True)
+        column_codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        columns.append((column_codes, len(uniques)))
+    return _combine_column_codes(columns, len(source_keys))
+
+
+def source_key_dictionary(source_keys: pd.DataFrame) -> List[Tuple[np.ndarray, pd.Series]]:
+    """
+    只对源表关键字段做一次编码，得到每列的代码和取值字典
+
+    一个源表与多个目标表比较时，源表（通常最大）只编码一次；每个目标表只需在
+    源表字典上编码自己的关键字段（见 encode_with_source_dictionary）。
+
+    Returns:
+        [(源表该列每行的代码, 该列按代码排列的不同取值)]，按关键字段顺序
+    """
+    dictionary = []
+    for column in source_keys.columns:
+        column_codes, uniques = pd.factorize(source_keys[column], use_na_sentinel=False)
+        dictionary.append((column_codes, pd.Series(uniques)))
+    return dictionary
+
+
+def encode_with_source_dictionary(dictionary: List[Tuple[np.ndarray, pd.Series]],
+                                  target_keys: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    在源表字典上编码目标表的关键字段，返回值与 shared_key_codes 相同
+
+    源表的不同取值排在目标表之前做factorize，取值按首次出现分配代码，源表取值的代码
+    与只对源表编码时一致；只需处理目标表的行和源表的不同取值，不再重新编码整个源表。
+    """
+    columns = []
+    num_source = len(dictionary[0][0]) if dictionary else 0
+    for (source_codes, uniques), column in zip(dictionary, target_keys.columns):
+        values = pd.concat([uniques, target_keys[column]], ignore_index=True)
+        codes, combined = pd.factorize(values, use_na_sentinel=False)
+        columns.append((np.concatenate([source_codes, codes[len(uniques):]]), len(combined)))
+    return _combine_column_codes(columns, num_source)
+
+
+def _combine_column_codes(columns: List[Tuple[np.ndarray, int]], num_source: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    """按混合进制把各列代码（两表拼接，源表在前）合成每行一个代码"""
+    codes = np.zeros(len(columns[0][0]) if columns else num_source, dtype=np.int64)
+    num_keys = 1
+
+    for column_codes, cardinality in columns:
+        cardinality = max(cardinality, 1)
+        if num_keys > MAX_CODE // cardinality:
+            # 组合数可能溢出int64，已合成的代码只保留实际出现的组合
+            codes, combined = pd.factorize(codes)
+            num_keys = len(combined)
+        codes = codes * cardinality + column_codes
+        num_keys *= cardinality
+
+    if len(columns) > 1:
+        # 混合进制代码通常很稀疏，重新编码为稠密代码便于按代码计数
+        codes, combined = pd.factorize(codes)
+        num_keys = len(combined)
+
+    return codes[:num_source], codes[num_source:], num_keys
+
+
+def group_positions(codes: np.ndarray, num_keys: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    按代码分组的行位置
+
+    Returns:
+        (按代码排序的行位置（同一代码内保持原始顺序）, 每个代码在其中的起始下标, 每个代码的行数)
+    """
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes, minlength=num_keys)
+    starts = np.cumsum(counts) - counts
+    return order, starts, counts
+
+
+def duplicate_key_groups(source_codes: np.ndarray, target_codes: np.ndarray,
+                         num_keys: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    一次计数找出在任一表中出现多次的关键字段
+
+    Returns:
+        (每个重复键在源表中首次出现的行位置（源表中不存在时为-1）, 在目标表中首次出现的行位置,
+         源表中的行数, 目标表中的行数)，按关键字段在两表（先源表后目标表）中首次出现的顺序排列
+    """
+    source_counts = np.bincount(source_codes, minlength=num_keys)
+    target_counts = np.bincount(target_codes, minlength=num_keys)
+    duplicated = np.flatnonzero((source_counts > 1) | (target_counts > 1))
+    if len(duplicated) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, empty
+
+    first_source = _first_positions(source_codes, num_keys)[duplicated]
+    first_target = _first_positions(target_codes, num_keys)[duplicated]
+    # 代码按两表拼接后首次出现的顺序分配，这里换算为同样顺序的排序键
+    order = np.argsort(np.where(first_source >= 0, first_source, len(source_codes) + first_target), kind='stable')
+    duplicated = duplicated[order]
+    return (first_source[order], first_target[order],
+            source_counts[duplicated], target_counts[duplicated])
+
+
+def occurrence_ranks(codes: np.ndarray, order_frame: Optional[pd.DataFrame] = None) -> np.ndarray:
+    """
+    每行在其关键字段代码分组内的序号（从0开始）
+
+    组内先按 order_frame 各列升序（空值在前）、再按原始行顺序排序，整个计算是一次排序。
+    """
+    if order_frame is None or not len(order_frame.columns):
+        order = np.argsort(codes, kind='stable')
+    else:
+        order = np.lexsort(_order_sort_keys(codes, order_frame))
+
+    sorted_codes = codes[order]
+    positions = np.arange(len(codes), dtype=np.int64)
+    group_starts = np.maximum.accumulate(np.where(np.diff(sorted_codes, prepend=-1) != 0, positions, 0))
+    ranks = np.empty(len(codes), dtype=np.int64)
+    ranks[order] = positions - group_starts
+    return ranks
+
+
+def occurrence_key_codes(source_codes: np.ndarray, target_codes: np.ndarray,
+                         source_order: Optional[pd.DataFrame] = None,
+                         target_order: Optional[pd.DataFrame] = None) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    把组内序号合入关键字段代码，使重复键逐个配对
+
+    源表某关键字段的第k行（按 source_order 排序）只与目标表同一关键字段的第k行代码相同，
+    连接时不再多对多展开；多出的行成为仅一边存在的记录。
+
+    Returns:
+        (源表每行的新代码, 目标表每行的新代码, 代码取值个数)
+    """
+    source_ranks = occurrence_ranks(source_codes, source_order)
+    target_ranks = occurrence_ranks(target_codes, target_order)
+    radix = max(source_ranks.max(initial=0), target_ranks.max(initial=0)) + 1
+    codes, uniques = pd.factorize(np.concatenate([source_codes, target_codes]) * radix
+                                  + np.concatenate([source_ranks, target_ranks]))
+    return codes[:len(source_codes)], codes[len(source_codes):], len(uniques)
+
+
+def _order_sort_keys(codes: np.ndarray, order_frame: pd.DataFrame) -> List[np.ndarray]:
+    """np.lexsort的排序键：先按代码，再按 order_frame 各列，最后按原始行顺序"""
+    sort_keys = [np.arange(len(codes))]
+    for column in reversed(list(order_frame.columns)):
+        try:
+            column_codes = pd.factorize(order_frame[column], sort=True)[0]
+        except TypeError:
+            # 混合类型的列无法直接排序，按字符串形式排序
+            column_codes = pd.factorize(order_frame[column].astype(str).where(order_frame[column].notna()),
+                                        sort=True)[0]
+        sort_keys.append(column_codes)
+    sort_keys.append(codes)
+    return sort_keys
+
+
+def _first_positions(codes: np.ndarray, num_keys: int) -> np.ndarray:
+    """每个代码首次出现的行位置，不存在时为-1"""
+    first = np.full(num_keys, -1, dtype=np.int64)
+    present, positions = np.unique(codes, return_index=True)
+    first[present] = positions
+    return first
+
+
+def shared_value_codes(source_values: pd.Series, target_values: pd.Series,
+                       normalize: Optional[Callable[[pd.Index], pd.Index]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    把两列非空值编码为共享字符串字典上的整数代码
+
+    每列先各自factorize，只对不同取值转换字符串，再在两边字符串形式的并集上统一编码；
+    代码相同当且仅当字符串形式相同，比较变为整数数组比较。normalize 对字符串形式的取值
+    做进一步处理（如忽略大小写），同样只作用于不同取值。
+    """
+    source_codes, source_uniques = pd.factorize(source_values)
+    target_codes, target_uniques = pd.factorize(target_values)
+    vocabulary = pd.Index(np.concatenate([pd.Index(source_uniques).astype(str).to_numpy(dtype=object),
+                                          pd.Index(target_uniques).astype(str).to_numpy(dtype=object)]))
+    if normalize is not None:
+        vocabulary = normalize(vocabulary)
+    vocabulary_codes, _ = pd.factorize(vocabulary)
+    return (vocabulary_codes[:len(source_uniques)][source_codes],
+            vocabulary_codes[len(source_uniques):][target_codes])
+
+
+def dictionary_encodable(values: pd.Series) -> bool:
+    """
+    每个取值只有一种字符串形式的列（字符串、整数、布尔及其类别），可以按取值编码后比较
+
+    浮点数和Decimal不适用：值相等的 0.0 / -0.0、Decimal('1') / Decimal('1.0') 字符串形式不同。
+    """
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return dtype.categories.inferred_type in ('string', 'integer', 'boolean')
+    if dtype == object:
+        return pd.api.types.infer_dtype(values, skipna=True) == 'string'
+    return (pd.api.types.is_string_dtype(dtype) or pd.api.types.is_integer_dtype(dtype)
+            or pd.api.types.is_bool_dtype(dtype))
@@ -3,6 +3,8 @@ import json
 import pandas as pd
 from flask import Blueprint, request, jsonify
 
+from utils.mapping_file import MAPPING_COLUMNS, read_mapping_file
+
 mapping_bp = Blueprint('mapping', __name__, url_prefix='/api/mapping')
 MAPPING_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'mapping.csv')
 
@@ -11,12 +13,14 @@ MAPPING_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__fi
 def get_mapping():
     if not os.path.exists(MAPPING_FILE):
         return jsonify({'field_mapping': {}, 'key_fields': []})
-    df = pd.read_csv(MAPPING_FILE, dtype=str).fillna('')
-    # field_mapping: {source1: {target, desc}}
+    df = read_mapping_file(MAPPING_FILE)
+    # field_mapping: {source1: {target, desc, dtype, compare}}
     field_mapping = {
         row['source1']: {
             'target': row['source2'],
-            'desc': row.get('desc', '')
+            'desc': row['desc'],
+            'dtype': row['dtype'],
+            'compare': row['compare']
         }
         for _, row in df.iterrows()
     }
@@ -29,25 +33,28 @@ def update_mapping():
     data = request.get_json(force=True)
     field_mapping = data.get('field_mapping', {})
     key_fields = data.get('key_fields', [])
+    field_types = data.get('field_types', {})
+    compare_rules = data.get('compare_rules', {})
 
-    # 读取现有 mapping.csv 以保留 desc
-    if os.path.exists(MAPPING_FILE):
-        df = pd.read_csv(MAPPING_FILE, dtype=str).fillna('')
-    else:
-        df = pd.DataFrame(columns=['source1', 'source2', 'desc', 'is_key'])
+    # 读取现有 mapping.csv 以保留 desc、字段类型和比较规则
+    df = read_mapping_file(MAPPING_FILE)
 
     # 更新 source2 和 is_key
     df['source2'] = df['source1'].map(lambda x: field_mapping.get(x, df.loc[df['source1'] == x, 'source2'].values[0] if not df.loc[df['source1'] == x, 'source2'].empty else ''))
     df['is_key'] = df['source1'].map(lambda x: 'yes' if x in key_fields else 'no')
+    # 字段类型和比较规则（可选）：未传入时保留原有值
+    df['dtype'] = [field_types.get(src, dtype) for src, dtype in zip(df['source1'], df['dtype'])]
+    df['compare'] = [compare_rules.get(src, rule) for src, rule in zip(df['source1'], df['compare'])]
 
     # 补充 field_mapping 中的新字段
     for src, tgt in field_mapping.items():
         if src not in df['source1'].values:
             df = pd.concat([
                 df,
-                pd.DataFrame([{'source1': src, 'source2': tgt, 'desc': '', 'is_key': 'yes' if src in key_fields else 'no'}])
+                pd.DataFrame([{'source1': src, 'source2': tgt, 'desc': '', 'is_key': 'yes' if src in key_fields else 'no',
+                               'dtype': field_types.get(src, ''), 'compare': compare_rules.get(src, '')}])
             ], ignore_index=True)
 
-    df = df[['source1', 'source2', 'desc', 'is_key']]
+    df = df[MAPPING_COLUMNS]
     df.to_csv(MAPPING_FILE, index=False, encoding='utf-8')
     return jsonify({'status': 'success'})
@@ -0,0 +1,99 @@
+"""
+一个源表与多个目标表的比较
+
+同一个标准源表经常要与十几个地区目标表逐一比较。逐个调用比较引擎时，源表的关键字段
+每次都要重新编码、行指纹每次都要重新计算；这里把源表部分（关键字段字典、行指纹）只计算一次，
+在线程池中并发比较各目标表，每个目标表得到与 compare_dataframes_vectorized 相同的列式结果。
+
+使用线程而不是进程：各目标表共享同一个源表数据框，不需要复制到子进程；
+factorize、哈希和数组比较的主要耗时在pandas/numpy内部，可以并发执行。
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from routes.data.vectorized_compare import (
+    resolve_compare_fields, apply_target_mapping, compare_mapped_columns, row_fingerprints
+)
+from routes.data.key_codes import source_key_dictionary, encode_with_source_dictionary
+from routes.data.compare_rules import compile_compare_rules
+from routes.data.result_model import CompareResult
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class SourceIndex:
+    """源表的关键字段字典和按比较字段缓存的行指纹，可在多个线程中共享"""
+
+    def __init__(self, source_df: pd.DataFrame, key_fields: List[str]):
+        self.source_df = source_df
+        self.key_fields = key_fields
+        self.key_dictionary = source_key_dictionary(source_df[key_fields])
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+
+    def key_codes(self, mapped_target_df: pd.DataFrame):
+        """源表与目标表关键字段的共享代码（同shared_key_codes）"""
+        return encode_with_source_dictionary(self.key_dictionary, mapped_target_df[self.key_fields])
+
+    def fingerprints(self, columns: List[str]) -> np.ndarray:
+        """源表在指定比较字段上的行指纹，每组字段只计算一次"""
+        cache_key = tuple(columns)
+        with self._lock:
+            if cache_key not in self._fingerprints:
+                self._fingerprints[cache_key] = row_fingerprints(self.source_df, columns)
+            return self._fingerprints[cache_key]
+
+
+def compare_dataframes_multi(source_df: pd.DataFrame, target_dfs: Dict[str, pd.DataFrame],
+                             field_mapping: Dict[str, str], key_fields: List[str],
+                             compare_rules: Optional[Dict[str, str]] = None,
+                             duplicate_order: Optional[List[str]] = None,
+                             max_workers: Optional[int] = None) -> Dict[str, CompareResult]:
+    """
+    把一个源表与多个目标表并发比较
+
+    Args:
+        source_df: 源数据框
+        target_dfs: {目标表名称: 目标数据框}
+        field_mapping: 字段映射关系（所有目标表使用同一映射）
+        key_fields: 关键字段列表
+        compare_rules: 字段比较规则 {源字段名: 规则}，见 compare_rules 模块
+        duplicate_order: 重复键的配对方式，None为多对多展开，字段列表为按这些字段排序后逐个配对
+        max_workers: 线程数量，默认为目标表数量与CPU核数中的较小值
+
+    Returns:
+        {目标表名称: 列式比较结果}，顺序与 target_dfs 一致；每个结果与单独调用
+        compare_dataframes_vectorized 的结果相同
+    """
+    if not target_dfs:
+        return {}
+
+    # 字段映射为空时按源表与第一个目标表的共同字段补全，所有目标表使用同一映射
+    first_target_df = next(iter(target_dfs.values()))
+    field_mapping, key_fields = resolve_compare_fields(source_df, first_target_df, field_mapping, key_fields)
+
+    logger.info(f"Field mapping: {field_mapping}")
+    logger.info(f"Key fields: {key_fields}")
+
+    comparators = compile_compare_rules(compare_rules)
+    source_index = SourceIndex(source_df, key_fields)
+
+    def compare_target(name: str) -> CompareResult:
+        mapped_target_df = apply_target_mapping(target_dfs[name], field_mapping)
+        result = compare_mapped_columns(source_df, mapped_target_df, field_mapping, key_fields, comparators,
+                                        duplicate_order, key_codes=source_index.key_codes(mapped_target_df),
+                                        source_fingerprints=source_index.fingerprints)
+        logger.info(f"Comparison with {name} completed: {result.summary}")
+        return result
+
+    max_workers = max_workers or min(len(target_dfs), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(compare_target, target_dfs))
+    return dict(zip(target_dfs, results))
@@ -0,0 +1,161 @@
+"""
+无关键字段的多重集CSV数据比较
+
+部分导出数据没有可靠的关键字段，按第一列关联会得到无意义的结果。该引擎不使用关键字段：
+对每行全部映射字段计算64位哈希，把两表看作行哈希的多重集，按哈希计数做差——
+某一行在源表中出现的次数多于目标表时，多出的行计为数据丢失，反之计为仅目标表存在。
+整个过程只使用每行一个的数值数组（哈希、排序位置），不生成Python对象，
+可以在内存中处理数千万行。
+"""
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from routes.data.vectorized_compare import resolve_compare_fields, apply_target_mapping
+from routes.data.digest_compare import row_digests
+from routes.data.result_model import CompareResult
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 每次计算行哈希的行数，限制哈希各列时临时数组的大小
+ROW_HASH_CHUNK_ROWS = 1000000
+
+# 查找多出的行时预筛选位图使用的哈希低位位数（位图 1M 个布尔值）
+EXCESS_FILTER_BITS = 20
+
+
+def compare_dataframes_multiset(source_df: pd.DataFrame, target_df: pd.DataFrame,
+                                field_mapping: Dict[str, str]) -> CompareResult:
+    """
+    按整行哈希的多重集比较两个DataFrame
+
+    Args:
+        source_df: 源数据框
+        target_df: 目标数据框
+        field_mapping: 字段映射关系，映射后两表共有的字段参与行哈希；为空时使用两表的共同字段
+
+    Returns:
+        列式比较结果（没有关键字段，value_diff为空；记录按各自表的行顺序排列）
+    """
+    field_mapping, _ = resolve_compare_fields(source_df, target_df, field_mapping, [])
+    mapped_target_df = apply_target_mapping(target_df, field_mapping)
+    compare_columns = [
+        source_field for source_field in field_mapping
+        if source_field in source_df.columns and source_field in mapped_target_df.columns
+    ]
+    logger.info(f"Field mapping: {field_mapping}")
+    logger.info(f"Multiset compare on columns: {compare_columns}")
+
+    source_hashes, target_hashes = row_hashes(source_df, mapped_target_df, compare_columns)
+    loss_positions, target_only_positions = multiset_difference(source_hashes, target_hashes)
+
+    summary = {
+        'source_total_records': len(source_df),
+        'target_total_records': len(mapped_target_df),
+        'data_loss_count': len(loss_positions),
+        'target_only_count': len(target_only_positions),
+        'value_diff_count': 0,
+        'duplicate_key_count': 0,
+        'matching_records': len(source_df) - len(loss_positions),
+        'field_mapping': field_mapping,
+        'key_fields': []
+    }
+    compare_fields = [(column, field_mapping[column]) for column in compare_columns]
+    empty = np.empty(0, dtype=np.int64)
+    result = CompareResult(source_df, mapped_target_df, [], compare_fields,
+                           loss_positions, target_only_positions, empty, empty,
+                           np.zeros((0, len(compare_fields)), dtype=bool), summary)
+
+    logger.info(f"Comparison completed: {summary}")
+
+    return result
+
+
+def row_hashes(source_df: pd.DataFrame, mapped_target_df: pd.DataFrame,
+               compare_columns: List[str],
+               chunk_rows: int = ROW_HASH_CHUNK_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    分块计算两表每行在比较字段上的64位哈希（规则同digest_compare.row_digests）
+
+    两边类型不同的列按字符串形式哈希，与其他引擎按字符串形式比较的规则一致。
+    """
+    source_hashes = np.empty(len(source_df), dtype=np.uint64)
+    target_hashes = np.empty(len(mapped_target_df), dtype=np.uint64)
+    for start in range(0, max(len(source_df), len(mapped_target_df)), chunk_rows):
+        stop = start + chunk_rows
+        source_chunk, target_chunk = row_digests(source_df.iloc[start:stop], mapped_target_df.iloc[start:stop],
+                                                 compare_columns)
+        source_hashes[start:start + len(source_chunk)] = source_chunk
+        target_hashes[start:start + len(target_chunk)] = target_chunk
+    return source_hashes, target_hashes
+
+
+def multiset_difference(source_hashes: np.ndarray, target_hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    两个行哈希多重集的差
+
+    两边的哈希各自排序后得到每个取值的出现次数，再把两个有序序列归并得到另一表中的出现次数
+    （随机64位值排序、归并都比建哈希表快得多）。某个哈希在源表中出现 s 次、在目标表中出现 t 次时，
+    s > t 则该哈希在源表中的最后 s - t 行计为多出的行，反之亦然。
+
+    Returns:
+        (源表中多出的行位置, 目标表中多出的行位置)，均按行顺序排列
+    """
+    source_values, source_counts = _sorted_counts(source_hashes)
+    target_values, target_counts = _sorted_counts(target_hashes)
+    source_other, target_other = _merge_counts(source_values, source_counts, target_values, target_counts)
+    return (_excess_rows(source_hashes, source_values, source_counts, source_other),
+            _excess_rows(target_hashes, target_values, target_counts, target_other))
+
+
+def _sorted_counts(hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """排序后的不同哈希值及各自的出现次数"""
+    if len(hashes) == 0:
+        return hashes, np.empty(0, dtype=np.int64)
+    sorted_hashes = np.sort(hashes)
+    starts = np.flatnonzero(np.r_[True, sorted_hashes[1:] != sorted_hashes[:-1]])
+    return sorted_hashes[starts], np.diff(np.r_[starts, len(sorted_hashes)])
+
+
+def _merge_counts(source_values: np.ndarray, source_counts: np.ndarray,
+                  target_values: np.ndarray, target_counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """每个哈希在另一表中的出现次数（不存在为0）"""
+    merged = np.concatenate([source_values, target_values])
+    # 两段各自有序且不含重复值，稳定排序即为归并；相邻相等的一对分别来自源表和目标表
+    order = np.argsort(merged, kind='stable')
+    pairs = np.flatnonzero(merged[order[1:]] == merged[order[:-1]])
+    source_at, target_at = order[pairs], order[pairs + 1] - len(source_values)
+
+    source_other = np.zeros(len(source_values), dtype=np.int64)
+    target_other = np.zeros(len(target_values), dtype=np.int64)
+    source_other[source_at] = target_counts[target_at]
+    target_other[target_at] = source_counts[source_at]
+    return source_other, target_other
+
+
+def _excess_rows(hashes: np.ndarray, values: np.ndarray, counts: np.ndarray,
+                 other_counts: np.ndarray) -> np.ndarray:
+    """本表中出现次数多于另一表的行（每个哈希只取超出部分）"""
+    excess = counts > other_counts
+    if not excess.any():
+        return np.empty(0, dtype=np.int64)
+    excess_values, allowed = values[excess], other_counts[excess]
+
+    # 先用哈希低位的位图筛掉绝大多数行，剩下的行按哈希稳定排序后顺序查找（同一哈希内保持行顺序）
+    mask = np.uint64((1 << EXCESS_FILTER_BITS) - 1)
+    bitmap = np.zeros(1 << EXCESS_FILTER_BITS, dtype=bool)
+    bitmap[(excess_values & mask).astype(np.intp)] = True
+    candidates = np.flatnonzero(bitmap[(hashes & mask).astype(np.intp)])
+    candidates = candidates[np.argsort(hashes[candidates], kind='stable')]
+    candidate_hashes = hashes[candidates]
+    positions = np.minimum(np.searchsorted(excess_values, candidate_hashes), len(excess_values) - 1)
+    hit = excess_values[positions] == candidate_hashes
+    candidates, codes = candidates[hit], positions[hit]
+
+    # 组内序号不小于另一表出现次数的行即为多出的行
+    sequence = np.arange(len(codes))
+    ranks = sequence - np.maximum.accumulate(np.where(np.diff(codes, prepend=-1) != 0, sequence, 0))
+    return np.sort(candidates[ranks >= allowed[codes]])
@@ -0,0 +1,154 @@
+"""
+多进程CSV数据比较
+
+按关键字段哈希把两个表划分为若干分桶，在进程池中并行比较各分桶，
+再把部分结果按源表行顺序合并，结果与进程数量无关。
+
+进程池在各次比较之间复用（见 get_executor）。工作进程只返回差异记录在原表中的行位置、
+按位压缩的差异矩阵和摘要计数，不返回记录字典；合并后的结果与vectorized引擎一样是
+引用原数据框的列式结果（CompareResult）。分桶本身仍需序列化传给工作进程，
+耗时与数据量成正比，加速比取决于逐字段比较在总耗时中的比例（见 benchmark_compare_engines.py）。
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from routes.data.vectorized_compare import (
+    resolve_compare_fields, apply_target_mapping, compare_mapped_columns, compact_partial, merge_partial_results
+)
+from routes.data.compare_rules import FieldComparator, compile_compare_rules
+from routes.data.external_compare import key_partition_ids, HASH_KEYS
+from routes.data.result_model import CompareResult
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 每个进程分到的分桶数，分桶越多负载越均衡
+BUCKETS_PER_WORKER = 4
+
+# 行数少于该值时直接在当前进程比较，避免进程间传输的开销
+MIN_PARALLEL_ROWS = 100000
+
+# 复用的进程池及其进程数量
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def compare_dataframes_parallel(source_df: pd.DataFrame, target_df: pd.DataFrame,
+                                field_mapping: Dict[str, str], key_fields: List[str],
+                                max_workers: Optional[int] = None,
+                                num_buckets: Optional[int] = None,
+                                compare_rules: Optional[Dict[str, str]] = None,
+                                duplicate_order: Optional[List[str]] = None) -> CompareResult:
+    """
+    多进程比较两个DataFrame
+
+    Args:
+        source_df: 源数据框
+        target_df: 目标数据框
+        field_mapping: 字段映射关系
+        key_fields: 关键字段列表
+        max_workers: 进程数量，默认使用CPU核数
+        num_buckets: 分桶数量，默认 max_workers * BUCKETS_PER_WORKER
+        compare_rules: 字段比较规则 {源字段名: 规则}，见 compare_rules 模块
+        duplicate_order: 重复键的配对方式，None为多对多展开，字段列表为按这些字段排序后逐个配对
+
+    Returns:
+        列式比较结果（可按字典访问，结构同compare_dataframes，记录按源表行顺序排列）
+    """
+    field_mapping, key_fields = resolve_compare_fields(source_df, target_df, field_mapping, key_fields)
+
+    logger.info(f"Field mapping: {field_mapping}")
+    logger.info(f"Key fields: {key_fields}")
+
+    max_workers = max_workers or os.cpu_count() or 1
+    num_buckets = num_buckets or max_workers * BUCKETS_PER_WORKER
+
+    comparators = compile_compare_rules(compare_rules)
+    mapped_target_df = apply_target_mapping(target_df, field_mapping)
+    buckets = partition_frames(source_df, mapped_target_df, key_fields, num_buckets)
+    tasks = [(source_bucket, target_bucket, field_mapping, key_fields, comparators, duplicate_order)
+             for source_bucket, target_bucket in buckets]
+
+    if max_workers == 1 or len(source_df) + len(target_df) < MIN_PARALLEL_ROWS:
+        partials = [_compare_bucket(task) for task in tasks]
+    else:
+        try:
+            partials = list(get_executor(max_workers).map(_compare_bucket, tasks))
+        except BrokenProcessPool:
+            shutdown_executor()
+            raise
+
+    result = merge_partial_results(partials, source_df, mapped_target_df, field_mapping, key_fields)
+
+    logger.info(f"Parallel compare: {num_buckets} buckets, {max_workers} workers")
+    logger.info(f"Comparison completed: {result['summary']}")
+
+    return result
+
+
+def get_executor(max_workers: int) -> ProcessPoolExecutor:
+    """获取复用的进程池，进程数量变化时重新创建（旧进程池在已提交的分桶完成后退出）"""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != max_workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=max_workers)
+            _executor_workers = max_workers
+        return _executor
+
+
+def shutdown_executor():
+    """关闭复用的进程池（进程池损坏后下一次比较重新创建）"""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor, _executor_workers = None, 0
+
+
+def partition_frames(source_df: pd.DataFrame, mapped_target_df: pd.DataFrame,
+                     key_fields: List[str], num_buckets: int) -> List[Tuple[pd.DataFrame, pd.DataFrame]]:
+    """
+    按关键字段哈希划分源表和目标表
+
+    分桶的索引为原表中的行位置，合并结果时据此恢复源表行顺序。
+    """
+    source_groups = _group_positions(
+        key_partition_ids(source_df[key_fields], num_buckets, HASH_KEYS[0]), num_buckets)
+    target_groups = _group_positions(
+        key_partition_ids(mapped_target_df[key_fields], num_buckets, HASH_KEYS[0]), num_buckets)
+
+    buckets = []
+    for source_positions, target_positions in zip(source_groups, target_groups):
+        if len(source_positions) == 0 and len(target_positions) == 0:
+            continue
+        source_bucket = source_df.iloc[source_positions]
+        source_bucket.index = source_positions
+        target_bucket = mapped_target_df.iloc[target_positions]
+        target_bucket.index = target_positions
+        buckets.append((source_bucket, target_bucket))
+    return buckets
+
+
+def _group_positions(bucket_ids: np.ndarray, num_buckets: int) -> List[np.ndarray]:
+    """把行位置按分桶编号分组（组内保持原有顺序）"""
+    order = np.argsort(bucket_ids, kind='stable')
+    bounds = np.searchsorted(bucket_ids[order], np.arange(num_buckets + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(num_buckets)]
+
+
+def _compare_bucket(task: Tuple[pd.DataFrame, pd.DataFrame, Dict[str, str], List[str],
+                                Dict[str, FieldComparator], Optional[List[str]]]) -> tuple:
+    """进程池中执行的单个分桶比较，返回 compact_partial 形式的结果（分桶的行标签即原表中的行位置）"""
+    source_bucket, target_bucket, field_mapping, key_fields, comparators, duplicate_order = task
+    return compact_partial(compare_mapped_columns(source_bucket, target_bucket, field_mapping, key_fields,
+                                                  comparators, duplicate_order))
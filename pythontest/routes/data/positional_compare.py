@@ -0,0 +1,280 @@
+"""
+按行位置比较有序CSV文件
+
+日志、流水账一类导出的行顺序本身有意义，不能按关键字段关联。该引擎对每行全部映射字段计算64位哈希，
+在两个哈希序列上做差异比较，得到插入、删除和修改的行范围（hunk）：
+
+1. 两边都只出现一次的哈希作为锚点（patience diff的做法），取目标表位置递增的最长子序列，
+   把序列切分为锚点之间的小段；锚点本身的判定完全在numpy数组上完成
+2. 每一小段用Myers的线性空间算法（中间蛇 + 分治）求最短编辑脚本，编辑距离超过
+   MAX_DIFF_COST 的小段整体视为一个修改范围
+3. 相邻的删除和插入合并为修改范围；只有修改范围内按位置配对的行才逐字段比较
+   （vectorized_compare.column_diff_mask），多出的行计为删除（数据丢失）或插入（仅目标表存在）
+
+基本一致的百万行文件，主要耗时是计算行哈希和锚点排序。
+"""
+import bisect
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from routes.data.vectorized_compare import resolve_compare_fields, apply_target_mapping, column_diff_mask
+from routes.data.multiset_compare import row_hashes
+from routes.data.result_model import CompareResult
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 单个小段的编辑距离上限，超过后整段视为修改范围（限制最坏情况下的 O(D^2) 搜索）
+MAX_DIFF_COST = 2000
+
+# 报告中表示行号的关键字段名（与数据列重名时在前面加下划线）
+ROW_FIELD = 'Row'
+
+
+def compare_dataframes_positional(source_df: pd.DataFrame, target_df: pd.DataFrame,
+                                  field_mapping: Dict[str, str]) -> CompareResult:
+    """
+    按行位置比较两个DataFrame
+
+    Args:
+        source_df: 源数据框
+        target_df: 目标数据框
+        field_mapping: 字段映射关系，映射后两表共有的字段参与行哈希和逐字段比较；为空时使用两表的共同字段
+
+    Returns:
+        列式比较结果，关键字段为各自文件中的行号（从1开始）；值差异的行号为源表行号
+    """
+    field_mapping, _ = resolve_compare_fields(source_df, target_df, field_mapping, [])
+    mapped_target_df = apply_target_mapping(target_df, field_mapping)
+    compare_columns = [
+        source_field for source_field in field_mapping
+        if source_field in source_df.columns and source_field in mapped_target_df.columns
+    ]
+    logger.info(f"Field mapping: {field_mapping}")
+    logger.info(f"Positional compare on columns: {compare_columns}")
+
+    source_hashes, target_hashes = row_hashes(source_df, mapped_target_df, compare_columns)
+    hunks = diff_hunks(source_hashes, target_hashes)
+    source_lengths, target_lengths = hunks[:, 1] - hunks[:, 0], hunks[:, 3] - hunks[:, 2]
+
+    # 修改范围内按位置配对，多出的行为删除或插入
+    paired = np.minimum(source_lengths, target_lengths)
+    pair_source_rows = _ranges(hunks[:, 0], paired)
+    pair_target_rows = _ranges(hunks[:, 2], paired)
+    loss_rows = _ranges(hunks[:, 0] + paired, source_lengths - paired)
+    target_only_rows = _ranges(hunks[:, 2] + paired, target_lengths - paired)
+
+    diff_matrix = np.zeros((len(pair_source_rows), len(compare_columns)), dtype=bool)
+    for i, column in enumerate(compare_columns):
+        diff_matrix[:, i] = column_diff_mask(source_df[column].iloc[pair_source_rows],
+                                             mapped_target_df[column].iloc[pair_target_rows])
+    any_diff = diff_matrix.any(axis=1)
+
+    summary = {
+        'source_total_records': len(source_df),
+        'target_total_records': len(mapped_target_df),
+        'data_loss_count': len(loss_rows),
+        'target_only_count': len(target_only_rows),
+        'value_diff_count': int(any_diff.sum()),
+        'duplicate_key_count': 0,
+        'matching_records': len(source_df) - len(loss_rows) - int(any_diff.sum()),
+        'inserted_hunk_count': int(((source_lengths == 0) & (target_lengths > 0)).sum()),
+        'deleted_hunk_count': int(((source_lengths > 0) & (target_lengths == 0)).sum()),
+        'changed_hunk_count': int(((source_lengths > 0) & (target_lengths > 0)).sum()),
+        'field_mapping': field_mapping,
+        'key_fields': []
+    }
+
+    # 行号作为关键字段加在浅拷贝上，报告中每条记录带有所在文件的行号
+    row_field = ROW_FIELD
+    while row_field in source_df.columns or row_field in mapped_target_df.columns:
+        row_field = f'_{row_field}'
+    source_view = source_df.assign(**{row_field: np.arange(1, len(source_df) + 1)})
+    target_view = mapped_target_df.assign(**{row_field: np.arange(1, len(mapped_target_df) + 1)})
+    summary['key_fields'] = [row_field]
+
+    logger.info(f"Comparison completed: {summary}")
+
+    return CompareResult(source_view, target_view, [row_field],
+                         [(column, field_mapping[column]) for column in compare_columns],
+                         loss_rows, target_only_rows, pair_source_rows[any_diff], pair_target_rows[any_diff],
+                         diff_matrix[any_diff], summary)
+
+
+def diff_hunks(source_hashes: np.ndarray, target_hashes: np.ndarray,
+               max_cost: int = MAX_DIFF_COST) -> np.ndarray:
+    """
+    两个行哈希序列之间的差异范围
+
+    Returns:
+        (范围数 × 4) 的数组，每行为 [源表起始, 源表结束, 目标表起始, 目标表结束)，按位置排列；
+        源表范围为空是插入，目标表范围为空是删除，两边都不为空是修改
+    """
+    source_anchors, target_anchors = unique_anchors(source_hashes, target_hashes)
+
+    # 锚点之间（以及首尾）的小段，两边都为空的跳过
+    source_starts = np.r_[0, source_anchors + 1]
+    source_ends = np.r_[source_anchors, len(source_hashes)]
+    target_starts = np.r_[0, target_anchors + 1]
+    target_ends = np.r_[target_anchors, len(target_hashes)]
+    gaps = np.flatnonzero((source_ends > source_starts) | (target_ends > target_starts))
+    logger.debug(f"Positional diff: {len(source_anchors)} anchors, {len(gaps)} gaps")
+
+    edits = []
+    for gap in gaps:
+        source_start, target_start = int(source_starts[gap]), int(target_starts[gap])
+        for a0, a1, b0, b1 in myers_edits(source_hashes[source_start:source_ends[gap]].tolist(),
+                                          target_hashes[target_start:target_ends[gap]].tolist(), max_cost):
+            edits.append((source_start + a0, source_start + a1, target_start + b0, target_start + b1))
+
+    # 相邻的删除和插入合并为一个修改范围
+    hunks = []
+    for edit in edits:
+        if hunks and hunks[-1][1] == edit[0] and hunks[-1][3] == edit[2]:
+            hunks[-1][1], hunks[-1][3] = edit[1], edit[3]
+        else:
+            hunks.append(list(edit))
+    return np.array(hunks, dtype=np.int64).reshape(-1, 4)
+
+
+def unique_anchors(source_hashes: np.ndarray, target_hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    两边都只出现一次的哈希中，目标表位置随源表位置递增的最长子序列
+
+    Returns:
+        (锚点在源表中的位置, 锚点在目标表中的位置)，两者都严格递增
+    """
+    source_values, source_positions = _unique_once(source_hashes)
+    target_values, target_positions = _unique_once(target_hashes)
+    _, source_at, target_at = np.intersect1d(source_values, target_values, assume_unique=True,
+                                             return_indices=True)
+    order = np.argsort(source_positions[source_at])
+    source_anchors = source_positions[source_at][order]
+    target_anchors = target_positions[target_at][order]
+
+    # 没有移动过的行时目标表位置已经递增（只有插入、删除和修改的常见情况）
+    if len(target_anchors) > 1 and not (np.diff(target_anchors) > 0).all():
+        keep = longest_increasing_subsequence(target_anchors.tolist())
+        source_anchors, target_anchors = source_anchors[keep], target_anchors[keep]
+    return source_anchors, target_anchors
+
+
+def _unique_once(hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """只出现一次的哈希值（排序）及其位置"""
+    values, positions, counts = np.unique(hashes, return_index=True, return_counts=True)
+    once = counts == 1
+    return values[once], positions[once]
+
+
+def longest_increasing_subsequence(values: List[int]) -> np.ndarray:
+    """严格递增的最长子序列的下标（patience sorting，O(n log n)）"""
+    tails, tail_indices = [], []
+    previous = [-1] * len(values)
+    for i, value in enumerate(values):
+        pile = bisect.bisect_left(tails, value)
+        if pile == len(tails):
+            tails.append(value)
+            tail_indices.append(i)
+        else:
+            tails[pile] = value
+            tail_indices[pile] = i
+        previous[i] = tail_indices[pile - 1] if pile else -1
+
+    sequence = []
+    i = tail_indices[-1] if tail_indices else -1
+    while i >= 0:
+        sequence.append(i)
+        i = previous[i]
+    return np.array(sequence[::-1], dtype=np.int64)
+
+
+def myers_edits(a: list, b: list, max_cost: int = MAX_DIFF_COST) -> List[Tuple[int, int, int, int]]:
+    """
+    Myers线性空间差异算法
+
+    Returns:
+        按位置排列的编辑范围 [(a起始, a结束, b起始, b结束)]，范围之外的行两边相同
+    """
+    edits = []
+    _diff(a, b, 0, len(a), 0, len(b), max_cost, edits)
+    return edits
+
+
+def _diff(a: list, b: list, a0: int, a1: int, b0: int, b1: int, max_cost: int,
+          edits: List[Tuple[int, int, int, int]]):
+    """去掉共同的首尾后按中间蛇分治"""
+    while a0 < a1 and b0 < b1 and a[a0] == b[b0]:
+        a0 += 1
+        b0 += 1
+    while a0 < a1 and b0 < b1 and a[a1 - 1] == b[b1 - 1]:
+        a1 -= 1
+        b1 -= 1
+    if a0 == a1 or b0 == b1:
+        if a0 < a1 or b0 < b1:
+            edits.append((a0, a1, b0, b1))
+        return
+    if set(a[a0:a1]).isdisjoint(b[b0:b1]):
+        # 没有相同的行，整段就是一个修改范围（整段替换的常见情况不必搜索）
+        edits.append((a0, a1, b0, b1))
+        return
+
+    snake = _middle_snake(a, b, a0, a1, b0, b1, max_cost)
+    if snake is None:
+        edits.append((a0, a1, b0, b1))
+        return
+    x0, y0, x1, y1 = snake
+    _diff(a, b, a0, x0, b0, y0, max_cost, edits)
+    _diff(a, b, x1, a1, y1, b1, max_cost, edits)
+
+
+def _middle_snake(a: list, b: list, a0: int, a1: int, b0: int, b1: int,
+                  max_cost: int) -> Optional[Tuple[int, int, int, int]]:
+    """
+    同时从两端搜索D路径，返回最短编辑脚本中间的一段相同行 (x0, y0, x1, y1)
+
+    forward[k] / backward[k] 为对角线k上正向/反向已到达的最远x（反向从序列末尾算起）；
+    编辑距离的一半超过 max_cost 时返回None。
+    """
+    n, m = a1 - a0, b1 - b0
+    delta = n - m
+    odd = delta % 2 == 1
+    forward, backward = {1: 0}, {1: 0}
+    for d in range(min((n + m + 1) // 2, max_cost) + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[k - 1] < forward[k + 1]):
+                x = forward[k + 1]
+            else:
+                x = forward[k - 1] + 1
+            y = x - k
+            x_start, y_start = x, y
+            while x < n and y < m and a[a0 + x] == b[b0 + y]:
+                x += 1
+                y += 1
+            forward[k] = x
+            if odd and -(d - 1) <= delta - k <= d - 1 and x + backward[delta - k] >= n:
+                return a0 + x_start, b0 + y_start, a0 + x, b0 + y
+
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and backward[k - 1] < backward[k + 1]):
+                x = backward[k + 1]
+            else:
+                x = backward[k - 1] + 1
+            y = x - k
+            x_start, y_start = x, y
+            while x < n and y < m and a[a1 - 1 - x] == b[b1 - 1 - y]:
+                x += 1
+                y += 1
+            backward[k] = x
+            if not odd and -d <= delta - k <= d and x + forward[delta - k] >= n:
+                return a1 - x, b1 - y, a1 - x_start, b1 - y_start
+    return None
+
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """把若干 [起始, 起始+长度) 范围展开为位置数组"""
+    lengths = lengths.astype(np.int64)
+    offsets = np.arange(lengths.sum(), dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts.astype(np.int64), lengths) + offsets
@@ -0,0 +1,218 @@
+"""
+抽样预览比较
+
+按关键字段哈希抽取可复现的关键字段样本（两边抽中的是同一批键），只比较样本中的记录，
+估算数据丢失率、值差异率以及各字段的差异率，并给出置信区间。文件分块读取，
+只保留抽中的行，内存占用与抽样比例成正比。
+"""
+import logging
+import math
+from statistics import NormalDist
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from routes.data.ingest import csv_read_options, apply_field_types, compare_read_plan
+from routes.data.vectorized_compare import (
+    resolve_compare_fields, map_target_columns, apply_target_mapping, compare_mapped_columns
+)
+from routes.data.external_compare import key_hashes
+from routes.data.compare_rules import compile_compare_rules
+from routes.data.result_model import CompareResult
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 抽样粒度：关键字段哈希对该值取模，小于 sample_rate * SAMPLE_SLOTS 的键被抽中
+SAMPLE_SLOTS = 1000000
+
+# 分块读取时每块的行数
+PREVIEW_CHUNK_ROWS = 200000
+
+
+def preview_compare_csv(source_file, target_file, field_mapping: Dict[str, str], key_fields: List[str],
+                        field_types: Optional[Dict[str, str]] = None, sample_rate: float = 0.01,
+                        seed: int = 0, confidence: float = 0.95,
+                        compare_rules: Optional[Dict[str, str]] = None,
+                        duplicate_order: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    抽样预览比较两个CSV文件
+
+    Args:
+        source_file: 源CSV文件路径或文件对象
+        target_file: 目标CSV文件路径或文件对象
+        field_mapping: 字段映射关系
+        key_fields: 关键字段列表
+        field_types: 字段类型 {源字段名: 类型}，见 ingest.FIELD_TYPES
+        sample_rate: 抽样比例 (0, 1]
+        seed: 随机种子，相同种子抽中相同的键
+        confidence: 置信区间的置信水平
+        compare_rules: 字段比较规则 {源字段名: 规则}，见 compare_rules 模块
+        duplicate_order: 重复键的配对方式，None为多对多展开，字段列表为按这些字段排序后逐个配对
+            （按关键字段抽样，重复键的所有行同时被抽中）
+
+    Returns:
+        预览结果字典，见 estimate_differences
+    """
+    if not 0 < sample_rate <= 1:
+        raise ValueError('sample_rate must be in (0, 1]')
+    comparators = compile_compare_rules(compare_rules)
+
+    source_columns, source_types, target_columns, target_types = compare_read_plan(
+        field_mapping, key_fields, field_types or {})
+    source_header = _read_header(source_file, csv_read_options(source_columns, source_types))
+    target_header = _read_header(target_file, csv_read_options(target_columns, target_types))
+    field_mapping, key_fields = resolve_compare_fields(
+        pd.DataFrame(columns=source_header), pd.DataFrame(columns=target_header), field_mapping, key_fields)
+
+    mapped_target_header = map_target_columns(target_header, field_mapping)
+    missing = [field for field in key_fields
+               if field not in source_header or field not in mapped_target_header]
+    if missing:
+        raise KeyError(f"Key fields not found in both files: {missing}")
+    target_key_columns = [target_header[mapped_target_header.index(field)] for field in key_fields]
+
+    source_df, source_total = sample_csv(source_file, key_fields, sample_rate, seed,
+                                         source_columns, source_types)
+    target_df, target_total = sample_csv(target_file, target_key_columns, sample_rate, seed,
+                                         target_columns, target_types)
+    logger.info(f"Preview sample: {len(source_df)} of {source_total} source rows, "
+                f"{len(target_df)} of {target_total} target rows")
+
+    result = compare_mapped_columns(source_df, apply_target_mapping(target_df, field_mapping),
+                                    field_mapping, key_fields, comparators, duplicate_order)
+    return estimate_differences(result, source_total, target_total, sample_rate, seed, confidence)
+
+
+def sample_csv(file, key_columns: List[str], sample_rate: float, seed: int,
+               columns: Optional[List[str]] = None,
+               field_types: Optional[Dict[str, str]] = None,
+               chunksize: Optional[int] = None) -> Tuple[pd.DataFrame, int]:
+    """
+    分块读取CSV文件，只保留关键字段被抽中的行
+
+    未声明类型的关键字段按字符串读取：各数据块单独推断类型时，同一个键在纯数字的块中是数值、
+    在含字母的块中是字符串，哈希不同，两边会抽中不同的键。抽样后只有整个文件中的值都是数字时
+    才把关键字段转为数值，与整文件读取时推断的类型一致。
+
+    Returns:
+        (抽中的行（保留原始行号作为索引）, 文件总行数)
+    """
+    field_types = field_types or {}
+    read_options = csv_read_options(columns, field_types)
+    text_keys = [column for column in key_columns if column not in field_types]
+    read_options['dtype'] = {**dict.fromkeys(text_keys, str), **read_options.get('dtype', {})}
+    numeric_keys = set(text_keys)
+    chunks = []
+    total_rows = 0
+    for chunk in pd.read_csv(file, chunksize=chunksize or PREVIEW_CHUNK_ROWS, **read_options):
+        total_rows += len(chunk)
+        numeric_keys = {column for column in numeric_keys if _all_numeric(chunk[column])}
+        chunks.append(chunk[key_sample_mask(chunk[key_columns], sample_rate, seed)])
+
+    sample = pd.concat(chunks) if chunks else pd.DataFrame(columns=columns or [])
+    for column in numeric_keys:
+        if column in sample.columns:
+            sample[column] = pd.to_numeric(sample[column])
+    return apply_field_types(sample, field_types), total_rows
+
+
+def _all_numeric(values: pd.Series) -> bool:
+    """非空值是否都能解析为数字"""
+    return pd.to_numeric(values, errors='coerce').notna().sum() == values.notna().sum()
+
+
+def key_sample_mask(key_frame: pd.DataFrame, sample_rate: float, seed: int) -> np.ndarray:
+    """
+    关键字段是否被抽中（只取决于键值和种子，两边相同的键结果一致）
+
+    字符串形式的数字按数值哈希，所以 '7'、'7.0' 与数值7抽样结果相同。
+    """
+    normalized = {}
+    for column in key_frame.columns:
+        values = key_frame[column]
+        if pd.api.types.is_bool_dtype(values.dtype):
+            normalized[column] = values
+            continue
+        numbers = pd.to_numeric(values, errors='coerce').astype('float64')
+        normalized[column] = values.astype(object).where(numbers.isna(), numbers.astype(object))
+    hashes = key_hashes(pd.DataFrame(normalized), f'csvpreview{seed % 1000000:06d}')
+    return hashes % np.uint64(SAMPLE_SLOTS) < np.uint64(round(sample_rate * SAMPLE_SLOTS))
+
+
+def estimate_differences(result: CompareResult, source_total: int, target_total: int,
+                         sample_rate: float, seed: int, confidence: float) -> Dict[str, Any]:
+    """
+    根据样本比较结果估算全量差异
+
+    数据丢失率以抽中的源表记录为分母，仅目标表存在的记录率以抽中的目标表记录为分母，
+    值差异率和各字段差异率以抽中的共同记录为分母；区间为Wilson得分区间，
+    估计数量按对应表的总行数等比例放大。
+    """
+    summary = result.summary
+    sampled_source = summary['source_total_records']
+    sampled_target = summary['target_total_records']
+    sampled_common = summary['matching_records'] + summary['value_diff_count']
+    # 实际抽样比例的倒数，用于把样本中的数量放大为全量估计
+    scale = source_total / sampled_source if sampled_source else 0.0
+    target_scale = target_total / sampled_target if sampled_target else 0.0
+
+    column_counts = result.column_diff_counts()
+
+    return {
+        'sample_rate': sample_rate,
+        'seed': seed,
+        'confidence': confidence,
+        'source_total_records': source_total,
+        'target_total_records': target_total,
+        'sampled_source_records': sampled_source,
+        'sampled_target_records': sampled_target,
+        'sampled_common_records': sampled_common,
+        'sampled_duplicate_keys': summary['duplicate_key_count'],
+        'data_loss': rate_estimate(summary['data_loss_count'], sampled_source, scale, confidence),
+        'target_only': rate_estimate(summary['target_only_count'], sampled_target, target_scale, confidence),
+        'value_diff': rate_estimate(summary['value_diff_count'], sampled_common, scale, confidence),
+        'columns': {
+            field: {
+                'target_field': summary['field_mapping'][field],
+                **rate_estimate(count, sampled_common, scale, confidence)
+            }
+            for field, count in column_counts.items()
+        },
+        'field_mapping': summary['field_mapping'],
+        'key_fields': summary['key_fields']
+    }
+
+
+def rate_estimate(count: int, sample_size: int, scale: float, confidence: float) -> Dict[str, Any]:
+    """样本中的比例、置信区间及按总量放大后的估计数量"""
+    low, high = wilson_interval(count, sample_size, confidence)
+    rate = count / sample_size if sample_size else 0.0
+    estimated_population = sample_size * scale
+    return {
+        'sampled_count': count,
+        'rate': round(rate, 6),
+        'rate_interval': [round(low, 6), round(high, 6)],
+        'estimated_count': round(rate * estimated_population),
+        'estimated_count_interval': [round(low * estimated_population), round(high * estimated_population)]
+    }
+
+
+def wilson_interval(count: int, sample_size: int, confidence: float) -> Tuple[float, float]:
+    """二项比例的Wilson得分区间（样本为空时返回[0, 1]）"""
+    if sample_size == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = count / sample_size
+    denominator = 1 + z * z / sample_size
+    center = (p + z * z / (2 * sample_size)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / sample_size + z * z / (4 * sample_size * sample_size)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def _read_header(file, read_options: Dict[str, Any]) -> List[str]:
+    columns = list(pd.read_csv(file, nrows=0, **read_options).columns)
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return columns
@@ -0,0 +1,156 @@
+"""
+机器可读的比较报告
+
+给下游程序使用时，带样式的xlsx是生成最慢、体积最大的报告。这里把差异集合直接从结果数据
+按段写出为gzip压缩的CSV、Parquet或gzip压缩的NDJSON（每行一个JSON对象），不经过openpyxl：
+每个差异集合（Data_Loss、Target_Only、Value_Differences、Duplicate_Keys）一个文件，
+摘要计数为summary.json，打包为zip。各文件本身已经压缩，zip条目不再压缩。
+
+报告格式由请求的 format 参数指定，未指定时按Accept请求头协商，默认仍为xlsx。csv/parquet/ndjson
+报告都是zip文件（Content-Type为application/zip），所以Accept只在xlsx和zip之间协商，
+协商为zip时为csv格式；parquet/ndjson需要用 format 参数指定。
+"""
+import gzip
+import io
+import json
+import logging
+import zipfile
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from routes.data.excel_report import ReportSheet
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow未安装时不支持parquet格式
+    pa = pq = None
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 默认的带样式Excel报告
+EXCEL_FORMAT = 'xlsx'
+
+# 报告格式 -> 差异集合文件的扩展名
+EXPORT_FORMATS = {
+    'csv': '.csv.gz',
+    'parquet': '.parquet',
+    'ndjson': '.ndjson.gz',
+}
+
+# Accept请求头中可协商的媒体类型 -> 报告格式，排在前面的优先（*/* 时为xlsx）；
+# 响应的Content-Type与协商的媒体类型一致
+REPORT_MEDIA_TYPES = {
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': EXCEL_FORMAT,
+    'application/zip': 'csv',
+}
+
+# gzip压缩级别（与zlib默认相同，比gzip模块默认的9快得多，体积相差很小）
+GZIP_LEVEL = 6
+
+
+def negotiate_report_format(requested: Optional[str], accept) -> Optional[str]:
+    """
+    确定报告格式
+
+    Args:
+        requested: 请求的 format 参数，指定时优先
+        accept: 请求的Accept头（werkzeug的MIMEAccept）
+
+    Returns:
+        报告格式名称（可能是不支持的值，由调用方校验）；没有Accept头时为xlsx，
+        Accept头中没有可接受的媒体类型（REPORT_MEDIA_TYPES）时为None
+    """
+    if requested:
+        return requested.strip().lower()
+    if not accept:
+        return EXCEL_FORMAT
+    media_type = accept.best_match(list(REPORT_MEDIA_TYPES))
+    return REPORT_MEDIA_TYPES[media_type] if media_type else None
+
+
+def parquet_available() -> bool:
+    """是否安装了pyarrow"""
+    return pq is not None
+
+
+def write_export_archive(path: str, sheets: List[ReportSheet], summary: Dict[str, Any], export_format: str):
+    """
+    把差异集合按段写出为指定格式的文件，与summary.json一起打包为zip
+
+    Args:
+        path: zip文件路径
+        sheets: 差异集合（report_sheets 中除摘要以外的工作表）
+        summary: 摘要计数（可JSON序列化）
+        export_format: EXPORT_FORMATS 中的格式
+    """
+    suffix = EXPORT_FORMATS[export_format]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for sheet in sheets:
+            with archive.open(f'{sheet.name}{suffix}', 'w', force_zip64=True) as entry:
+                EXPORT_WRITERS[export_format](entry, sheet)
+            logger.debug(f"{sheet.name}{suffix}: {sheet.rows} rows written")
+        archive.writestr('summary.json', json.dumps(summary, ensure_ascii=False, indent=2, default=str))
+
+
+def write_csv(stream, sheet: ReportSheet):
+    """gzip压缩的UTF-8 CSV，空值为空字段"""
+    with io.TextIOWrapper(gzip.GzipFile(fileobj=stream, mode='wb', compresslevel=GZIP_LEVEL),
+                          encoding='utf-8', newline='') as text:
+        pd.DataFrame(columns=sheet.columns).to_csv(text, index=False)
+        for chunk in sheet.chunks():
+            chunk.to_csv(text, index=False, header=False)
+
+
+def write_ndjson(stream, sheet: ReportSheet):
+    """gzip压缩的NDJSON，每条记录一行，空值为null，日期为ISO格式"""
+    with io.TextIOWrapper(gzip.GzipFile(fileobj=stream, mode='wb', compresslevel=GZIP_LEVEL),
+                          encoding='utf-8') as text:
+        for chunk in sheet.chunks():
+            chunk.to_json(text, orient='records', lines=True, date_format='iso', force_ascii=False)
+
+
+def parquet_schema(sheet: ReportSheet):
+    """
+    由工作表各列的数据类型确定Parquet schema
+
+    行组写出后不能再改变列类型，所以不按第一段推断，而是取 sheet.render(0, 0) 的空数据框：
+    各段从同一个源表/目标表数据框按行位置取出，列的数据类型与空数据框相同（值差异的整数、
+    布尔列为可空类型，见 result_model）。object列（Decimal、混合类型等）和类型未知的列按字符串写出。
+    """
+    empty = sheet.render(0, 0)
+    fields = []
+    for column in sheet.columns:
+        arrow_type = pa.null()
+        if column in empty.columns and empty[column].dtype != object:
+            arrow_type = pa.array(empty[column], from_pandas=True).type
+        fields.append((column, pa.string() if pa.types.is_null(arrow_type) else arrow_type))
+    return pa.schema(fields)
+
+
+def _arrow_column(values: pd.Series, arrow_type):
+    """把一段中的一列转换为schema中的类型，字符串列逐个值转换为字符串"""
+    if pa.types.is_string(arrow_type):
+        try:
+            return pa.array(values, from_pandas=True).cast(arrow_type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            return pa.array([None if pd.isna(value) else str(value) for value in values], type=arrow_type)
+    return pa.array(values, type=arrow_type, from_pandas=True)
+
+
+def write_parquet(stream, sheet: ReportSheet):
+    """Parquet，每段一个行组；列类型由 parquet_schema 按工作表的数据类型确定"""
+    schema = parquet_schema(sheet)
+    with pq.ParquetWriter(stream, schema) as writer:
+        for chunk in sheet.chunks():
+            writer.write_table(pa.Table.from_arrays(
+                [_arrow_column(chunk[field.name], field.type) for field in schema], schema=schema))
+
+
+EXPORT_WRITERS = {
+    'csv': write_csv,
+    'parquet': write_parquet,
+    'ndjson': write_ndjson,
+}
@@ -0,0 +1,162 @@
+"""
+比较结果缓存
+
+按 (源文件哈希, 目标文件哈希, 映射配置, 引擎选项) 缓存生成的报告文件，
+相同输入再次比较时直接返回已生成的报告。条目有过期时间和总大小上限。
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from flask import current_app
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 请求头中要求跳过缓存的取值
+BYPASS_HEADER = 'X-Compare-Cache'
+BYPASS_VALUE = 'bypass'
+
+
+class ResultCache:
+    """比较报告的磁盘缓存（过期时间 + 最近使用淘汰）"""
+
+    def __init__(self, cache_dir: str, max_bytes: int, ttl_seconds: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> (路径, 大小, 创建时间)，按最近使用排序
+        self._entries = OrderedDict()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_entries()
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        """根据输入文件哈希、映射配置和引擎选项生成缓存键"""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """返回缓存的报告路径，不存在或已过期时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            path, _, created = entry
+            if time.time() - created > self.ttl_seconds or not os.path.exists(path):
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return path
+
+    def put(self, key: str, report_path: str, suffix: str = '.xlsx'):
+        """复制报告文件到缓存，并淘汰过期和超出大小上限的条目"""
+        size = os.path.getsize(report_path)
+        if size > self.max_bytes:
+            logger.info(f"Report {key} exceeds result cache size limit, not cached")
+            return
+
+        path = os.path.join(self.cache_dir, f'{key}{suffix}')
+        temp_path = f'{path}.tmp'
+        shutil.copyfile(report_path, temp_path)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            if key in self._entries and self._entries[key][0] != path:
+                self._remove(key)
+            self._entries[key] = (path, size, time.time())
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """命中/未命中等统计信息，供监控使用"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypasses': self.bypasses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'size_bytes': sum(size for _, size, _ in self._entries.values()),
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds
+            }
+
+    def _evict(self):
+        """先删除过期条目，再按最近使用淘汰到大小上限以内（调用方持有锁）"""
+        now = time.time()
+        for key in [key for key, (_, _, created) in self._entries.items()
+                    if now - created > self.ttl_seconds]:
+            self._remove(key)
+            self.evictions += 1
+
+        total = sum(size for _, size, _ in self._entries.values())
+        while total > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            total -= self._entries[key][1]
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        path, _, _ = self._entries.pop(key)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _load_entries(self):
+        """重启后从缓存目录恢复条目，修改时间作为创建时间"""
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name.split('.')[0], entry.path, stat.st_size))
+        for created, key, path, size in sorted(files):
+            self._entries[key] = (path, size, created)
+        with self._lock:
+            self._evict()
+
+
+def bypass_requested(headers) -> bool:
+    """请求是否要求跳过结果缓存（Cache-Control: no-cache 或 X-Compare-Cache: bypass）"""
+    cache_control = headers.get('Cache-Control', '').lower()
+    return 'no-cache' in cache_control or headers.get(BYPASS_HEADER, '').lower() == BYPASS_VALUE
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """
+    获取当前应用的结果缓存
+
+    Returns:
+        ResultCache实例；未启用时返回None
+    """
+    if not current_app.config.get('RESULT_CACHE_ENABLED', False):
+        return None
+
+    cache = current_app.extensions.get('result_cache')
+    if cache is None:
+        cache = ResultCache(current_app.config['RESULT_CACHE_DIR'],
+                            current_app.config['RESULT_CACHE_MAX_MB'] * 1024 * 1024,
+                            current_app.config['RESULT_CACHE_TTL_SECONDS'])
+        current_app.extensions['result_cache'] = cache
+    return cache
@@ -0,0 +1,302 @@
+"""
+列式比较结果
+
+不为每条差异复制整行数据，只保存关键字段所在的原始数据框引用、差异记录在两表中的
+行位置，以及按位压缩的“记录 × 比较字段”差异矩阵，内存与差异条数成正比。
+报告所需的宽表和兼容旧结构的 data_loss / target_only / value_diff / duplicate_keys
+列表都在读取时才生成。
+"""
+from collections.abc import Mapping
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 数据丢失记录的原因说明
+DATA_LOSS_REASON = 'Record exists in source but not in target'
+
+# 仅目标表存在的记录的原因说明
+TARGET_ONLY_REASON = 'Record exists in target but not in source'
+
+
+class CompareResult(Mapping):
+    """
+    列式比较结果
+
+    同时是只读映射，result['data_loss'] / result['target_only'] / result['value_diff'] /
+    result['duplicate_keys'] / result['summary'] 返回与compare_dataframes相同结构的数据
+    （列表在访问时生成）。
+    """
+
+    def __init__(self, source_df: pd.DataFrame, mapped_target_df: pd.DataFrame,
+                 key_fields: List[str], compare_fields: List[Tuple[str, str]],
+                 loss_rows: np.ndarray, target_only_rows: np.ndarray,
+                 diff_source_rows: np.ndarray, diff_target_rows: np.ndarray,
+                 diff_matrix: np.ndarray, summary: Dict[str, Any],
+                 duplicate_keys: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None):
+        """
+        Args:
+            source_df: 源数据框
+            mapped_target_df: 列名已映射为源表字段名的目标数据框
+            key_fields: 关键字段列表
+            compare_fields: 参与比较的 (源字段, 目标字段) 列表，差异矩阵的列顺序
+            loss_rows: 数据丢失记录在源表中的行位置
+            target_only_rows: 仅目标表存在的记录在目标表中的行位置
+            diff_source_rows: 值差异记录在源表中的行位置
+            diff_target_rows: 值差异记录在目标表中的行位置
+            diff_matrix: 差异矩阵 (值差异记录数 × 比较字段数) 的布尔值
+            summary: 摘要信息
+            duplicate_keys: 重复键 (在源表中首次出现的行位置或-1, 在目标表中首次出现的行位置或-1,
+                源表行数, 目标表行数)，见 key_codes.duplicate_key_groups
+        """
+        self.source_df = source_df
+        self.mapped_target_df = mapped_target_df
+        self.key_fields = key_fields
+        self.compare_fields = compare_fields
+        self.loss_rows = loss_rows
+        self.target_only_rows = target_only_rows
+        self.diff_source_rows = diff_source_rows
+        self.diff_target_rows = diff_target_rows
+        self.diff_bits = np.packbits(diff_matrix.reshape(len(diff_source_rows), len(compare_fields)), axis=1)
+        self.summary = summary
+        if duplicate_keys is None:
+            empty = np.empty(0, dtype=np.int64)
+            duplicate_keys = (empty, empty, empty, empty)
+        (self.duplicate_source_rows, self.duplicate_target_rows,
+         self.duplicate_source_counts, self.duplicate_target_counts) = duplicate_keys
+
+    # ---- 兼容字典结构 ----
+
+    def __getitem__(self, name: str):
+        if name == 'data_loss':
+            return list(self.iter_data_loss())
+        if name == 'target_only':
+            return list(self.iter_target_only())
+        if name == 'value_diff':
+            return list(self.iter_value_diff())
+        if name == 'duplicate_keys':
+            return list(self.iter_duplicate_keys())
+        if name == 'summary':
+            return self.summary
+        raise KeyError(name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(('data_loss', 'target_only', 'value_diff', 'duplicate_keys', 'summary'))
+
+    def __len__(self) -> int:
+        return 5
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为compare_dataframes相同结构的字典"""
+        return {name: self[name] for name in self}
+
+    # ---- 行位置和差异矩阵 ----
+
+    @property
+    def source_value_columns(self) -> List[str]:
+        return [column for column in self.source_df.columns if column not in self.key_fields]
+
+    @property
+    def target_value_columns(self) -> List[str]:
+        return [column for column in self.mapped_target_df.columns if column not in self.key_fields]
+
+    @property
+    def loss_labels(self) -> np.ndarray:
+        """数据丢失记录对应的源表行标签"""
+        return self.source_df.index.to_numpy()[self.loss_rows]
+
+    @property
+    def target_only_labels(self) -> np.ndarray:
+        """仅目标表存在的记录对应的目标表行标签"""
+        return self.mapped_target_df.index.to_numpy()[self.target_only_rows]
+
+    @property
+    def diff_labels(self) -> np.ndarray:
+        """值差异记录对应的源表行标签"""
+        return self.source_df.index.to_numpy()[self.diff_source_rows]
+
+    @property
+    def diff_target_labels(self) -> np.ndarray:
+        """值差异记录对应的目标表行标签"""
+        return self.mapped_target_df.index.to_numpy()[self.diff_target_rows]
+
+    @property
+    def duplicate_labels(self) -> np.ndarray:
+        """重复键在源表、目标表中首次出现的行标签 (重复键数 × 2)，不存在时为-1"""
+        labels = np.full((len(self.duplicate_source_rows), 2), -1, dtype=np.int64)
+        for column, (df, rows) in enumerate(((self.source_df, self.duplicate_source_rows),
+                                             (self.mapped_target_df, self.duplicate_target_rows))):
+            present = rows >= 0
+            labels[present, column] = df.index.to_numpy()[rows[present]]
+        return labels
+
+    def diff_matrix(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """解压指定范围记录的差异矩阵"""
+        return np.unpackbits(self.diff_bits[start:stop], axis=1,
+                             count=len(self.compare_fields)).astype(bool)
+
+    def column_diff_counts(self) -> Dict[str, int]:
+        """每个比较字段的差异记录数"""
+        counts = self.diff_matrix().sum(axis=0)
+        return {source_field: int(count) for (source_field, _), count in zip(self.compare_fields, counts)}
+
+    # ---- 按需生成的记录 ----
+
+    def _key_records(self, rows: pd.DataFrame) -> List[Dict[str, Any]]:
+        """每行的 {关键字段: 值}（无关键字段的比较中为空字典）"""
+        if not self.key_fields:
+            return [{} for _ in range(len(rows))]
+        return rows[self.key_fields].to_dict('records')
+
+    def iter_data_loss(self) -> Iterator[Dict[str, Any]]:
+        rows = self.source_df.iloc[self.loss_rows]
+        keys = self._key_records(rows)
+        records = rows[self.source_value_columns].to_dict('records')
+        for key_dict, source_record in zip(keys, records):
+            yield {
+                'key': key_dict,
+                'source_data': source_record,
+                'reason': DATA_LOSS_REASON
+            }
+
+    def iter_target_only(self) -> Iterator[Dict[str, Any]]:
+        rows = self.mapped_target_df.iloc[self.target_only_rows]
+        keys = self._key_records(rows)
+        records = rows[self.target_value_columns].to_dict('records')
+        for key_dict, target_record in zip(keys, records):
+            yield {
+                'key': key_dict,
+                'target_data': target_record,
+                'reason': TARGET_ONLY_REASON
+            }
+
+    def iter_duplicate_keys(self) -> Iterator[Dict[str, Any]]:
+        keys = self._duplicate_key_rows().to_dict('records')
+        for key_dict, source_count, target_count in zip(keys, self.duplicate_source_counts.tolist(),
+                                                        self.duplicate_target_counts.tolist()):
+            yield {
+                'key': key_dict,
+                'source_count': source_count,
+                'target_count': target_count
+            }
+
+    def _duplicate_key_rows(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        """重复键的关键字段值（源表中不存在的键取目标表中的值）"""
+        source_rows = self.duplicate_source_rows[start:stop]
+        target_rows = self.duplicate_target_rows[start:stop]
+        in_source = source_rows >= 0
+        keys = pd.concat([self.source_df[self.key_fields].iloc[source_rows[in_source]],
+                          self.mapped_target_df[self.key_fields].iloc[target_rows[~in_source]]],
+                         ignore_index=True)
+        order = np.argsort(np.concatenate([np.flatnonzero(in_source), np.flatnonzero(~in_source)]), kind='stable')
+        return keys.iloc[order].reset_index(drop=True)
+
+    def iter_value_diff(self) -> Iterator[Dict[str, Any]]:
+        source_rows = self.source_df.iloc[self.diff_source_rows]
+        target_rows = self.mapped_target_df.iloc[self.diff_target_rows]
+        keys = self._key_records(source_rows)
+        source_records = source_rows[self.source_value_columns].to_dict('records')
+        target_records = target_rows[self.target_value_columns].to_dict('records')
+        matrix = self.diff_matrix()
+        for i, (key_dict, source_record, target_record) in enumerate(zip(keys, source_records, target_records)):
+            yield {
+                'key': key_dict,
+                'source_data': source_record,
+                'target_data': target_record,
+                'differences': {
+                    source_field: {
+                        'source_value': source_record[source_field],
+                        'target_value': target_record[source_field],
+                        'target_field': target_field
+                    }
+                    for (source_field, target_field), differs in zip(self.compare_fields, matrix[i])
+                    if differs
+                }
+            }
+
+    # ---- 报告渲染 ----
+
+    def data_loss_frame(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        """数据丢失工作表（列布局同create_data_loss_dataframe），可只渲染一段记录"""
+        rows = self.source_df.iloc[self.loss_rows[start:stop]].reset_index(drop=True)
+        columns = {f'Key_{field}': rows[field] for field in self.key_fields}
+        columns.update({f'Source_{field}': rows[field] for field in self.source_value_columns})
+        frame = pd.DataFrame(columns, index=rows.index)
+        frame['Reason'] = DATA_LOSS_REASON
+        return frame
+
+    def target_only_frame(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        """仅目标表存在的记录工作表（列布局同create_target_only_dataframe），可只渲染一段记录"""
+        rows = self.mapped_target_df.iloc[self.target_only_rows[start:stop]].reset_index(drop=True)
+        columns = {f'Key_{field}': rows[field] for field in self.key_fields}
+        columns.update({f'Target_{field}': rows[field] for field in self.target_value_columns})
+        frame = pd.DataFrame(columns, index=rows.index)
+        frame['Reason'] = TARGET_ONLY_REASON
+        return frame
+
+    def duplicate_keys_frame(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        """重复键工作表（列布局同create_duplicate_keys_dataframe），可只渲染一段记录"""
+        keys = self._duplicate_key_rows(start, stop)
+        frame = pd.DataFrame({f'Key_{field}': keys[field] for field in self.key_fields}, index=keys.index)
+        frame['Source_Count'] = self.duplicate_source_counts[start:stop]
+        frame['Target_Count'] = self.duplicate_target_counts[start:stop]
+        return frame
+
+    def value_diff_frame(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        """
+        值差异工作表（列布局同create_value_diff_dataframe），可只渲染一段记录
+
+        Diff_列只包含有差异记录的字段（按比较字段顺序），分段渲染时各段的列保持一致。
+        """
+        source_rows = self.source_df.iloc[self.diff_source_rows[start:stop]].reset_index(drop=True)
+        target_rows = self.mapped_target_df.iloc[self.diff_target_rows[start:stop]].reset_index(drop=True)
+        matrix = self.diff_matrix(start, stop)
+        differing = np.unpackbits(np.bitwise_or.reduce(self.diff_bits, axis=0),
+                                  count=len(self.compare_fields)).astype(bool)
+
+        columns = {f'Key_{field}': source_rows[field] for field in self.key_fields}
+        columns.update({f'Source_{field}': source_rows[field] for field in self.source_value_columns})
+        columns.update({f'Target_{field}': target_rows[field] for field in self.target_value_columns})
+        frame = pd.DataFrame(columns, index=source_rows.index)
+
+        for i, (source_field, target_field) in enumerate(self.compare_fields):
+            if not differing[i]:
+                continue
+            mask = matrix[:, i]
+            frame[f'Diff_{source_field}_Source'] = _masked(source_rows[source_field], mask)
+            frame[f'Diff_{source_field}_Target'] = _masked(target_rows[source_field], mask)
+            frame[f'Diff_{source_field}_TargetField'] = pd.Series(target_field, index=frame.index).where(mask)
+        return frame
+
+
+def _masked(values: pd.Series, mask: np.ndarray) -> pd.Series:
+    """
+    只保留mask为True的值，其余为空
+
+    整数列和布尔列先转为可空类型：直接where会把整数转为float64（超过2^53的值丢失精度），
+    把布尔转为object，而且各段是否出现空值不同，分段渲染时同一列的类型会不一致。
+    """
+    if isinstance(values.dtype, np.dtype) and values.dtype.kind == 'b':
+        values = values.astype('boolean')
+    elif isinstance(values.dtype, np.dtype) and values.dtype.kind in 'iu':
+        values = values.astype(values.dtype.name.replace('uint', 'UInt').replace('int', 'Int'))
+    return values.where(mask)
+
+
+def summarize_result(result: Mapping) -> Dict[str, Any]:
+    """
+    只返回摘要计数和每个比较字段的差异记录数
+
+    比较字段对所有引擎都是摘要中字段映射的非关键字段，按字段映射的顺序；不在两表中同时存在的
+    字段不参与比较，计数为0。列式结果只读取差异矩阵，不生成逐条记录；字典结构的结果
+    （python引擎、增量比较）从已有的value_diff记录统计。
+    """
+    summary = result['summary']
+    column_counts = {field: 0 for field in summary['field_mapping'] if field not in summary['key_fields']}
+    if isinstance(result, CompareResult):
+        column_counts.update(result.column_diff_counts())
+    else:
+        for item in result['value_diff']:
+            for field in item['differences']:
+                column_counts[field] += 1
+    return {**summary, 'column_mismatch_counts': column_counts}
@@ -0,0 +1,409 @@
+"""
+向量化CSV数据比较引擎
+
+按关键字段做一次外连接，然后逐列（而不是逐行）计算差异掩码，
+输出与 compare.compare_dataframes 相同结构的 data_loss / target_only / value_diff /
+duplicate_keys / summary。
+"""
+import logging
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from routes.data.key_codes import (
+    shared_key_codes, group_positions, duplicate_key_groups, occurrence_key_codes,
+    shared_value_codes, dictionary_encodable
+)
+from routes.data.compare_rules import FieldComparator, compile_compare_rules
+from routes.data.result_model import CompareResult
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 按分区/分桶相加的摘要计数
+SUMMARY_COUNTERS = ('source_total_records', 'target_total_records', 'data_loss_count',
+                    'target_only_count', 'value_diff_count', 'duplicate_key_count', 'matching_records')
+
+
+def resolve_compare_fields(source_df: pd.DataFrame, target_df: pd.DataFrame,
+                           field_mapping: Dict[str, str],
+                           key_fields: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    按compare_dataframes的规则补全字段映射和关键字段
+
+    Args:
+        source_df: 源数据框
+        target_df: 目标数据框
+        field_mapping: 字段映射关系
+        key_fields: 关键字段列表
+
+    Returns:
+        (字段映射, 关键字段列表)
+    """
+    # 如果没有字段映射，使用交集字段（按源表列顺序，保证结果稳定）
+    if not field_mapping:
+        target_columns = set(target_df.columns)
+        field_mapping = {field: field for field in source_df.columns if field in target_columns}
+
+    # 如果没有关键字段，使用第一个字段作为关键字段
+    if not key_fields:
+        key_fields = [list(source_df.columns)[0]]
+
+    return field_mapping, list(key_fields)
+
+
+def map_target_columns(columns, field_mapping: Dict[str, str]) -> List[str]:
+    """
+    计算目标表按字段映射重命名后的列名
+
+    与compare_dataframes中逐个rename的顺序一致，但只处理列名，不复制数据。
+    """
+    columns = list(columns)
+    reverse_mapping = {v: k for k, v in field_mapping.items()}
+    for target_field, source_field in reverse_mapping.items():
+        if target_field in columns:
+            columns = [source_field if column == target_field else column for column in columns]
+    return columns
+
+
+def apply_target_mapping(target_df: pd.DataFrame, field_mapping: Dict[str, str]) -> pd.DataFrame:
+    """返回列名已映射为源表字段名的目标表浅拷贝"""
+    mapped_target_df = target_df.copy(deep=False)
+    mapped_target_df.columns = map_target_columns(target_df.columns, field_mapping)
+    return mapped_target_df
+
+
+def join_key_positions(source_df: pd.DataFrame, target_df: pd.DataFrame, key_fields: List[str],
+                       duplicate_order: Optional[List[str]] = None
+                       ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    对关键字段做一次外连接，同时得到两个方向的差集和共同键的行位置
+
+    关键字段先编码为共享字典上的int64代码（见key_codes），连接在代码数组上完成；
+    重复键按多对多展开，与pandas merge的结果一致。指定 duplicate_order 时重复键逐个配对，
+    见 join_key_codes。
+
+    Returns:
+        (仅源表存在的源行位置, 共同键的源行位置, 共同键的目标行位置, 仅目标表存在的目标行位置)，
+        前三项按源表行顺序排列，最后一项按目标表行顺序排列
+    """
+    source_codes, target_codes, num_keys = shared_key_codes(source_df[key_fields], target_df[key_fields])
+    if duplicate_order is not None:
+        source_codes, target_codes, num_keys = occurrence_key_codes(
+            source_codes, target_codes, source_df[duplicate_order], target_df[duplicate_order])
+    return join_key_codes(source_codes, target_codes, num_keys)
+
+
+def join_key_codes(source_codes: np.ndarray, target_codes: np.ndarray,
+                   num_keys: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    在关键字段代码上做外连接（返回值同join_key_positions）
+
+    代码已合入组内序号（key_codes.occurrence_key_codes）时，每个代码两边最多各一行，
+    重复键的第k行与另一表的第k行配对。
+    """
+    source_counts = np.bincount(source_codes, minlength=num_keys)
+    target_order, target_starts, target_counts = group_positions(target_codes, num_keys)
+
+    matches = target_counts[source_codes]
+    loss_positions = np.flatnonzero(matches == 0)
+    target_only_positions = np.flatnonzero(source_counts[target_codes] == 0)
+
+    # 每个源行依次对应该代码下的所有目标行（目标行按原始顺序）
+    source_positions = np.repeat(np.arange(len(source_codes), dtype=np.int64), matches)
+    offsets = np.arange(len(source_positions), dtype=np.int64) - np.repeat(np.cumsum(matches) - matches, matches)
+    target_positions = target_order[np.repeat(target_starts[source_codes], matches) + offsets]
+
+    return loss_positions, source_positions, target_positions.astype(np.int64), target_only_positions
+
+
+def check_duplicate_order(source_df: pd.DataFrame, mapped_target_df: pd.DataFrame,
+                          duplicate_order: Optional[List[str]]):
+    """
+    检查重复键配对的排序字段在两表中都存在
+
+    Raises:
+        ValueError: 排序字段不存在
+    """
+    missing = [field for field in duplicate_order or []
+               if field not in source_df.columns or field not in mapped_target_df.columns]
+    if missing:
+        raise ValueError(f"Duplicate order fields not found in both tables: {missing}")
+
+
+def column_diff_mask(source_values: pd.Series, target_values: pd.Series,
+                     comparator: Optional[FieldComparator] = None) -> np.ndarray:
+    """
+    按列计算差异掩码
+
+    两边都为空视为相同，仅一边为空视为不同；两边都有值时，
+    类型相同（如mapping.csv中声明了字段类型）按值比较，否则比较字符串形式。
+    指定了字段比较规则（mapping.csv的compare列）时，两边都有值的部分按规则比较。
+    """
+    differ = comparator.values_differ if comparator is not None else values_differ
+    source_na = source_values.isna().to_numpy()
+    target_na = target_values.isna().to_numpy()
+    both = ~source_na & ~target_na
+
+    differs = np.zeros(len(source_values), dtype=bool)
+    if both.all():
+        differs = differ(source_values, target_values)
+    elif both.any():
+        differs[both] = differ(source_values[both], target_values[both])
+
+    return (source_na != target_na) | differs
+
+
+def values_differ(source_values: pd.Series, target_values: pd.Series) -> np.ndarray:
+    """比较两列非空值"""
+    if _same_value_type(source_values, target_values):
+        return np.asarray(source_values.array != target_values.array, dtype=bool)
+    if dictionary_encodable(source_values) and dictionary_encodable(target_values):
+        source_codes, target_codes = shared_value_codes(source_values, target_values)
+        return source_codes != target_codes
+    return (source_values.astype(str).to_numpy(dtype=object)
+            != target_values.astype(str).to_numpy(dtype=object))
+
+
+def _same_value_type(source_values: pd.Series, target_values: pd.Series) -> bool:
+    """两列是否为可直接按值比较的同一类型（object列只有都为Decimal时才按值比较）"""
+    if source_values.dtype != target_values.dtype:
+        return False
+    if source_values.dtype != object:
+        return True
+    return (pd.api.types.infer_dtype(source_values, skipna=True) == 'decimal'
+            and pd.api.types.infer_dtype(target_values, skipna=True) == 'decimal')
+
+
+def row_fingerprints(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """
+    计算每行在指定列上的64位指纹
+
+    指纹相同的两行在这些列上的值视为相同；指纹不同只说明可能存在差异，需要再逐列确认。
+    数值列按二进制值哈希（布尔True与整数1的哈希相同），只能用于两边类型相同的列，
+    见 fingerprint_columns。
+    """
+    if not columns:
+        return np.zeros(len(df), dtype=np.uint64)
+    return pd.util.hash_pandas_object(df[columns], index=False, categorize=False).to_numpy()
+
+
+def fingerprint_columns(source_df: pd.DataFrame, mapped_target_df: pd.DataFrame,
+                        columns: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    按两边的数据类型划分比较字段
+
+    Returns:
+        (两边类型相同、可以用行指纹预筛的字段, 类型不同、需要对所有共同记录逐列比较的字段)；
+        类型不同的列按字符串形式比较，而行指纹按各自类型的值哈希，两者不一致
+    """
+    hashable = [column for column in columns if source_df[column].dtype == mapped_target_df[column].dtype]
+    return hashable, [column for column in columns if column not in hashable]
+
+
+def compare_mapped_frames(source_df: pd.DataFrame, mapped_target_df: pd.DataFrame,
+                          field_mapping: Dict[str, str], key_fields: List[str],
+                          comparators: Optional[Dict[str, FieldComparator]] = None,
+                          duplicate_order: Optional[List[str]] = None
+                          ) -> Tuple[Dict[str, Any], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    比较源表与已映射列名的目标表，返回字典结构的结果（用于按分区合并）
+
+    Returns:
+        (比较结果, 数据丢失记录对应的源表行标签, 值差异记录对应的源表行标签,
+         仅目标表存在的记录对应的目标表行标签, 重复键在两表中首次出现的行标签)
+    """
+    result = compare_mapped_columns(source_df, mapped_target_df, field_mapping, key_fields, comparators,
+                                    duplicate_order)
+    return (result.to_dict(), result.loss_labels, result.diff_labels, result.target_only_labels,
+            result.duplicate_labels)
+
+
+def mapped_compare_fields(source_df: pd.DataFrame, mapped_target_df: pd.DataFrame,
+                          field_mapping: Dict[str, str], key_fields: List[str]) -> List[Tuple[str, str]]:
+    """逐字段比较的 (源字段, 目标字段)：两表中都存在的非关键字段，按字段映射的顺序"""
+    return [
+        (source_field, target_field) for source_field, target_field in field_mapping.items()
+        if source_field not in key_fields and source_field in source_df.columns
+        and source_field in mapped_target_df.columns
+    ]
+
+
+def compare_mapped_columns(source_df: pd.DataFrame, mapped_target_df: pd.DataFrame,
+                           field_mapping: Dict[str, str], key_fields: List[str],
+                           comparators: Optional[Dict[str, FieldComparator]] = None,
+                           duplicate_order: Optional[List[str]] = None,
+                           key_codes: Optional[Tuple[np.ndarray, np.ndarray, int]] = None,
+                           source_fingerprints: Optional[Callable[[List[str]], np.ndarray]] = None
+                           ) -> CompareResult:
+    """
+    比较源表与已映射列名的目标表（字段映射和关键字段需已补全）
+
+    comparators 为compile_compare_rules编译好的字段比较规则；指纹相同的行不受规则影响，
+    仍然视为相同。两边类型不同的字段不参与指纹，对所有共同记录逐列比较。
+    在任一表中出现多次的关键字段先通过一次计数找出，单独报告；
+    duplicate_order 为None时重复键按多对多展开比较，否则按这些字段（可以为空列表，
+    即按原始行顺序）排序后逐个配对。
+
+    key_codes 为已在共享字典上编码好的关键字段代码（shared_key_codes的返回值），
+    source_fingerprints 按比较字段返回源表行指纹；一个源表与多个目标表比较时由调用方缓存，
+    不再为每个目标表重新计算源表部分。
+
+    Returns:
+        列式比较结果
+    """
+    check_duplicate_order(source_df, mapped_target_df, duplicate_order)
+    if key_codes is None:
+        key_codes = shared_key_codes(source_df[key_fields], mapped_target_df[key_fields])
+    source_codes, target_codes, num_keys = key_codes
+    duplicate_keys = duplicate_key_groups(source_codes, target_codes, num_keys)
+    if duplicate_order is not None and len(duplicate_keys[0]):
+        source_codes, target_codes, num_keys = occurrence_key_codes(
+            source_codes, target_codes, source_df[duplicate_order], mapped_target_df[duplicate_order])
+    loss_positions, source_positions, target_positions, target_only_positions = join_key_codes(
+        source_codes, target_codes, num_keys)
+
+    # 检查值差异：先比较行指纹，只有指纹不同的共同键才逐列计算差异掩码
+    compare_fields = mapped_compare_fields(source_df, mapped_target_df, field_mapping, key_fields)
+    compare_columns = [source_field for source_field, _ in compare_fields]
+    hashed_columns, unhashed_columns = fingerprint_columns(source_df, mapped_target_df, compare_columns)
+    source_row_fingerprints = (source_fingerprints(hashed_columns) if source_fingerprints is not None
+                               else row_fingerprints(source_df, hashed_columns))
+    differs = (source_row_fingerprints[source_positions]
+               != row_fingerprints(mapped_target_df, hashed_columns)[target_positions])
+
+    comparators = comparators or {}
+    unhashed_masks = {}
+    for source_field in unhashed_columns:
+        unhashed_masks[source_field] = column_diff_mask(source_df[source_field].iloc[source_positions],
+                                                        mapped_target_df[source_field].iloc[target_positions],
+                                                        comparators.get(source_field))
+        differs |= unhashed_masks[source_field]
+    candidates = np.flatnonzero(differs)
+    logger.debug(f"Fingerprint pre-pass: {len(source_positions) - len(candidates)} of "
+                 f"{len(source_positions)} common records identical "
+                 f"({len(unhashed_columns)} fields with different types compared on all records)")
+
+    diff_matrix = np.zeros((len(candidates), len(compare_columns)), dtype=bool)
+    for i, source_field in enumerate(compare_columns):
+        if source_field in unhashed_masks:
+            diff_matrix[:, i] = unhashed_masks[source_field][candidates]
+        else:
+            diff_matrix[:, i] = column_diff_mask(source_df[source_field].iloc[source_positions[candidates]],
+                                                 mapped_target_df[source_field].iloc[target_positions[candidates]],
+                                                 comparators.get(source_field))
+
+    any_diff = diff_matrix.any(axis=1)
+    diff_rows = candidates[any_diff]
+
+    # 生成摘要信息
+    summary = {
+        'source_total_records': len(source_df),
+        'target_total_records': len(mapped_target_df),
+        'data_loss_count': len(loss_positions),
+        'target_only_count': len(target_only_positions),
+        'value_diff_count': len(diff_rows),
+        'duplicate_key_count': len(duplicate_keys[0]),
+        'matching_records': len(source_positions) - len(diff_rows),
+        'field_mapping': field_mapping,
+        'key_fields': key_fields
+    }
+
+    return CompareResult(source_df, mapped_target_df, key_fields, compare_fields,
+                         loss_positions, target_only_positions, source_positions[diff_rows],
+                         target_positions[diff_rows], diff_matrix[any_diff], summary,
+                         duplicate_keys=duplicate_keys)
+
+
+def compact_partial(result: CompareResult) -> tuple:
+    """
+    分区/分桶比较结果的紧凑形式（用于按分区合并，见 merge_partial_results）
+
+    Returns:
+        (数据丢失记录的源表行标签, 仅目标表存在的记录的目标表行标签, 值差异记录的源表行标签,
+         值差异记录的目标表行标签, 按位压缩的差异矩阵, 重复键在两表中首次出现的行标签 (重复键数 × 2),
+         重复键在源表中的行数, 重复键在目标表中的行数, 摘要计数)
+    """
+    return (result.loss_labels, result.target_only_labels, result.diff_labels, result.diff_target_labels,
+            result.diff_bits, result.duplicate_labels, result.duplicate_source_counts,
+            result.duplicate_target_counts, {counter: result.summary[counter] for counter in SUMMARY_COUNTERS})
+
+
+def merge_partial_results(partials: List[tuple], source_df: pd.DataFrame, mapped_target_df: pd.DataFrame,
+                          field_mapping: Dict[str, str], key_fields: List[str]) -> CompareResult:
+    """
+    合并按分区/分桶得到的部分比较结果为列式结果
+
+    记录按源表行位置排序（仅目标表存在的记录按目标表行位置排序，重复键先按源表、
+    再按目标表中首次出现的行位置排序），摘要计数逐项相加，因此结果与分区方式无关。
+    同一关键字段的所有行需在同一个分区中。
+
+    Args:
+        partials: compact_partial 的返回值列表，行标签为 source_df / mapped_target_df 中的行位置
+        source_df: 源数据框（可以只包含差异记录涉及的行）
+        mapped_target_df: 列名已映射为源表字段名的目标数据框（可以只包含差异记录涉及的行）
+        field_mapping: 字段映射关系
+        key_fields: 关键字段列表
+
+    Returns:
+        合并后的列式比较结果
+    """
+    compare_fields = mapped_compare_fields(source_df, mapped_target_df, field_mapping, key_fields)
+
+    def concat(index: int, shape: tuple = (0,), dtype=np.int64) -> np.ndarray:
+        arrays = [partial[index] for partial in partials]
+        return np.concatenate(arrays) if arrays else np.empty(shape, dtype=dtype)
+
+    loss_rows = np.sort(concat(0), kind='stable')
+    target_only_rows = np.sort(concat(1), kind='stable')
+    diff_order = np.argsort(concat(2), kind='stable')
+    diff_matrix = np.unpackbits(concat(4, (0, (len(compare_fields) + 7) // 8), np.uint8), axis=1,
+                                count=len(compare_fields)).astype(bool)
+
+    duplicate_rows = concat(5, (0, 2))
+    in_source = duplicate_rows[:, 0] >= 0
+    duplicate_order = np.lexsort((np.where(in_source, duplicate_rows[:, 0], duplicate_rows[:, 1]), ~in_source))
+    duplicate_keys = (duplicate_rows[duplicate_order, 0], duplicate_rows[duplicate_order, 1],
+                      concat(6)[duplicate_order], concat(7)[duplicate_order])
+
+    summary = {counter: int(sum(partial[8][counter] for partial in partials)) for counter in SUMMARY_COUNTERS}
+    summary['field_mapping'] = field_mapping
+    summary['key_fields'] = key_fields
+
+    return CompareResult(source_df, mapped_target_df, key_fields, compare_fields, loss_rows, target_only_rows,
+                         concat(2)[diff_order], concat(3)[diff_order], diff_matrix[diff_order], summary,
+                         duplicate_keys=duplicate_keys)
+
+
+def compare_dataframes_vectorized(source_df: pd.DataFrame, target_df: pd.DataFrame,
+                                  field_mapping: Dict[str, str], key_fields: List[str],
+                                  compare_rules: Optional[Dict[str, str]] = None,
+                                  duplicate_order: Optional[List[str]] = None) -> CompareResult:
+    """
+    向量化比较两个DataFrame
+
+    Args:
+        source_df: 源数据框
+        target_df: 目标数据框
+        field_mapping: 字段映射关系
+        key_fields: 关键字段列表
+        compare_rules: 字段比较规则 {源字段名: 规则}，见 compare_rules 模块
+        duplicate_order: 重复键的配对方式，None为多对多展开，字段列表为按这些字段排序后逐个配对
+
+    Returns:
+        列式比较结果（可按字典访问，结构同compare_dataframes，记录按源表行顺序排列）
+    """
+    field_mapping, key_fields = resolve_compare_fields(source_df, target_df, field_mapping, key_fields)
+
+    logger.info(f"Field mapping: {field_mapping}")
+    logger.info(f"Key fields: {key_fields}")
+
+    comparators = compile_compare_rules(compare_rules)
+    mapped_target_df = apply_target_mapping(target_df, field_mapping)
+    result = compare_mapped_columns(source_df, mapped_target_df, field_mapping, key_fields, comparators,
+                                    duplicate_order)
+
+    logger.info(f"Comparison completed: {result.summary}")
+
+    return result
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+比较引擎一致性测试 - 验证各引擎与原始compare_dataframes输出一致
+"""
+import math
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from routes.data.compare import compare_dataframes, COMPARE_ENGINES
+from routes.data.external_compare import compare_csv_files_external, MemoryBudgetExceeded
+from routes.data import parallel_compare
+from routes.data.parallel_compare import compare_dataframes_parallel
+from routes.data.digest_compare import compare_dataframes_digest, row_digests
+from routes.data.key_codes import shared_value_codes
+from routes.data.result_model import CompareResult
+from routes.data.vectorized_compare import values_differ, row_fingerprints, fingerprint_columns
+from test_compare_routes import with_client, post, assert_bad_request, counts
+
+FIELD_MAPPING = {
+    'id': 'user_id',
+    'name': 'full_name',
+    'age': 'user_age',
+    'city': 'location',
+    'salary': 'annual_income'
+}
+
+
+def _same_value(a, b):
+    """NaN安全的值比较"""
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b and str(a) == str(b)
+
+
+def _same_record(a, b):
+    return a.keys() == b.keys() and all(_same_value(a[k], b[k]) for k in a)
+
+
+def _by_key(items):
+    return {tuple(item['key'].items()): item for item in items}
+
+
+def assert_same_result(expected, actual):
+    """断言两个比较结果一致（忽略记录顺序）"""
+    assert expected['summary'] == actual['summary']
+
+    expected_loss, actual_loss = _by_key(expected['data_loss']), _by_key(actual['data_loss'])
+    assert expected_loss.keys() == actual_loss.keys()
+    for key, item in expected_loss.items():
+        assert item['reason'] == actual_loss[key]['reason']
+        assert _same_record(item['source_data'], actual_loss[key]['source_data'])
+
+    expected_only, actual_only = _by_key(expected['target_only']), _by_key(actual['target_only'])
+    assert expected_only.keys() == actual_only.keys()
+    for key, item in expected_only.items():
+        assert item['reason'] == actual_only[key]['reason']
+        assert _same_record(item['target_data'], actual_only[key]['target_data'])
+
+    expected_diff, actual_diff = _by_key(expected['value_diff']), _by_key(actual['value_diff'])
+    assert expected_diff.keys() == actual_diff.keys()
+    for key, item in expected_diff.items():
+        other = actual_diff[key]
+        assert _same_record(item['source_data'], other['source_data'])
+        assert _same_record(item['target_data'], other['target_data'])
+        assert list(item['differences']) == list(other['differences'])
+        for field, diff in item['differences'].items():
+            assert _same_record(diff, other['differences'][field])
+
+    assert _duplicate_counts(expected) == _duplicate_counts(actual)
+
+
+def _duplicate_counts(result):
+    return {key: (item['source_count'], item['target_count'])
+            for key, item in _by_key(result['duplicate_keys']).items()}
+
+
+def make_frames(rows=500, seed=0):
+    """生成带缺失值、数值和字符串差异以及仅目标表记录的随机源表/目标表"""
+    rng = np.random.default_rng(seed)
+    source_df = pd.DataFrame({
+        'id': np.arange(rows),
+        'name': [f'user_{i}' for i in range(rows)],
+        'age': rng.integers(18, 80, rows),
+        'city': rng.choice(['New York', 'Boston', 'Chicago', None], rows),
+        'salary': rng.integers(30, 90, rows) * 1000.0,
+        'extra': rng.random(rows),
+    })
+    target_df = source_df.rename(columns=FIELD_MAPPING).copy()
+    target_df = target_df.sample(frac=0.9, random_state=seed).reset_index(drop=True)
+
+    changed = rng.random(len(target_df)) < 0.2
+    target_df.loc[changed, 'user_age'] += 1
+    target_df.loc[rng.random(len(target_df)) < 0.05, 'location'] = None
+    target_df.loc[rng.random(len(target_df)) < 0.05, 'annual_income'] = np.nan
+
+    extra_rows = target_df.head(rows // 20).copy()
+    extra_rows['user_id'] += rows
+    target_df = pd.concat([target_df, extra_rows], ignore_index=True)
+    return source_df, target_df
+
+
+def test_engines_registered():
+    """python、vectorized、parallel和digest引擎均可选"""
+    assert COMPARE_ENGINES['python'] is compare_dataframes
+    assert {'vectorized', 'parallel', 'digest'} <= set(COMPARE_ENGINES)
+
+
+def test_sample_files_parity():
+    """示例CSV文件的比较结果一致"""
+    source_df = pd.read_csv('sample_source.csv')
+    target_df = pd.read_csv('sample_target.csv')
+    expected = compare_dataframes(source_df, target_df, FIELD_MAPPING, ['id'])
+    for name, engine in COMPARE_ENGINES.items():
+        assert_same_result(expected, engine(source_df, target_df, FIELD_MAPPING, ['id']))
+
+
+def test_random_frames_parity():
+    """随机数据（含缺失值）的比较结果一致"""
+    for seed in range(3):
+        source_df, target_df = make_frames(seed=seed)
+        expected = compare_dataframes(source_df, target_df, FIELD_MAPPING, ['id'])
+        assert expected['value_diff'] and expected['data_loss'] and expected['target_only']
+        for name, engine in COMPARE_ENGINES.items():
+            assert_same_result(expected, engine(source_df, target_df, FIELD_MAPPING, ['id']))
+
+
+def test_composite_key_parity():
+    """多字段组合关键字段的比较结果一致"""
+    source_df, target_df = make_frames(rows=300, seed=7)
+    expected = compare_dataframes(source_df, target_df, FIELD_MAPPING, ['id', 'name'])
+    for name, engine in COMPARE_ENGINES.items():
+        assert_same_result(expected, engine(source_df, target_df, FIELD_MAPPING, ['id', 'name']))
+
+
+def test_default_mapping_and_key_parity():
+    """不传字段映射和关键字段时的默认规则一致"""
+    source_df = pd.DataFrame({'id': [1, 2, 3], 'v': ['a', 'b', 'c'], 'w': [1.5, None, 2.0]})
+    target_df = pd.DataFrame({'id': [1, 3, 4], 'v': ['a', 'x', 'd'], 'w': [1.5, 2.0, None]})
+    expected = compare_dataframes(source_df, target_df, {}, [])
+    for name, engine in COMPARE_ENGINES.items():
+        assert_same_result(expected, engine(source_df, target_df, {}, []))
+
+
+def test_string_comparison_semantics():
+    """数值与字符串按字符串形式比较（50000 与 50000.0 不同）"""
+    source_df = pd.DataFrame({'id': [1, 2], 'amount': [50000, 60000], 'note': ['x', 'y']})
+    target_df = pd.DataFrame({'id': [1, 2], 'amount': [50000.0, 60000.5], 'note': ['x', 'y']})
+    expected = compare_dataframes(source_df, target_df, {}, ['id'])
+    assert expected['summary']['value_diff_count'] == 2
+    for name, engine in COMPARE_ENGINES.items():
+        assert_same_result(expected, engine(source_df, target_df, {}, ['id']))
+
+
+def test_dictionary_encoded_columns():
+    """字符串、整数和类别列按共享字典编码比较，结果与逐个比较字符串形式一致"""
+    source = pd.Series(['a', 'b', 'c', 'a', '1'], dtype=object)
+    target = pd.Series(['a', 'x', 'c', 'b', 1], dtype=object)
+    source_codes, target_codes = shared_value_codes(source.astype('category'), pd.Series([1, 2, 3, 1, 1]))
+    assert list(source_codes == target_codes) == [False, False, False, False, True]
+
+    rng = np.random.default_rng(0)
+    pairs = [
+        (pd.Series(rng.choice(['NY', 'LA', 'SF'], 1000), dtype=object),
+         pd.Series(rng.choice(['NY', 'LA', 'Boston'], 1000)).astype('category')),
+        (pd.Series(rng.integers(0, 5, 1000)), pd.Series(rng.integers(0, 5, 1000).astype(str), dtype=object)),
+        (pd.Series(rng.integers(0, 5, 1000)).astype('Int64'), pd.Series(rng.integers(0, 5, 1000))),
+        (source, target),
+        (pd.Series([0.0, 1.0]), pd.Series([-0.0, 1], dtype=object))
+    ]
+    for source_values, target_values in pairs:
+        expected = (source_values.astype(str).to_numpy(dtype=object)
+                    != target_values.astype(str).to_numpy(dtype=object))
+        assert np.array_equal(values_differ(source_values, target_values), expected)
+
+
+def test_external_engine_parity():
+    """外存引擎（强制多分区、多层重新分区）的结果与整表比较一致"""
+    source_df, target_df = make_frames(rows=3000, seed=3)
+    # 前几行的age为空，使分块推断出的类型与整文件推断不同
+    source_df['age'] = source_df['age'].astype('float64')
+    source_df.loc[2500:, 'age'] = np.nan
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source_path = os.path.join(work_dir, 'source.csv')
+        target_path = os.path.join(work_dir, 'target.csv')
+        source_df.to_csv(source_path, index=False)
+        target_df.to_csv(target_path, index=False)
+
+        expected = compare_dataframes(pd.read_csv(source_path), pd.read_csv(target_path),
+                                      FIELD_MAPPING, ['id'])
+        vectorized = COMPARE_ENGINES['vectorized'](pd.read_csv(source_path), pd.read_csv(target_path),
+                                                   FIELD_MAPPING, ['id'])
+        for budget in (1, 0.5):
+            actual = compare_csv_files_external(source_path, target_path, FIELD_MAPPING, ['id'],
+                                                memory_budget_mb=budget, work_dir=work_dir)
+            assert_same_result(expected, actual)
+            # 记录顺序与vectorized引擎一致（按源表行顺序）
+            assert [item['key'] for item in actual['value_diff']] == \
+                [item['key'] for item in vectorized['value_diff']]
+        assert sorted(os.listdir(work_dir)) == ['source.csv', 'target.csv']
+
+
+def test_parallel_engine_deterministic():
+    """多进程引擎的结果（含记录顺序）与进程数量、分桶数量无关"""
+    source_df, target_df = make_frames(rows=2000, seed=11)
+    expected = compare_dataframes(source_df, target_df, FIELD_MAPPING, ['id'])
+    baseline = COMPARE_ENGINES['vectorized'](source_df, target_df, FIELD_MAPPING, ['id'])
+    for workers, buckets in ((1, None), (2, 3), (3, 16)):
+        actual = compare_dataframes_parallel(source_df, target_df, FIELD_MAPPING, ['id'],
+                                             max_workers=workers, num_buckets=buckets)
+        assert_same_result(expected, actual)
+        for section in ('data_loss', 'target_only', 'value_diff'):
+            assert [item['key'] for item in actual[section]] == \
+                [item['key'] for item in baseline[section]]
+
+
+def test_digest_engine_drill_down():
+    """分桶摘要引擎逐层拆分不一致分桶后结果不变；完全一致的表不需要逐行比较"""
+    source_df, target_df = make_frames(rows=3000, seed=5)
+    expected = compare_dataframes(source_df, target_df, FIELD_MAPPING, ['id'])
+    baseline = COMPARE_ENGINES['vectorized'](source_df, target_df, FIELD_MAPPING, ['id'])
+    for leaf_rows in (0, 2, 50, 10000):
+        actual = compare_dataframes_digest(source_df, target_df, FIELD_MAPPING, ['id'], leaf_rows=leaf_rows)
+        assert_same_result(expected, actual)
+        for section in ('data_loss', 'target_only', 'value_diff'):
+            assert [item['key'] for item in actual[section]] == \
+                [item['key'] for item in baseline[section]]
+
+    identical = source_df.rename(columns=FIELD_MAPPING)
+    result = compare_dataframes_digest(source_df, identical, FIELD_MAPPING, ['id'])
+    assert result['summary']['matching_records'] == len(source_df)
+    assert not result['data_loss'] and not result['value_diff']
+
+    # 重复键：不参与分桶摘要，直接逐行比较
+    duplicated = pd.concat([source_df.head(50)] * 3, ignore_index=True)
+    assert_same_result(COMPARE_ENGINES['vectorized'](duplicated, identical.head(60), FIELD_MAPPING, ['id']),
+                       compare_dataframes_digest(duplicated, identical.head(60), FIELD_MAPPING, ['id'],
+                                                 leaf_rows=0))
+
+
+def test_fingerprint_prepass_mixed_types():
+    """两边类型不同的列不参与行指纹预筛：布尔True与整数1的哈希相同，但按字符串形式比较不同"""
+    source_df = pd.DataFrame({'id': [1, 2, 3], 'flag': [True, False, True], 'code': [1, 2, 3]})
+    target_df = pd.DataFrame({'id': [1, 2, 3], 'flag': [1, 0, 1], 'code': [1, 2, 4]})
+    assert (row_fingerprints(source_df, ['flag']) == row_fingerprints(target_df, ['flag'])).all()
+    assert fingerprint_columns(source_df, target_df, ['flag', 'code']) == (['code'], ['flag'])
+
+    field_mapping = {'id': 'id', 'flag': 'flag', 'code': 'code'}
+    expected = compare_dataframes(source_df, target_df, field_mapping, ['id'])
+    assert expected['summary']['value_diff_count'] == 3
+    for name, engine in COMPARE_ENGINES.items():
+        assert_same_result(expected, engine(source_df, target_df, field_mapping, ['id']))
+    assert_same_result(expected, compare_dataframes_digest(source_df, target_df, field_mapping, ['id'],
+                                                           leaf_rows=0))
+
+    # 分桶摘要按字符串形式哈希类型不同的列
+    source_digests, target_digests = row_digests(source_df, target_df, ['flag'])
+    assert (source_digests != target_digests).all()
+
+
+@with_client()
+def test_engine_route(client):
+    """engine参数选择比较引擎：python和vectorized引擎的结果一致，未知引擎返回400"""
+    for engine in ['python', 'vectorized']:
+        response = post(client, engine=engine, summary_only='1')
+        assert response.status_code == 200, (engine, response.get_json())
+        assert counts(response) == (1, 1, 1), engine
+        assert response.get_json()['data']['column_mismatch_counts']['amount'] == 1, engine
+    assert_bad_request(post(client, engine='quantum'), 'Unknown engine: quantum')
+
+
+@with_client()
+def test_external_engine_route(client):
+    """engine=external按外部排序归并比较上传的文件，结果与vectorized引擎一致"""
+    response = post(client, engine='external', summary_only='1')
+    assert response.status_code == 200, response.get_json()
+    assert counts(response) == counts(post(client, engine='vectorized', summary_only='1')) == (1, 1, 1)
+
+
+@with_client()
+def test_parallel_engine_route(client):
+    """engine=parallel按哈希分区多进程比较，结果与vectorized引擎一致"""
+    response = post(client, engine='parallel', summary_only='1')
+    assert response.status_code == 200, response.get_json()
+    assert counts(response) == counts(post(client, engine='vectorized', summary_only='1')) == (1, 1, 1)
+
+
+@with_client()
+def test_digest_engine_route(client):
+    """engine=digest按分桶摘要下钻比较，结果与vectorized引擎一致"""
+    response = post(client, engine='digest', summary_only='1')
+    assert response.status_code == 200, response.get_json()
+    assert counts(response) == counts(post(client, engine='vectorized', summary_only='1')) == (1, 1, 1)
+
+
+def test_parallel_engine_reuses_pool():
+    """进程池在各次比较之间复用，工作进程返回的行位置合并后与vectorized引擎的结果一致"""
+    source_df, target_df = make_frames(rows=2000, seed=12)
+    baseline = COMPARE_ENGINES['vectorized'](source_df, target_df, FIELD_MAPPING, ['id'])
+    original = parallel_compare.MIN_PARALLEL_ROWS
+    parallel_compare.MIN_PARALLEL_ROWS = 0
+    try:
+        first = compare_dataframes_parallel(source_df, target_df, FIELD_MAPPING, ['id'], max_workers=2)
+        executor = parallel_compare.get_executor(2)
+        second = compare_dataframes_parallel(source_df, target_df, FIELD_MAPPING, ['id'], max_workers=2)
+        assert parallel_compare.get_executor(2) is executor
+    finally:
+        parallel_compare.MIN_PARALLEL_ROWS = original
+        parallel_compare.shutdown_executor()
+    for actual in (first, second):
+        assert isinstance(actual, CompareResult)
+        assert_same_result(baseline, actual)
+        for section in ('data_loss', 'target_only', 'value_diff', 'duplicate_keys'):
+            assert [item['key'] for item in actual[section]] == [item['key'] for item in baseline[section]]
+
+
+def test_external_engine_memory_budget():
+    """外存引擎不能在内存预算内完成时抛出MemoryBudgetExceeded：同一关键字段的行太多，或差异记录超出预算"""
+    source_df, target_df = make_frames(rows=3000, seed=4)
+    with tempfile.TemporaryDirectory() as work_dir:
+        source_path = os.path.join(work_dir, 'source.csv')
+        target_path = os.path.join(work_dir, 'target.csv')
+        source_df.assign(id=1).to_csv(source_path, index=False)
+        target_df.assign(user_id=1).to_csv(target_path, index=False)
+        with pytest.raises(MemoryBudgetExceeded, match='share the same key values'):
+            compare_csv_files_external(source_path, target_path, FIELD_MAPPING, ['id'],
+                                       memory_budget_mb=0.2, work_dir=work_dir)
+
+        source_df.to_csv(source_path, index=False)
+        target_df.assign(user_id=target_df['user_id'] + len(source_df) * 10).to_csv(target_path, index=False)
+        with pytest.raises(MemoryBudgetExceeded, match='increase memory_budget_mb'):
+            compare_csv_files_external(source_path, target_path, FIELD_MAPPING, ['id'],
+                                       memory_budget_mb=0.3, work_dir=work_dir)
+        assert sorted(os.listdir(work_dir)) == ['source.csv', 'target.csv']
+
+
+@with_client()
+def test_external_engine_memory_budget_route(client):
+    """外存引擎不能在memory_budget_mb内完成比较时返回413"""
+    source = 'id,name,amount\n' + ''.join(f'1,name{i},{i}\n' for i in range(30000))
+    response = post(client, source=source, targets=[('target.csv', source)], engine='external',
+                    memory_budget_mb='1', summary_only='1')
+    body = response.get_json()
+    assert response.status_code == 413 and body['status'] == 'error', (response.status_code, body)
+    assert 'increase memory_budget_mb' in body['message']
+
+
+if __name__ == '__main__':
+    for test in [test_engines_registered, test_sample_files_parity, test_random_frames_parity,
+                 test_composite_key_parity, test_default_mapping_and_key_parity,
+                 test_string_comparison_semantics, test_dictionary_encoded_columns,
+                 test_external_engine_parity, test_parallel_engine_deterministic, test_digest_engine_drill_down,
+                 test_fingerprint_prepass_mixed_types, test_engine_route, test_external_engine_route,
+                 test_parallel_engine_route, test_digest_engine_route, test_parallel_engine_reuses_pool,
+                 test_external_engine_memory_budget, test_external_engine_memory_budget_route]:
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+比较接口测试 - 通过test_client验证 /data/compare 的报告格式协商
+
+with_client、post等辅助函数也供各功能的测试模块测试相应的请求参数
+"""
+import io
+import os
+import tempfile
+import zipfile
+
+import openpyxl
+
+from app_factory import create_app
+from routes.data import compare
+from routes.data.report_export import parquet_available
+
+SOURCE_CSV = """id,name,amount
+1,Alice,10
+2,Bob,20
+3,Carol,30
+"""
+
+TARGET_CSV = """id,name,amount
+2,Bob,25
+3,Carol,30
+4,Dan,40
+"""
+
+# 重复键3在两边各有两行，按amount排序配对时没有差异
+DUPLICATE_SOURCE_CSV = """id,name,amount
+1,Alice,10
+3,Carol,30
+3,Carol,31
+"""
+
+DUPLICATE_TARGET_CSV = """id,name,amount
+1,Alice,10
+3,Carol,31
+3,Carol,30
+"""
+
+# load_mapping_config 的返回值：(字段映射, 关键字段列表, 字段类型, 字段比较规则)
+MAPPING = ({'id': 'id', 'name': 'name', 'amount': 'amount'}, ['id'], {}, {})
+
+
+def with_client(mapping=MAPPING, **config):
+    """用指定的映射配置和临时缓存目录运行测试"""
+    def decorate(test):
+        def run():
+            original = compare.load_mapping_config
+            compare.load_mapping_config = lambda: mapping
+            with tempfile.TemporaryDirectory() as work_dir:
+                app = create_app('testing')
+                app.config.update(RESULT_CACHE_DIR=os.path.join(work_dir, 'results'),
+                                  DATASET_CACHE_DIR=os.path.join(work_dir, 'datasets'),
+                                  INCREMENTAL_SNAPSHOT_DIR=os.path.join(work_dir, 'snapshots'),
+                                  **config)
+                try:
+                    test(app.test_client())
+                finally:
+                    compare.load_mapping_config = original
+        run.__name__ = test.__name__
+        run.__doc__ = test.__doc__
+        return run
+    return decorate
+
+
+def post(client, url='/data/compare', source=SOURCE_CSV, targets=(('target.csv', TARGET_CSV),),
+         headers=None, **form):
+    """上传源表和目标表，其它表单参数按原样提交"""
+    data = {'source_csv': (io.BytesIO(source.encode()), 'source.csv'),
+            'target_csv': [(io.BytesIO(content.encode()), name) for name, content in targets], **form}
+    return client.post(url, data=data, headers=headers or {}, content_type='multipart/form-data')
+
+
+def assert_bad_request(response, text, endpoint='/data/compare'):
+    body = response.get_json()
+    assert response.status_code == 400, (response.status_code, body)
+    assert body['status'] == 'error' and body['endpoint'] == endpoint
+    assert text in body['message'], body['message']
+
+
+def counts(response):
+    data = response.get_json()['data']
+    return (data['data_loss_count'], data['target_only_count'], data['value_diff_count'])
+
+
+@with_client()
+def test_report_format(client):
+    """format参数优先于Accept请求头；默认为xlsx；Accept不可接受时返回406，未知格式返回400"""
+    response = post(client)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    assert 'Accept' in response.headers['Vary']
+    workbook = openpyxl.load_workbook(io.BytesIO(response.data), read_only=True)
+    assert {'Summary', 'Data_Loss', 'Target_Only', 'Value_Differences'} <= set(workbook.sheetnames)
+    workbook.close()
+
+    export_formats = [('csv', '.csv.gz'), ('ndjson', '.ndjson.gz')]
+    if parquet_available():
+        export_formats.append(('parquet', '.parquet'))
+    for report_format, suffix in export_formats:
+        response = post(client, format=report_format.upper())
+        assert response.status_code == 200 and response.mimetype == 'application/zip', report_format
+        assert f'csv_comparison_{report_format}_' in response.headers['Content-Disposition']
+        with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+            assert archive.namelist() == [f'Data_Loss{suffix}', f'Target_Only{suffix}',
+                                          f'Value_Differences{suffix}', 'summary.json']
+
+    # Accept只在xlsx和zip之间协商，响应的Content-Type与协商结果一致
+    negotiated = post(client, headers={'Accept': 'application/zip, */*;q=0.1'})
+    assert negotiated.mimetype == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(negotiated.data)) as archive:
+        assert 'Value_Differences.csv.gz' in archive.namelist()
+    preferred = post(client, format='ndjson', headers={'Accept': 'application/zip'})
+    with zipfile.ZipFile(io.BytesIO(preferred.data)) as archive:
+        assert 'Value_Differences.ndjson.gz' in archive.namelist()
+    not_acceptable = post(client, headers={'Accept': 'text/csv'})
+    assert not_acceptable.status_code == 406 and 'format parameter' in not_acceptable.get_json()['message']
+
+    assert_bad_request(post(client, format='xml'), 'Unknown format: xml')
+
+
+if __name__ == '__main__':
+    for test in [test_report_format]:
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+字段比较规则测试 - 验证mapping.csv中compare列的规则解析和按列比较
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from routes.data.compare import compare_dataframes, COMPARE_ENGINES
+from routes.data.compare_rules import FieldComparator, compile_compare_rules
+from routes.data.external_compare import compare_csv_files_external
+from routes.data.vectorized_compare import column_diff_mask
+from test_compare_engines import assert_same_result
+from test_compare_routes import with_client, post, assert_bad_request, counts, SOURCE_CSV
+
+
+def differs(spec, source, target):
+    return list(column_diff_mask(pd.Series(source), pd.Series(target), FieldComparator('f', spec)))
+
+
+def test_parse_and_validate():
+    """规则解析：未知规则、非法容差、非法正则、日期与数值容差混用均报错"""
+    comparator = FieldComparator('f', ' ABS:0.5 ; rel:0.01;icase ; regex:a;b=>x')
+    assert comparator.abs_tolerance == 0.5 and comparator.rel_tolerance == 0.01
+    assert [name for name, _, _ in comparator.normalizers] == ['icase', 'regex']
+    assert comparator.normalizers[1][1].pattern == 'a;b'
+    for spec in ('fuzzy', 'abs:-1', 'rel:x', 'regex:(', 'date:', 'date:%Y;abs:1'):
+        with pytest.raises(ValueError):
+            FieldComparator('f', spec)
+    assert compile_compare_rules({'a': ' ; ', 'b': 'trim'}).keys() == {'b'}
+
+
+def test_numeric_tolerance():
+    """绝对/相对容差，边界值视为相同；无法解析为数值的值按字符串比较"""
+    assert differs('abs:0', [50000, 1], ['50000.0', '2']) == [False, True]
+    assert differs('abs:0.01', [100.0, 100.0, 'n/a'], [100.01, 100.02, 'n/a']) == [False, True, False]
+    assert differs('rel:0.01', [1000, 1000, 0], [1010, 1011, 0]) == [False, True, False]
+    assert differs('abs:5;rel:0.01', [10, 1000], [14, 1011]) == [False, True]
+    assert differs('abs:0', [1, None, None], [1, 2, None]) == [False, True, False]
+
+
+def test_date_rules():
+    """按固定格式解析日期，两边可以使用不同格式，已解析的日期列直接比较"""
+    assert differs('date:%Y-%m-%d', ['2024-01-05', '2024-01-05'], ['2024-01-05', '2024-01-06']) == [False, True]
+    assert differs('date:%Y-%m-%d|%d/%m/%Y', ['2024-01-05', '2024-01-05', 'bad'],
+                   ['05/01/2024', '01/05/2024', 'bad']) == [False, True, False]
+    assert differs('date:%d/%m/%Y', pd.to_datetime(['2024-01-05']), ['05/01/2024']) == [False]
+
+
+def test_string_rules():
+    """忽略大小写、空白和正则替换；编码路径与逐个字符串路径结果一致"""
+    assert differs('icase', ['Boston', 'NY'], ['BOSTON', 'LA']) == [False, True]
+    assert differs('trim', [' New  York ', 'a b'], ['New York', 'ab']) == [False, True]
+    assert differs('regex:[^0-9]', ['(555) 123-4567', '555'], ['5551234567', '556']) == [False, True]
+    assert differs('regex:^0+=>', ['007', '7'], [7, 8]) == [False, True]
+    assert differs('icase;trim', [1.5, 'X '], ['1.5', 'x']) == [False, False]
+
+
+def make_rule_frames(rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    source_df = pd.DataFrame({'id': np.arange(rows), 'amount': rng.integers(0, 1000, rows) / 100,
+                              'city': rng.choice(['Boston', 'New York', 'Chicago'], rows),
+                              'day': pd.date_range('2024-01-01', periods=rows, freq='h').strftime('%Y-%m-%d')})
+    target_df = pd.DataFrame({'key': source_df['id'],
+                              'total': source_df['amount'] + rng.choice([0, 0.001, 0.5], rows),
+                              'town': source_df['city'].str.upper().where(rng.random(rows) < 0.9, 'Paris'),
+                              'date': pd.to_datetime(source_df['day']).dt.strftime('%d/%m/%Y')})
+    return source_df, target_df
+
+
+RULE_MAPPING = {'id': 'key', 'amount': 'total', 'city': 'town', 'day': 'date'}
+RULES = {'amount': 'abs:0.01', 'city': 'icase', 'day': 'date:%Y-%m-%d|%d/%m/%Y'}
+
+
+def test_engines_apply_rules():
+    """所有支持规则的引擎结果一致；只有超出容差或真正不同的值计为差异"""
+    source_df, target_df = make_rule_frames()
+    expected = COMPARE_ENGINES['vectorized'](source_df, target_df, RULE_MAPPING, ['id'], compare_rules=RULES)
+    counts = {field: 0 for field in RULES}
+    for item in expected['value_diff']:
+        for field in item['differences']:
+            counts[field] += 1
+    assert counts['day'] == 0
+    assert counts['amount'] == int((np.abs(target_df['total'] - source_df['amount']) > 0.01).sum())
+    assert counts['city'] == int((target_df['town'] == 'Paris').sum())
+
+    for name in ('parallel', 'digest'):
+        assert_same_result(expected, COMPARE_ENGINES[name](source_df, target_df, RULE_MAPPING, ['id'],
+                                                           compare_rules=RULES))
+    with tempfile.TemporaryDirectory() as work_dir:
+        source_path = os.path.join(work_dir, 'source.csv')
+        target_path = os.path.join(work_dir, 'target.csv')
+        source_df.to_csv(source_path, index=False)
+        target_df.to_csv(target_path, index=False)
+        actual = compare_csv_files_external(source_path, target_path, RULE_MAPPING, ['id'],
+                                            memory_budget_mb=0.1, work_dir=work_dir, compare_rules=RULES)
+        assert actual['summary']['value_diff_count'] == expected['summary']['value_diff_count']
+
+    with pytest.raises(ValueError):
+        compare_dataframes(source_df, target_df, RULE_MAPPING, ['id'], compare_rules=RULES)
+
+
+@with_client(mapping=({'id': 'id', 'name': 'name', 'amount': 'amount'}, ['id'], {}, {'amount': 'abs:1'}))
+def test_compare_rules_route(client):
+    """mapping.csv的比较规则用于比较；python引擎不支持比较规则，返回400"""
+    assert counts(post(client, summary_only='1')) == (1, 1, 1)
+    within = post(client, source=SOURCE_CSV.replace('2,Bob,20', '2,Bob,24'), summary_only='1')
+    assert counts(within) == (1, 1, 0)
+    assert_bad_request(post(client, engine='python'), 'not supported by the python engine')
+
+
+if __name__ == '__main__':
+    for test in [test_parse_and_validate, test_numeric_tolerance, test_date_rules, test_string_rules,
+                 test_engines_apply_rules, test_compare_rules_route]:
+        test()
+        print(f"✓ {test.__name__}")
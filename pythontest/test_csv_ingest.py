@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+CSV读取测试 - 验证按mapping.csv裁剪列和按字段类型比较
+"""
+import io
+from decimal import Decimal
+
+import pandas as pd
+
+from routes.data.ingest import read_mapped_csv, compare_read_plan, FieldTypeError
+from routes.data.vectorized_compare import compare_dataframes_vectorized
+from test_compare_routes import with_client, post, assert_bad_request, SOURCE_CSV as ROUTE_SOURCE_CSV
+
+SOURCE_CSV = """id,name,amount,created,status,unused
+1,Alice,50000,2024-01-05,active,x
+2,Bob,60000,2024-02-01,active,y
+3,Carol,100,2024-03-01,closed,z
+"""
+
+TARGET_CSV = """user_id,full_name,total,created_at,state,other
+1,Alice,50000.00,2024-01-05,active,p
+2,Bob,60000.5,2024-02-02,active,q
+3,Carol,101,2024-03-01,closed,r
+"""
+
+FIELD_MAPPING = {'id': 'user_id', 'name': 'full_name', 'amount': 'total',
+                 'created': 'created_at', 'status': 'state'}
+
+
+def read_frames(field_types):
+    source_columns, source_types, target_columns, target_types = compare_read_plan(
+        FIELD_MAPPING, ['id'], field_types)
+    source_df = read_mapped_csv(io.StringIO(SOURCE_CSV), source_columns, source_types)
+    target_df = read_mapped_csv(io.StringIO(TARGET_CSV), target_columns, target_types)
+    return source_df, target_df
+
+
+def test_column_pruning():
+    """只读取关键字段和映射字段"""
+    source_df, target_df = read_frames({})
+    assert list(source_df.columns) == ['id', 'name', 'amount', 'created', 'status']
+    assert list(target_df.columns) == ['user_id', 'full_name', 'total', 'created_at', 'state']
+
+
+def test_no_pruning_without_key_fields():
+    """没有关键字段时读取全部列（默认使用第一列作为关键字段）"""
+    source_columns, _, target_columns, _ = compare_read_plan(FIELD_MAPPING, [], {})
+    assert source_columns is None and target_columns is None
+
+
+def test_typed_columns():
+    """字段类型决定读取后的数据类型"""
+    source_df, target_df = read_frames({'id': 'int', 'amount': 'decimal', 'created': 'date',
+                                        'status': 'category'})
+    assert str(source_df['id'].dtype) == 'Int64'
+    assert str(target_df['user_id'].dtype) == 'Int64'
+    assert target_df['total'][0] == Decimal('50000')
+    assert pd.api.types.is_datetime64_any_dtype(target_df['created_at'])
+    assert isinstance(source_df['status'].dtype, pd.CategoricalDtype)
+
+
+def test_untyped_compare_uses_string_form():
+    """未声明类型时整数列与浮点列按字符串形式比较（50000 与 50000.0 不同）"""
+    source_df, target_df = read_frames({})
+    result = compare_dataframes_vectorized(source_df, target_df, FIELD_MAPPING, ['id'])
+    diffs = {item['key']['id']: set(item['differences']) for item in result['value_diff']}
+    assert diffs == {1: {'amount'}, 2: {'amount', 'created'}, 3: {'amount'}}
+
+
+def test_typed_compare():
+    """声明为decimal/date后按值比较，只保留真实差异"""
+    source_df, target_df = read_frames({'id': 'int', 'amount': 'decimal', 'created': 'date',
+                                        'status': 'category'})
+    result = compare_dataframes_vectorized(source_df, target_df, FIELD_MAPPING, ['id'])
+    diffs = {item['key']['id']: set(item['differences']) for item in result['value_diff']}
+    assert diffs == {2: {'amount', 'created'}, 3: {'amount'}}
+    assert result['summary']['matching_records'] == 1
+
+
+def test_invalid_typed_values():
+    """日期格式不统一时逐个值解析；不能解析的日期/decimal值报错，给出字段名和数据行号"""
+    mixed = read_mapped_csv(io.StringIO("id,created\n1,2024-01-05\n2,01/02/2024\n3,\n"),
+                            field_types={'created': 'date'})
+    assert mixed['created'].tolist()[:2] == [pd.Timestamp('2024-01-05'), pd.Timestamp('2024-01-02')]
+    assert mixed['created'].isna().tolist() == [False, False, True]
+
+    for csv, field_type, rows in [("id,value\n1,2024-01-05\n2,abc\n3,2024-13-45\n", 'date', [2, 3]),
+                                  ("id,value\n1,1.50\n2,\n3,1.5x\n", 'decimal', [3])]:
+        try:
+            read_mapped_csv(io.StringIO(csv), field_types={'value': field_type})
+        except FieldTypeError as e:
+            assert (e.column, e.field_type, e.rows) == ('value', field_type, rows)
+            assert "Field 'value'" in str(e) and f'row {rows[-1]}' in str(e)
+        else:
+            raise AssertionError(f'{field_type} parse error not raised')
+
+
+@with_client(mapping=({'id': 'id', 'name': 'name', 'amount': 'amount'}, ['id'], {'amount': 'decimal'}, {}))
+def test_invalid_typed_value_route(client):
+    """声明为decimal的字段有不能解析的值时，两个端点都返回400并给出字段名"""
+    source = ROUTE_SOURCE_CSV.replace('2,Bob,20', '2,Bob,2O')
+    assert_bad_request(post(client, source=source), "Field 'amount' is declared as decimal")
+    assert_bad_request(post(client, '/data/compare/multi', source=source),
+                       "Field 'amount' is declared as decimal", '/data/compare/multi')
+
+
+if __name__ == '__main__':
+    for test in [test_column_pruning, test_no_pruning_without_key_fields, test_typed_columns,
+                 test_untyped_compare_uses_string_form, test_typed_compare, test_invalid_typed_values,
+                 test_invalid_typed_value_route]:
+        test()
+        print(f"✓ {test.__name__}")
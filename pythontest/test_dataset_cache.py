@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+数据集缓存测试 - 验证按内容哈希缓存解析结果及LRU淘汰
+"""
+import io
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from routes.data.dataset_cache import DatasetCache, file_digest
+from test_compare_routes import with_client, post, counts
+
+CSV_CONTENT = b"""id,name,age,city,salary
+1,Alice,30,New York,50000
+2,Bob,25,Los Angeles,45000
+3,Charlie,,Chicago,60000
+"""
+
+
+def test_digest_is_content_based():
+    """相同内容的文件哈希相同，文件对象读取后回到开头"""
+    stream = io.BytesIO(CSV_CONTENT)
+    assert file_digest(stream) == file_digest(io.BytesIO(CSV_CONTENT))
+    assert stream.tell() == 0
+    assert file_digest(io.BytesIO(CSV_CONTENT + b'4,Diana,28,Boston,52000\n')) != file_digest(stream)
+
+
+def test_cache_hit_returns_same_frame():
+    """再次上传相同内容时命中缓存，结果与直接解析一致"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = DatasetCache(cache_dir, max_bytes=10 * 1024 * 1024)
+        first = cache.read_csv(io.BytesIO(CSV_CONTENT))
+        second = cache.read_csv(io.BytesIO(CSV_CONTENT))
+        assert (cache.hits, cache.misses) == (1, 1)
+        pd.testing.assert_frame_equal(first, second, check_dtype=False)
+        pd.testing.assert_frame_equal(second, pd.read_csv(io.BytesIO(CSV_CONTENT)), check_dtype=False)
+
+
+def test_read_options_are_part_of_key():
+    """列裁剪和字段类型不同的读取不会共用缓存条目"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = DatasetCache(cache_dir, max_bytes=10 * 1024 * 1024)
+        full = cache.read_csv(io.BytesIO(CSV_CONTENT))
+        pruned = cache.read_csv(io.BytesIO(CSV_CONTENT), ['id', 'age'], {'age': 'int'})
+        assert cache.misses == 2
+        assert list(full.columns) == ['id', 'name', 'age', 'city', 'salary']
+        assert list(pruned.columns) == ['id', 'age']
+        assert str(pruned['age'].dtype) == 'Int64'
+
+
+def test_lru_eviction():
+    """超过大小上限时淘汰最久未使用的条目"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = DatasetCache(cache_dir, max_bytes=10 * 1024 * 1024)
+        contents = [CSV_CONTENT + f'{i},User{i},20,City,1000\n'.encode() for i in range(10, 13)]
+        for content in contents:
+            cache.read_csv(io.BytesIO(content))
+            time.sleep(0.01)
+        entry_size = cache.stats()['size_bytes'] // 3
+
+        # 访问第一个条目，使第二个条目成为最久未使用
+        cache.read_csv(io.BytesIO(contents[0]))
+        cache.max_bytes = entry_size * 2 + entry_size // 2
+        cache.evict()
+
+        assert len(os.listdir(cache_dir)) == 2
+        cache.read_csv(io.BytesIO(contents[1]))
+        assert cache.misses == 4
+
+
+@with_client(RESULT_CACHE_ENABLED=False)
+def test_compare_uses_dataset_cache(client):
+    """再次上传相同内容的文件时从数据集缓存加载，/data/cache/stats返回数据集缓存的计数"""
+    if not DatasetCache.available():
+        return
+    first = post(client, summary_only='1')
+    second = post(client, summary_only='1')
+    assert counts(first) == counts(second) == (1, 1, 1)
+    stats = client.get('/data/cache/stats').get_json()['data']['dataset_cache']
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 2, 2)
+
+
+if __name__ == '__main__':
+    for test in [test_digest_is_content_based, test_cache_hit_returns_same_frame,
+                 test_read_options_are_part_of_key, test_lru_eviction, test_compare_uses_dataset_cache]:
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+重复键测试 - 验证重复键单独报告，以及按排序字段逐个配对重复键
+"""
+import os
+import tempfile
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+
+from routes.data.compare import compare_dataframes, COMPARE_ENGINES, generate_excel_report
+from routes.data.external_compare import compare_csv_files_external
+from routes.data.key_codes import shared_key_codes, duplicate_key_groups, occurrence_ranks
+from test_compare_engines import assert_same_result
+from test_compare_routes import with_client, post, assert_bad_request, counts, DUPLICATE_SOURCE_CSV, DUPLICATE_TARGET_CSV
+
+FIELD_MAPPING = {'id': 'key', 'seq': 'line', 'amount': 'total'}
+
+
+def make_duplicate_frames():
+    """键1在两边都重复，键2只在源表重复，键4只在目标表中且重复"""
+    source_df = pd.DataFrame({'id': [1, 2, 1, 3, 2, 1], 'seq': [3, 1, 1, 1, 2, 2],
+                              'amount': [30, 10, 10, 5, 20, 20]})
+    target_df = pd.DataFrame({'key': [4, 1, 3, 1, 4], 'line': [1, 1, 1, 2, 2],
+                              'total': [0, 10, 5, 21, 0]})
+    return source_df, target_df
+
+
+def test_duplicate_key_groups():
+    """一次计数找出重复键，按两表中首次出现的位置排列"""
+    source_codes, target_codes, num_keys = shared_key_codes(pd.DataFrame({'k': [5, 6, 5, 7]}),
+                                                            pd.DataFrame({'k': [8, 6, 8, 5]}))
+    first_source, first_target, source_counts, target_counts = duplicate_key_groups(
+        source_codes, target_codes, num_keys)
+    assert list(first_source) == [0, -1]
+    assert list(first_target) == [3, 0]
+    assert list(source_counts) == [2, 0] and list(target_counts) == [1, 2]
+
+    ranks = occurrence_ranks(np.array([0, 1, 0, 0]), pd.DataFrame({'o': [2.0, 1.0, np.nan, 1.0]}))
+    assert list(ranks) == [2, 0, 0, 1]
+
+
+def test_duplicates_reported():
+    """重复键单独报告；默认多对多展开时所有引擎与逐行比较的结果一致"""
+    source_df, target_df = make_duplicate_frames()
+    expected = compare_dataframes(source_df, target_df, FIELD_MAPPING, ['id'])
+    assert [(item['key'], item['source_count'], item['target_count']) for item in expected['duplicate_keys']] == \
+        [({'id': 1}, 3, 2), ({'id': 2}, 2, 0), ({'id': 4}, 0, 2)]
+    assert expected['summary']['duplicate_key_count'] == 3
+    assert expected['summary']['data_loss_count'] == 2
+    assert expected['summary']['matching_records'] + expected['summary']['value_diff_count'] == 7
+
+    for name in ('vectorized', 'parallel', 'digest'):
+        actual = COMPARE_ENGINES[name](source_df, target_df, FIELD_MAPPING, ['id'])
+        assert_same_result(expected, actual)
+        assert list(actual['duplicate_keys']) == expected['duplicate_keys']
+        assert [item['source_data'] for item in actual['value_diff']] == \
+            [item['source_data'] for item in expected['value_diff']]
+
+
+def test_ordered_matching():
+    """按排序字段逐个配对重复键，多出的行成为仅一边存在的记录"""
+    source_df, target_df = make_duplicate_frames()
+    expected = compare_dataframes(source_df, target_df, FIELD_MAPPING, ['id'], duplicate_order=['seq'])
+    summary = expected['summary']
+    assert summary['duplicate_key_count'] == 3
+    assert (summary['data_loss_count'], summary['target_only_count']) == (3, 2)
+    assert summary['matching_records'] == 2 and summary['value_diff_count'] == 1
+    assert [item['source_data']['seq'] for item in expected['data_loss']] == [3, 1, 2]
+    assert expected['value_diff'][0]['differences'].keys() == {'amount'}
+
+    for name in ('vectorized', 'parallel', 'digest'):
+        actual = COMPARE_ENGINES[name](source_df, target_df, FIELD_MAPPING, ['id'], duplicate_order=['seq'])
+        assert_same_result(expected, actual)
+
+    # 空排序字段按原始行顺序配对
+    by_row = COMPARE_ENGINES['vectorized'](source_df, target_df, FIELD_MAPPING, ['id'], duplicate_order=[])
+    assert by_row['summary']['value_diff_count'] == 2
+
+    with pytest.raises(ValueError):
+        COMPARE_ENGINES['vectorized'](source_df, target_df, FIELD_MAPPING, ['id'], duplicate_order=['missing'])
+
+
+def test_random_duplicate_parity():
+    """随机重复键：各引擎与逐行比较的结果一致（两种配对方式）"""
+    rng = np.random.default_rng(3)
+    rows = 400
+    source_df = pd.DataFrame({'id': rng.integers(0, 150, rows), 'seq': rng.integers(0, 4, rows),
+                              'amount': rng.integers(0, 3, rows)})
+    target_df = pd.DataFrame({'key': rng.integers(0, 150, rows), 'line': rng.integers(0, 4, rows),
+                              'total': rng.integers(0, 3, rows)})
+    for duplicate_order in (None, ['seq', 'amount']):
+        expected = compare_dataframes(source_df, target_df, FIELD_MAPPING, ['id'], duplicate_order=duplicate_order)
+        for name in ('vectorized', 'parallel', 'digest'):
+            assert_same_result(expected, COMPARE_ENGINES[name](source_df, target_df, FIELD_MAPPING, ['id'],
+                                                               duplicate_order=duplicate_order))
+        with tempfile.TemporaryDirectory() as work_dir:
+            source_path = os.path.join(work_dir, 'source.csv')
+            target_path = os.path.join(work_dir, 'target.csv')
+            source_df.to_csv(source_path, index=False)
+            target_df.to_csv(target_path, index=False)
+            actual = compare_csv_files_external(source_path, target_path, FIELD_MAPPING, ['id'],
+                                                memory_budget_mb=0.1, work_dir=work_dir,
+                                                duplicate_order=duplicate_order)
+            assert actual['summary'] == expected['summary']
+
+
+def test_duplicate_keys_sheet():
+    """报告中包含重复键工作表，字典结果和列式结果的内容一致"""
+    source_df, target_df = make_duplicate_frames()
+    for name in ('python', 'vectorized'):
+        report = generate_excel_report(COMPARE_ENGINES[name](source_df, target_df, FIELD_MAPPING, ['id']))
+        try:
+            worksheet = openpyxl.load_workbook(report)['Duplicate_Keys']
+            rows = list(worksheet.iter_rows(values_only=True))
+        finally:
+            os.remove(report)
+        assert rows == [('Key_id', 'Source_Count', 'Target_Count'), (1, 3, 2), (2, 2, 0), (4, 0, 2)]
+
+
+@with_client()
+def test_duplicate_match(client):
+    """ordered按duplicate_order排序后逐个配对重复键，all按多对多展开；参数非法时返回400"""
+    def value_diff_count(**form):
+        response = post(client, source=DUPLICATE_SOURCE_CSV,
+                        targets=[('target.csv', DUPLICATE_TARGET_CSV)], summary_only='1', **form)
+        assert response.status_code == 200, response.get_json()
+        return counts(response)[2]
+
+    assert value_diff_count(duplicate_match='ordered', duplicate_order='amount') == 0
+    assert value_diff_count(duplicate_match='ordered') == 2
+    assert value_diff_count(duplicate_match='all') == value_diff_count() == 2
+
+    assert_bad_request(post(client, duplicate_match='first'), 'duplicate_match must be all or ordered')
+    assert_bad_request(post(client, duplicate_match='ordered', duplicate_order='amount, missing'),
+                       "duplicate_order fields must be mapped in mapping.csv: ['missing']")
+    assert_bad_request(post(client, duplicate_match='ordered', engine='multiset'),
+                       'duplicate_match is not supported by the multiset engine')
+
+
+if __name__ == '__main__':
+    for test in [test_duplicate_key_groups, test_duplicates_reported, test_ordered_matching,
+                 test_random_duplicate_parity, test_duplicate_keys_sheet, test_duplicate_match]:
+        test()
+        print(f"✓ {test.__name__}")
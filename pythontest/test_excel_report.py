@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Excel报告写出测试 - 验证流式写出的工作表内容、样式和列宽
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from routes.data.compare import COMPARE_ENGINES, report_sheets
+from routes.data.excel_report import ReportSheet, write_excel_report, column_style_ranges
+from utils.column_widths import frame_column_widths
+
+FIELD_MAPPING = {'id': 'key', 'name': 'label', 'amount': 'value'}
+
+
+def make_result(rows=120, seed=0):
+    rng = np.random.default_rng(seed)
+    source_df = pd.DataFrame({'id': np.arange(rows), 'name': rng.choice(['a', 'bb', None], rows),
+                              'amount': rng.integers(0, 100, rows).astype(float)})
+    target_df = source_df.iloc[10:].rename(columns=FIELD_MAPPING)
+    target_df['value'] = target_df['value'].where(rng.random(len(target_df)) < 0.5, -1.0)
+    return COMPARE_ENGINES['vectorized'](source_df, target_df, FIELD_MAPPING, ['id'])
+
+
+def read_report(sheets):
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'report.xlsx')
+        write_excel_report(path, sheets)
+        return openpyxl.load_workbook(path)
+
+
+def test_streamed_sheets_match_frames():
+    """分段写出的工作表内容与一次生成的数据框一致，空值写出为空单元格"""
+    result = make_result()
+    sheets = report_sheets(result)
+    assert [sheet.name for sheet in sheets] == ['Data_Loss', 'Value_Differences', 'Summary']
+
+    chunked = [ReportSheet.from_renderer('Value_Differences', result.value_diff_frame,
+                                         result['summary']['value_diff_count'], chunk_rows=7)]
+    worksheet = read_report(chunked)['Value_Differences']
+    expected = result.value_diff_frame()
+    rows = list(worksheet.iter_rows(values_only=True))
+    assert list(rows[0]) == list(expected.columns)
+    assert len(rows) == len(expected) + 1
+    for row, (_, values) in zip(rows[1:], expected.iterrows()):
+        assert list(row) == [None if pd.isna(value) else value for value in values]
+
+
+def test_styles_and_widths():
+    """表头和Diff_列使用命名样式，其它数据行按相邻同样式的列区域写条件格式，列宽按最长的值计算"""
+    result = make_result()
+    workbook = read_report(report_sheets(result))
+
+    worksheet = workbook['Value_Differences']
+    header = [cell.value for cell in worksheet[1]]
+    assert [cell.style for cell in worksheet[1]] == ['ValueHeaderStyle'] * len(header)
+    assert worksheet[2][0].style == 'Normal'
+    last_row = result['summary']['value_diff_count'] + 1
+    formats = {str(rule_range.sqref): rule_range.rules[0].dxf for rule_range in worksheet.conditional_formatting}
+    assert list(formats) == [f'A2:A{last_row}', f'B2:C{last_row}', f'D2:E{last_row}']
+    assert formats[f'B2:C{last_row}'].fill.start_color.rgb.endswith('FFF2CC')
+    assert column_style_ranges('Value_Differences', header, 1) == [
+        ('A2:A2', 'KeyStyle'), ('B2:C2', 'SourceStyle'), ('D2:E2', 'TargetStyle')]
+    # Diff_列逐个单元格使用命名样式（条件格式不支持粗边框），空单元格也带样式
+    for row in (2, last_row):
+        for cell in worksheet[row][5:8]:
+            assert cell.style == 'DiffStyle' and cell.font.b and cell.border.left.style == 'thick', cell
+            assert cell.fill.start_color.rgb.endswith('FF6B6B')
+
+    data_loss = workbook['Data_Loss']
+    assert [str(rule_range.sqref) for rule_range in data_loss.conditional_formatting] == ['A2:D11']
+    assert worksheet.column_dimensions['A'].width == len('Key_id') + 2
+    assert workbook['Summary'][1][0].fill.start_color.rgb.endswith('70AD47')
+
+
+def test_frame_column_widths():
+    """列宽按表头和值的字符串长度统计，空值按空单元格计；大表按等间隔样本估计；GUI共用的模块不依赖Flask"""
+    code = 'import sys, utils.column_widths; assert "flask" not in sys.modules'
+    assert subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__))).returncode == 0
+
+    frame = pd.DataFrame({'id': [1, 22, 333], 'text': ['a', None, 'x' * 80], 'flag': [True, False, True]})
+    assert frame_column_widths(frame) == [5, 50, 7]
+    assert frame_column_widths(frame, max_width=None) == [5, 82, 7]
+
+    large = pd.DataFrame({'value': ['y' * 30 if i % 1000 == 0 else 'y' for i in range(100000)]})
+    assert frame_column_widths(large, sample_rows=100) == [32]
+
+
+if __name__ == '__main__':
+    for test in [test_streamed_sheets_match_frames, test_styles_and_widths, test_frame_column_widths]:
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+增量比较测试 - 验证基于快照的增量结果与全量比较一致
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from routes.data.incremental_compare import compare_incremental, SnapshotStore
+from routes.data.vectorized_compare import compare_dataframes_vectorized
+from test_compare_routes import with_client, post, assert_bad_request, counts, SOURCE_CSV
+
+FIELD_MAPPING = {'id': 'user_id', 'amount': 'total', 'status': 'state'}
+
+
+def make_frames(rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    source_df = pd.DataFrame({'id': np.arange(rows), 'amount': rng.integers(0, 5, rows),
+                              'status': rng.choice(['active', 'closed', None], rows)})
+    target_df = pd.DataFrame({'user_id': np.arange(20, rows + 20), 'total': rng.integers(0, 5, rows),
+                              'state': rng.choice(['active', 'closed', None], rows)})
+    return source_df, target_df
+
+
+def incremental_equals_full(source_df, target_df, snapshot, ordered=True, duplicate_order=None):
+    """增量结果与全量比较一致（按repr比较，NaN视为相等）；重复键的记录按首次出现位置排列，此时忽略顺序"""
+    result, snapshot = compare_incremental(source_df, target_df, FIELD_MAPPING, ['id'], snapshot,
+                                           duplicate_order=duplicate_order)
+    changed = result['summary'].pop('incremental_changed_keys', None)
+    expected = compare_dataframes_vectorized(source_df, target_df, FIELD_MAPPING, ['id'],
+                                             duplicate_order=duplicate_order)
+    assert repr(result['summary']) == repr(expected['summary'])
+    for section in ('data_loss', 'target_only', 'value_diff', 'duplicate_keys'):
+        actual_items, expected_items = map(repr, result[section]), map(repr, expected[section])
+        if ordered:
+            assert list(actual_items) == list(expected_items)
+        else:
+            assert sorted(actual_items) == sorted(expected_items)
+    return snapshot, changed
+
+
+def test_first_run_is_full_compare():
+    """没有快照时全量比较"""
+    source_df, target_df = make_frames()
+    _, changed = incremental_equals_full(source_df, target_df, None)
+    assert changed is None
+
+
+def test_updates_only_changed_keys():
+    """修改、新增、删除记录后只重新比较变化的关键字段，结果与全量比较一致"""
+    source_df, target_df = make_frames()
+    snapshot, _ = incremental_equals_full(source_df, target_df, None)
+
+    source_df = source_df.copy()
+    source_df.loc[[3, 4], 'amount'] = 9
+    target_df = target_df.drop(index=[10]).reset_index(drop=True)
+    source_df = pd.concat([source_df, pd.DataFrame({'id': [1000], 'amount': [1], 'status': ['active']})],
+                          ignore_index=True)
+    snapshot, changed = incremental_equals_full(source_df, target_df, snapshot)
+    assert changed == 4
+
+    # 没有变化时不重新比较任何记录
+    _, changed = incremental_equals_full(source_df, target_df, snapshot)
+    assert changed == 0
+
+
+def test_null_and_duplicate_keys():
+    """空值键和重复键的增量结果与全量比较一致"""
+    source_df = pd.DataFrame({'id': [1.0, 2.0, np.nan, 2.0], 'amount': [1, 2, 3, 4], 'status': 'a'})
+    target_df = pd.DataFrame({'user_id': [1.0, np.nan, 2.0], 'total': [1, 5, 2], 'state': 'a'})
+    snapshot, _ = incremental_equals_full(source_df, target_df, None, ordered=False)
+
+    target_df = target_df.assign(total=[1, 3, 4])
+    snapshot, changed = incremental_equals_full(source_df, target_df, snapshot, ordered=False)
+    assert changed == 2
+
+    # 重复键逐个配对时，共同记录数按两边行数的较小值更新
+    snapshot, _ = incremental_equals_full(source_df, target_df, None, ordered=False, duplicate_order=['amount'])
+    target_df = pd.concat([target_df, target_df.tail(1)], ignore_index=True)
+    _, changed = incremental_equals_full(source_df, target_df, snapshot, ordered=False, duplicate_order=['amount'])
+    assert changed == 1
+
+
+def test_duplicate_count_change():
+    """重复键只增加或减少一行相同的数据时也视为变化，结果与全量比较一致"""
+    source_df = pd.DataFrame({'id': [2, 3], 'amount': [1, 0], 'status': 'a'})
+    target_df = pd.DataFrame({'user_id': [5], 'total': [0], 'state': 'a'})
+    snapshot, _ = incremental_equals_full(source_df, target_df, None, ordered=False)
+
+    source_df = pd.DataFrame({'id': [3, 0, 1, 3], 'amount': [0, 0, 1, 0], 'status': 'a'})
+    target_df = pd.DataFrame({'user_id': [2, 2], 'total': [0, 0], 'state': 'a'})
+    snapshot, changed = incremental_equals_full(source_df, target_df, snapshot, ordered=False)
+    assert changed == 5
+
+    # 只删除重复键的一行相同数据
+    source_df = source_df.drop(index=[3]).reset_index(drop=True)
+    _, changed = incremental_equals_full(source_df, target_df, snapshot, ordered=False)
+    assert changed == 1
+
+
+def test_random_changes_match_full_compare():
+    """随机修改、复制和删除行（包含重复键）后，增量结果与全量比较一致"""
+    rng = np.random.default_rng(7)
+    source_df, target_df = make_frames(rows=40, seed=7)
+    source_df['id'] = source_df['id'] % 25
+    target_df['user_id'] = target_df['user_id'] % 30
+    for duplicate_order in (None, ['amount']):
+        snapshot, _ = incremental_equals_full(source_df, target_df, None, ordered=False,
+                                              duplicate_order=duplicate_order)
+        for _ in range(10):
+            source_df = pd.concat([source_df.sample(frac=0.9, random_state=rng),
+                                   source_df.sample(3, random_state=rng)], ignore_index=True)
+            target_df = pd.concat([target_df.sample(frac=0.9, random_state=rng),
+                                   target_df.sample(3, random_state=rng)], ignore_index=True)
+            source_df.loc[rng.integers(0, len(source_df), 2), 'amount'] = rng.integers(0, 5)
+            snapshot, _ = incremental_equals_full(source_df, target_df, snapshot, ordered=False,
+                                                  duplicate_order=duplicate_order)
+
+
+def test_schema_change_rebuilds():
+    """列结构变化时快照不可复用，自动全量比较"""
+    source_df, target_df = make_frames()
+    snapshot, _ = incremental_equals_full(source_df, target_df, None)
+    source_df = source_df.assign(amount=source_df['amount'].astype(float))
+    _, changed = incremental_equals_full(source_df, target_df, snapshot)
+    assert changed is None
+
+
+def test_snapshot_store_roundtrip():
+    """快照保存后可以重新加载，非法名称被拒绝"""
+    source_df, target_df = make_frames(rows=50)
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = SnapshotStore(store_dir)
+        assert store.load('daily') is None
+        _, snapshot = compare_incremental(source_df, target_df, FIELD_MAPPING, ['id'])
+        store.save('daily', snapshot)
+        incremental_equals_full(source_df, target_df, store.load('daily'))
+        assert not SnapshotStore.valid_name('../daily')
+
+
+@with_client()
+def test_baseline(client):
+    """基线比较保存快照，之后的比较结果与全量比较一致；基线名称非法或引擎不支持时返回400"""
+    first = post(client, baseline='nightly', summary_only='1')
+    assert first.status_code == 200 and counts(first) == (1, 1, 1)
+    changed_source = SOURCE_CSV.replace('3,Carol,30', '3,Carol,35')
+    second = post(client, source=changed_source, baseline='nightly', summary_only='1')
+    assert counts(second) == counts(post(client, source=changed_source, summary_only='1')) == (1, 1, 2)
+    assert os.listdir(client.application.config['INCREMENTAL_SNAPSHOT_DIR'])
+
+    assert_bad_request(post(client, baseline='../nightly'), 'baseline must be')
+    assert_bad_request(post(client, baseline='nightly', engine='external'), 'not supported by the external engine')
+    assert_bad_request(post(client, baseline='nightly', engine='multiset'), 'not supported by the multiset engine')
+    for engine in ['python', 'parallel', 'digest']:
+        assert_bad_request(post(client, baseline='nightly', engine=engine), f'not supported by the {engine} engine')
+
+
+@with_client(COMPARE_ENGINE='parallel')
+def test_baseline_default_engine(client):
+    """指定基线且未指定引擎时使用vectorized引擎，不受配置的默认引擎影响"""
+    assert counts(post(client, baseline='nightly', summary_only='1')) == (1, 1, 1)
+    assert counts(post(client, baseline='nightly', engine='vectorized', summary_only='1')) == (1, 1, 1)
+
+
+if __name__ == '__main__':
+    for test in [test_first_run_is_full_compare, test_updates_only_changed_keys,
+                 test_null_and_duplicate_keys, test_duplicate_count_change,
+                 test_random_changes_match_full_compare, test_schema_change_rebuilds, test_snapshot_store_roundtrip,
+                 test_baseline, test_baseline_default_engine]:
+        test()
+        print(f"✓ {test.__name__}")
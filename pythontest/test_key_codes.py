@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+关键字段编码测试 - 验证共享字典编码与按代码连接的结果与pandas merge一致
+"""
+import numpy as np
+import pandas as pd
+
+from routes.data.key_codes import shared_key_codes, group_positions
+from routes.data.vectorized_compare import join_key_positions
+
+
+def merge_positions(source_df, target_df, key_fields):
+    """用pandas merge计算的参考结果"""
+    left = source_df[key_fields].assign(source_pos=np.arange(len(source_df)))
+    right = target_df[key_fields].assign(target_pos=np.arange(len(target_df)))
+    joined = left.merge(right, on=key_fields, how='outer', indicator=True)
+    indicator = joined['_merge'].to_numpy()
+    both = joined[indicator == 'both'].sort_values(['source_pos', 'target_pos'])
+    return (np.sort(joined['source_pos'].to_numpy()[indicator == 'left_only'].astype(np.int64)),
+            both['source_pos'].to_numpy().astype(np.int64),
+            both['target_pos'].to_numpy().astype(np.int64),
+            np.sort(joined['target_pos'].to_numpy()[indicator == 'right_only'].astype(np.int64)))
+
+
+def test_codes_equal_iff_keys_equal():
+    """代码相同当且仅当组合键相同，空值与空值视为相同，数值类型不同但值相同的键相同"""
+    source = pd.DataFrame({'a': [1, 2, 1, None], 'b': ['x', 'y', 'y', None]}, dtype=object)
+    target = pd.DataFrame({'a': [1.0, np.nan, 3.0], 'b': ['y', None, 'x']})
+    source_codes, target_codes, num_keys = shared_key_codes(source, target)
+    assert source_codes.dtype == np.int64
+    assert len(set(source_codes)) == 4
+    assert target_codes[0] == source_codes[2]
+    assert target_codes[1] == source_codes[3]
+    assert target_codes[2] not in set(source_codes)
+    assert max(source_codes.max(), target_codes.max()) < num_keys
+
+
+def test_wide_composite_key_does_not_overflow():
+    """各列基数的乘积超过int64时仍然得到无碰撞的代码"""
+    rows = 60000
+    rng = np.random.default_rng(0)
+    source = pd.DataFrame({f'k{i}': rng.permutation(rows) for i in range(4)})
+    target = source.iloc[::-1].reset_index(drop=True)
+    source_codes, target_codes, num_keys = shared_key_codes(source, target)
+    assert num_keys == rows
+    assert np.array_equal(source_codes[::-1], target_codes)
+
+
+def test_join_matches_merge():
+    """按代码连接的结果（含重复键、空值键和行顺序）与pandas merge一致"""
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        def make(rows):
+            return pd.DataFrame({'a': rng.choice([1.0, 2.0, np.nan], rows),
+                                 'b': rng.choice(['x', 'y', None], rows),
+                                 'c': rng.integers(0, 3, rows)})
+        source_df, target_df = make(rng.integers(0, 40)), make(rng.integers(0, 40))
+        for key_fields in (['a'], ['b'], ['c', 'b'], ['a', 'b', 'c']):
+            expected = merge_positions(source_df, target_df, key_fields)
+            actual = join_key_positions(source_df, target_df, key_fields)
+            for expected_part, actual_part in zip(expected, actual):
+                assert np.array_equal(expected_part, actual_part)
+
+
+def test_group_positions():
+    """按代码分组时同一代码内保持原始行顺序"""
+    order, starts, counts = group_positions(np.array([2, 0, 2, 2, 0]), 4)
+    assert list(counts) == [2, 0, 3, 0]
+    assert list(order[starts[2]:starts[2] + counts[2]]) == [0, 2, 3]
+    assert list(order[starts[0]:starts[0] + counts[0]]) == [1, 4]
+
+
+if __name__ == '__main__':
+    for test in [test_codes_equal_iff_keys_equal, test_wide_composite_key_does_not_overflow,
+                 test_join_matches_merge, test_group_positions]:
+        test()
+        print(f"✓ {test.__name__}")
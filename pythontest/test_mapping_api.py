@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+映射配置接口测试 - 验证保存映射时保留mapping.csv中的字段类型和比较规则
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+from app_factory import create_app
+from routes.data import mapping
+from utils.mapping_file import MAPPING_COLUMNS, read_mapping_file
+
+MAPPING_CSV = """source1,source2,desc,is_key,dtype,compare
+id,user_id,用户id,yes,int,
+name,full_name,用户姓名,no,,icase;trim
+salary,annual_income,用户薪资,no,decimal,abs:0.01
+"""
+
+
+def with_mapping_file(test):
+    """在临时的mapping.csv上运行测试"""
+    def run():
+        original = mapping.MAPPING_FILE
+        with tempfile.TemporaryDirectory() as work_dir:
+            mapping.MAPPING_FILE = os.path.join(work_dir, 'mapping.csv')
+            with open(mapping.MAPPING_FILE, 'w', encoding='utf-8') as f:
+                f.write(MAPPING_CSV)
+            try:
+                test(create_app('testing').test_client())
+            finally:
+                mapping.MAPPING_FILE = original
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+
+@with_mapping_file
+def test_save_keeps_compare_rules(client):
+    """只修改映射和关键字段时，已配置的比较规则和字段类型保持不变，新字段的规则为空"""
+    response = client.put('/api/mapping', json={'field_mapping': {'name': 'display_name', 'city': 'location'},
+                                                'key_fields': ['id']})
+    assert response.status_code == 200
+
+    saved = pd.read_csv(mapping.MAPPING_FILE, dtype=str).fillna('')
+    assert list(saved.columns) == mapping.MAPPING_COLUMNS
+    assert saved.set_index('source1')['compare'].to_dict() == {
+        'id': '', 'name': 'icase;trim', 'salary': 'abs:0.01', 'city': ''}
+    assert saved.set_index('source1')['dtype'].to_dict() == {
+        'id': 'int', 'name': '', 'salary': 'decimal', 'city': ''}
+    assert saved.set_index('source1').loc['name', 'source2'] == 'display_name'
+
+
+@with_mapping_file
+def test_compare_rules_round_trip(client):
+    """接口返回compare列，传入compare_rules时更新对应字段的规则"""
+    client.put('/api/mapping', json={'field_mapping': {}, 'key_fields': ['id'],
+                                     'compare_rules': {'salary': 'rel:0.001'}})
+    field_mapping = client.get('/api/mapping').get_json()['field_mapping']
+    assert field_mapping['salary']['compare'] == 'rel:0.001'
+    assert field_mapping['name']['compare'] == 'icase;trim'
+    assert field_mapping['id']['dtype'] == 'int'
+
+
+def test_read_mapping_file_without_flask():
+    """GUI和接口共用的read_mapping_file不依赖Flask，缺少的可选列补为空字符串，文件不存在时返回空表"""
+    code = 'import sys, utils.mapping_file; assert "flask" not in sys.modules'
+    assert subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__))).returncode == 0
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'mapping.csv')
+        assert list(read_mapping_file(path).columns) == MAPPING_COLUMNS
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('source1,source2,desc,is_key\nid,user_id,,yes\n')
+        df = read_mapping_file(path)
+        assert df.loc[0, 'dtype'] == df.loc[0, 'compare'] == df.loc[0, 'desc'] == ''
+
+
+if __name__ == '__main__':
+    for test in [test_save_keeps_compare_rules, test_compare_rules_round_trip,
+                 test_read_mapping_file_without_flask]:
+        test()
+        print(f"✓ {test.__name__}")
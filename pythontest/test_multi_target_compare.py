@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+一个源表与多个目标表比较测试 - 验证共享源表字典后的结果与逐个比较一致，以及合并报告和zip报告
+"""
+import io
+import os
+import zipfile
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from routes.data.compare import COMPARE_ENGINES, generate_combined_excel_report, generate_report_archive
+from routes.data.key_codes import shared_key_codes, source_key_dictionary, encode_with_source_dictionary
+from routes.data.multi_target_compare import compare_dataframes_multi
+from test_compare_engines import assert_same_result
+from test_compare_routes import (
+    with_client, post, assert_bad_request, SOURCE_CSV, TARGET_CSV, DUPLICATE_SOURCE_CSV, DUPLICATE_TARGET_CSV
+)
+
+FIELD_MAPPING = {'id': 'key', 'region': 'area', 'amount': 'value'}
+
+
+def make_targets(source_df, count=4, seed=0):
+    rng = np.random.default_rng(seed)
+    targets = {}
+    for i in range(count):
+        target_df = source_df.sample(frac=0.9, random_state=i).rename(columns=FIELD_MAPPING)
+        target_df['value'] = target_df['value'].where(rng.random(len(target_df)) < 0.95, -1.0)
+        extra = pd.DataFrame({'key': [10000 + i, 10000 + i], 'area': ['X', 'X'], 'value': [1.0, 2.0]})
+        targets[f'region_{i}'] = pd.concat([target_df, extra], ignore_index=True)
+    return targets
+
+
+def make_source(rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'id': np.arange(rows), 'region': rng.choice(['N', 'S', 'E', 'W'], rows),
+                         'amount': rng.integers(0, 10000, rows) / 100})
+
+
+def test_source_dictionary_codes():
+    """在源表字典上编码的代码与共享字典编码等价（含空值和多列关键字段）"""
+    source_keys = pd.DataFrame({'a': [1, 2, None, 2, 5], 'b': ['x', 'y', 'z', 'y', None]})
+    target_keys = pd.DataFrame({'a': [2, None, 7, 5], 'b': ['y', 'z', 'x', None]})
+    expected = shared_key_codes(source_keys, target_keys)
+    actual = encode_with_source_dictionary(source_key_dictionary(source_keys), target_keys)
+    assert list(pd.factorize(np.concatenate(expected[:2]))[0]) == list(pd.factorize(np.concatenate(actual[:2]))[0])
+
+
+def test_multi_matches_single_compares():
+    """每个目标表的结果与单独调用vectorized引擎相同，包括重复键的逐个配对"""
+    source_df = make_source()
+    target_dfs = make_targets(source_df)
+    results = compare_dataframes_multi(source_df, target_dfs, FIELD_MAPPING, ['id'], max_workers=3)
+    assert list(results) == list(target_dfs)
+    for name, target_df in target_dfs.items():
+        assert_same_result(COMPARE_ENGINES['vectorized'](source_df, target_df, FIELD_MAPPING, ['id']), results[name])
+
+    ordered = compare_dataframes_multi(source_df, target_dfs, FIELD_MAPPING, ['id'], duplicate_order=['amount'])
+    for name, target_df in target_dfs.items():
+        assert_same_result(COMPARE_ENGINES['vectorized'](source_df, target_df, FIELD_MAPPING, ['id'],
+                                                         duplicate_order=['amount']), ordered[name])
+    assert compare_dataframes_multi(source_df, {}, FIELD_MAPPING, ['id']) == {}
+
+
+def test_combined_and_archive_reports():
+    """合并报告中各目标表的记录带有Target列，Summary每个目标表一列；zip中每个目标表一个报告"""
+    source_df = make_source(200)
+    results = compare_dataframes_multi(source_df, make_targets(source_df, count=2), FIELD_MAPPING, ['id'])
+
+    report = generate_combined_excel_report(results)
+    try:
+        workbook = openpyxl.load_workbook(report)
+        target_only = list(workbook['Target_Only'].iter_rows(values_only=True))
+        summary = list(workbook['Summary'].iter_rows(values_only=True))
+    finally:
+        os.remove(report)
+    assert target_only[0][0] == 'Target'
+    assert [row[0] for row in target_only[1:]] == ['region_0', 'region_0', 'region_1', 'region_1']
+    assert summary[0] == ('Metric', 'region_0', 'region_1')
+    assert summary[1] == ('source_total_records', 200, 200)
+
+    archive = generate_report_archive(results)
+    try:
+        with zipfile.ZipFile(archive) as zipped:
+            assert zipped.namelist() == ['region_0.xlsx', 'region_1.xlsx']
+    finally:
+        os.remove(archive)
+
+
+@with_client()
+def test_compare_multi(client):
+    """多目标比较：per_target为每个目标表一个报告的zip，combined为合并的Excel报告，summary_only按目标表返回计数"""
+    targets = [('east.csv', TARGET_CSV), ('west.csv', SOURCE_CSV), ('east.csv', TARGET_CSV)]
+    response = post(client, '/data/compare/multi', targets=targets)
+    assert response.status_code == 200 and response.mimetype == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.namelist() == ['east.xlsx', 'west.xlsx', 'east_2.xlsx']
+
+    combined = post(client, '/data/compare/multi', targets=targets, report='combined')
+    assert combined.status_code == 200 and combined.headers['X-Compare-Cache'] == 'disabled'
+    workbook = openpyxl.load_workbook(io.BytesIO(combined.data), read_only=True)
+    assert 'Value_Differences' in workbook.sheetnames
+    workbook.close()
+
+    summary = post(client, '/data/compare/multi', targets=targets, summary_only='1').get_json()['data']
+    assert set(summary) == {'east', 'west', 'east_2'}
+    assert (summary['east']['data_loss_count'], summary['east']['value_diff_count']) == (1, 1)
+    assert summary['west']['matching_records'] == 3 and summary['west']['value_diff_count'] == 0
+
+    duplicate = post(client, '/data/compare/multi', source=DUPLICATE_SOURCE_CSV,
+                     targets=[('target.csv', DUPLICATE_TARGET_CSV)], summary_only='1',
+                     duplicate_match='ordered', duplicate_order='amount').get_json()['data']
+    assert duplicate['target']['value_diff_count'] == 0
+
+    assert_bad_request(post(client, '/data/compare/multi', report='single'),
+                       'report must be per_target or combined', '/data/compare/multi')
+    assert_bad_request(post(client, '/data/compare/multi', duplicate_match='first'),
+                       'duplicate_match must be all or ordered', '/data/compare/multi')
+    assert_bad_request(post(client, '/data/compare/multi', targets=[]),
+                       'at least one target_csv', '/data/compare/multi')
+
+
+if __name__ == '__main__':
+    for test in [test_source_dictionary_codes, test_multi_matches_single_compares, test_combined_and_archive_reports,
+                 test_compare_multi]:
+        test()
+        print(f"✓ {test.__name__}")
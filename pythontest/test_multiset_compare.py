@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+多重集比较测试 - 验证无关键字段时按整行哈希计数得到的多出行
+"""
+import os
+from collections import Counter
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from routes.data.compare import KEYLESS_COMPARE_ENGINES, generate_excel_report
+from routes.data.multiset_compare import compare_dataframes_multiset, multiset_difference
+
+FIELD_MAPPING = {'account': 'acct', 'amount': 'value', 'memo': 'note'}
+
+
+def reference_excess(source_rows, target_rows):
+    """逐行计数的参考结果：每个取值多出的最后几行"""
+    remaining = Counter(target_rows)
+    seen = Counter()
+    source_total = Counter(source_rows)
+    excess = []
+    for position, row in enumerate(source_rows):
+        seen[row] += 1
+        if seen[row] > remaining[row] and source_total[row] > remaining[row]:
+            excess.append(position)
+    return excess
+
+
+def test_multiset_difference_matches_counter():
+    """按哈希计数做差的结果与逐行计数一致，多出的是每个取值最后出现的几行"""
+    rng = np.random.default_rng(0)
+    for _ in range(30):
+        source = rng.integers(0, 20, rng.integers(0, 60)).astype(np.uint64)
+        target = rng.integers(0, 20, rng.integers(0, 60)).astype(np.uint64)
+        loss, extra = multiset_difference(source, target)
+        assert list(loss) == reference_excess(list(source), list(target))
+        assert list(extra) == reference_excess(list(target), list(source))
+
+    loss, extra = multiset_difference(np.array([7, 7, 7], dtype=np.uint64), np.array([7], dtype=np.uint64))
+    assert list(loss) == [1, 2] and len(extra) == 0
+
+
+def test_keyless_compare():
+    """不使用关键字段：重复行按出现次数比较，类型不同的列按字符串形式比较"""
+    source_df = pd.DataFrame({'account': [1, 1, 2, 3, 3], 'amount': [10.0, 10.0, 5.0, 7.0, 7.0],
+                              'memo': ['a', 'a', 'b', None, None]})
+    target_df = pd.DataFrame({'acct': [3, 1, 2, 2, 4], 'value': [7.0, 10.0, 5.0, 5.0, 1.0],
+                              'note': [None, 'a', 'b', 'b', 'x']})
+    result = compare_dataframes_multiset(source_df, target_df, FIELD_MAPPING)
+    summary = result['summary']
+    assert (summary['data_loss_count'], summary['target_only_count'], summary['matching_records']) == (2, 2, 3)
+    assert summary['key_fields'] == [] and summary['value_diff_count'] == 0
+    assert [(item['source_data']['account'], item['source_data']['amount']) for item in result['data_loss']] == \
+        [(1, 10.0), (3, 7.0)]
+    assert [item['key'] for item in result['target_only']] == [{}, {}]
+    assert [item['target_data']['account'] for item in result['target_only']] == [2, 4]
+
+    as_text = compare_dataframes_multiset(source_df.astype({'account': str}), target_df, FIELD_MAPPING)
+    assert as_text['summary']['matching_records'] == 3
+
+    shuffled = compare_dataframes_multiset(source_df, source_df.sample(frac=1, random_state=1)
+                                           .rename(columns=FIELD_MAPPING), FIELD_MAPPING)
+    assert shuffled['summary']['matching_records'] == len(source_df)
+
+
+def test_keyless_report():
+    """多重集比较的报告没有Key_列，工作表直接从原始数据框生成"""
+    assert KEYLESS_COMPARE_ENGINES['multiset'] is compare_dataframes_multiset
+    source_df = pd.DataFrame({'account': [1, 2], 'amount': [1.0, 2.0], 'memo': ['a', 'b']})
+    target_df = pd.DataFrame({'acct': [1], 'value': [1.0], 'note': ['a']})
+    report = generate_excel_report(compare_dataframes_multiset(source_df, target_df, FIELD_MAPPING))
+    try:
+        rows = list(openpyxl.load_workbook(report)['Data_Loss'].iter_rows(values_only=True))
+    finally:
+        os.remove(report)
+    assert rows[0] == ('Source_account', 'Source_amount', 'Source_memo', 'Reason')
+    assert rows[1][:3] == (2, 2, 'b')
+
+
+if __name__ == '__main__':
+    for test in [test_multiset_difference_matches_counter, test_keyless_compare, test_keyless_report]:
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+按行位置比较测试 - 验证Myers差异得到的插入、删除、修改范围及修改范围内的逐字段比较
+"""
+import difflib
+import os
+import time
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from routes.data.compare import KEYLESS_COMPARE_ENGINES, generate_excel_report
+from routes.data.positional_compare import (compare_dataframes_positional, diff_hunks, myers_edits,
+                                            longest_increasing_subsequence)
+
+FIELD_MAPPING = {'ts': 'time', 'level': 'severity', 'message': 'text'}
+
+
+def edit_cost(edits):
+    return sum((a1 - a0) + (b1 - b0) for a0, a1, b0, b1 in edits)
+
+
+def apply_edits(a, b, edits):
+    """按编辑范围把a变换为b，验证范围之外的行两边相同"""
+    result, position = [], 0
+    for a0, a1, b0, b1 in edits:
+        result.extend(a[position:a0])
+        result.extend(b[b0:b1])
+        position = a1
+    return result + a[position:]
+
+
+def test_myers_edits_are_minimal():
+    """Myers编辑脚本能把源序列变换为目标序列，且编辑距离不大于difflib的结果"""
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        a = rng.integers(0, 4, rng.integers(0, 25)).tolist()
+        b = rng.integers(0, 4, rng.integers(0, 25)).tolist()
+        edits = myers_edits(a, b)
+        assert apply_edits(a, b, edits) == b
+        reference = [(i1, i2, j1, j2) for tag, i1, i2, j1, j2
+                     in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes() if tag != 'equal']
+        assert edit_cost(edits) <= edit_cost(reference)
+
+    # 超过编辑距离上限的小段整体视为修改范围
+    assert myers_edits([1, 2, 3, 4], [5, 6, 7, 8], max_cost=1) == [(0, 4, 0, 4)]
+    assert list(longest_increasing_subsequence([3, 1, 2, 5, 4, 6])) == [1, 2, 4, 5]
+
+
+def test_diff_hunks():
+    """锚点切分后得到的范围：删除、插入、修改，相邻的删除和插入合并；移动的行不作为锚点"""
+    source = np.array([1, 2, 3, 4, 5, 6, 7, 8], dtype=np.uint64)
+    target = np.array([1, 3, 4, 9, 6, 7, 10, 11, 8], dtype=np.uint64)
+    assert diff_hunks(source, target).tolist() == [[1, 2, 1, 1], [4, 5, 3, 4], [7, 7, 6, 8]]
+
+    moved = np.array([5, 1, 2, 3, 4], dtype=np.uint64)
+    assert diff_hunks(source[:5], moved).tolist() == [[0, 0, 0, 1], [4, 5, 5, 5]]
+    assert diff_hunks(source, source).shape == (0, 4)
+    assert diff_hunks(source[:0], source[:3]).tolist() == [[0, 0, 0, 3]]
+
+
+def make_log(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'ts': np.arange(rows), 'level': rng.choice(['INFO', 'WARN', 'ERROR'], rows),
+                         'message': rng.choice(['start', 'stop', 'retry', 'ok'], rows)})
+
+
+def test_positional_compare():
+    """删除的行计为数据丢失、插入的行计为仅目标表存在，修改的行逐字段比较并带有行号"""
+    source_df = make_log(10)
+    target_df = source_df.drop(index=[2]).copy()
+    target_df.loc[5, 'message'] = 'changed'
+    target_df = pd.concat([target_df.iloc[:6], pd.DataFrame({'ts': [100], 'level': ['INFO'], 'message': ['new']}),
+                           target_df.iloc[6:]], ignore_index=True).rename(columns=FIELD_MAPPING)
+
+    result = compare_dataframes_positional(source_df, target_df, FIELD_MAPPING)
+    summary = result['summary']
+    assert KEYLESS_COMPARE_ENGINES['positional'] is compare_dataframes_positional
+    assert (summary['data_loss_count'], summary['target_only_count'], summary['value_diff_count']) == (1, 1, 1)
+    assert summary['matching_records'] == 8 and summary['key_fields'] == ['Row']
+    assert (summary['deleted_hunk_count'], summary['inserted_hunk_count'], summary['changed_hunk_count']) == (1, 1, 1)
+    assert [item['key'] for item in result['data_loss']] == [{'Row': 3}]
+    assert [item['key'] for item in result['target_only']] == [{'Row': 7}]
+    assert [(item['key'], list(item['differences'])) for item in result['value_diff']] == [({'Row': 6}, ['message'])]
+
+    # 类型不同但字符串形式相同的值在修改范围内逐字段比较时视为相同
+    as_text = compare_dataframes_positional(source_df.astype({'ts': str}), source_df.rename(columns=FIELD_MAPPING),
+                                            FIELD_MAPPING)
+    assert as_text['summary']['matching_records'] == len(source_df)
+
+    report = generate_excel_report(result)
+    try:
+        workbook = openpyxl.load_workbook(report)
+        assert workbook['Value_Differences']['A1'].value == 'Key_Row'
+        assert workbook['Value_Differences']['A2'].value == 6
+    finally:
+        os.remove(report)
+
+
+def test_large_ordered_files():
+    """百万行、散布少量修改的有序文件在数秒内完成"""
+    rows = 1000000
+    source_df = make_log(rows)
+    rng = np.random.default_rng(1)
+    target_df = source_df.drop(index=rng.choice(rows, 100, replace=False)).copy()
+    changed = rng.choice(target_df.index.to_numpy(), 100, replace=False)
+    target_df.loc[changed, 'message'] = 'changed'
+    target_df = target_df.rename(columns=FIELD_MAPPING)
+
+    start = time.time()
+    summary = compare_dataframes_positional(source_df, target_df, FIELD_MAPPING)['summary']
+    elapsed = time.time() - start
+    assert (summary['data_loss_count'], summary['value_diff_count'], summary['target_only_count']) == (100, 100, 0)
+    assert elapsed < 30, elapsed
+
+
+if __name__ == '__main__':
+    for test in [test_myers_edits_are_minimal, test_diff_hunks, test_positional_compare, test_large_ordered_files]:
+        test()
+        print(f"✓ {test.__name__}")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+抽样预览测试 - 验证按关键字段哈希抽样的可复现性和差异率估计
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+from routes.data import preview_compare
+from routes.data.preview_compare import (
+    preview_compare_csv, sample_csv, key_sample_mask, wilson_interval
+)
+from test_compare_routes import with_client, post, assert_bad_request
+
+FIELD_MAPPING = {'id': 'user_id', 'amount': 'total', 'status': 'state'}
+
+
+def make_csv_pair(rows=20000, seed=0):
+    """约2%数据丢失、amount约10%差异、status约5%差异"""
+    rng = np.random.default_rng(seed)
+    source_df = pd.DataFrame({'id': np.arange(rows), 'amount': rng.integers(0, 100, rows),
+                              'status': rng.choice(['active', 'closed'], rows)})
+    target_df = source_df.rename(columns=FIELD_MAPPING)
+    target_df = target_df[rng.random(rows) >= 0.02].copy()
+    target_df.loc[rng.random(len(target_df)) < 0.10, 'total'] = -1
+    target_df.loc[rng.random(len(target_df)) < 0.05, 'state'] = 'unknown'
+    return source_df.to_csv(index=False), target_df.to_csv(index=False)
+
+
+def test_sample_is_reproducible_and_aligned():
+    """相同种子抽中相同的键，且两边抽中的是同一批键"""
+    keys = pd.DataFrame({'id': np.arange(10000)})
+    mask = key_sample_mask(keys, 0.1, seed=3)
+    assert (mask == key_sample_mask(keys, 0.1, seed=3)).all()
+    assert (mask != key_sample_mask(keys, 0.1, seed=4)).any()
+    assert 800 < mask.sum() < 1200
+    # 浮点形式的相同键同样被抽中
+    assert (mask == key_sample_mask(keys.astype(float), 0.1, seed=3)).all()
+
+
+def test_sample_csv_counts_all_rows():
+    """分块读取时统计总行数，只保留抽中的行"""
+    source_csv, _ = make_csv_pair(rows=5000)
+    sample, total = sample_csv(io.StringIO(source_csv), ['id'], 0.2, seed=0, chunksize=700)
+    assert total == 5000
+    assert len(sample) == key_sample_mask(pd.DataFrame({'id': np.arange(5000)}), 0.2, 0).sum()
+
+
+def test_mixed_key_types_across_chunks():
+    """关键字段在部分数据块中含字母时，两边仍抽中同一批键；整个文件都是数字时关键字段仍为数值"""
+    ids = [str(i) for i in range(2999)]
+    source_csv = 'id,amount\n' + ''.join(f'{i},1\n' for i in ids + ['A1'])
+    target_csv = 'user_id,total\n' + ''.join(f'{i},1\n' for i in ['A1'] + ids)
+    for sample_rate in (1.0, 0.3):
+        source, source_total = sample_csv(io.StringIO(source_csv), ['id'], sample_rate, seed=1, chunksize=1000)
+        target, target_total = sample_csv(io.StringIO(target_csv), ['user_id'], sample_rate, seed=1, chunksize=1000)
+        assert source_total == target_total == 3000
+        assert set(source['id']) == set(target['user_id'])
+        assert source['id'].dtype == target['user_id'].dtype
+    assert 600 < len(source) < 1200
+
+    numeric, _ = sample_csv(io.StringIO('id\n' + '\n'.join(ids) + '\n7.0\n'), ['id'], 1.0, seed=1, chunksize=1000)
+    assert pd.api.types.is_numeric_dtype(numeric['id']) and numeric['id'].iloc[-1] == 7
+
+    # 与全量比较一致：没有数据丢失
+    original, preview_compare.PREVIEW_CHUNK_ROWS = preview_compare.PREVIEW_CHUNK_ROWS, 1000
+    try:
+        preview = preview_compare_csv(io.StringIO(source_csv), io.StringIO(target_csv),
+                                      {'id': 'user_id', 'amount': 'total'}, ['id'], sample_rate=1.0)
+    finally:
+        preview_compare.PREVIEW_CHUNK_ROWS = original
+    assert preview['sampled_source_records'] == 3000
+    assert preview['data_loss']['estimated_count'] == preview['target_only']['estimated_count'] == 0
+
+
+def test_estimates_cover_true_rates():
+    """估计的差异率区间覆盖真实比例"""
+    source_csv, target_csv = make_csv_pair()
+    preview = preview_compare_csv(io.StringIO(source_csv), io.StringIO(target_csv), FIELD_MAPPING, ['id'],
+                                  sample_rate=0.2, seed=1)
+    assert preview['source_total_records'] == 20000
+    for estimate, true_rate in [(preview['data_loss'], 0.02), (preview['value_diff'], 0.145),
+                                (preview['columns']['amount'], 0.10), (preview['columns']['status'], 0.05)]:
+        low, high = estimate['rate_interval']
+        assert low <= true_rate <= high, (estimate, true_rate)
+    assert preview['columns']['amount']['target_field'] == 'total'
+
+
+def test_full_sample_matches_exact_counts():
+    """抽样比例为1时估计值等于全量比较的数量"""
+    source_csv, target_csv = make_csv_pair(rows=2000)
+    preview = preview_compare_csv(io.StringIO(source_csv), io.StringIO(target_csv), FIELD_MAPPING, ['id'],
+                                  sample_rate=1.0)
+    target_rows = target_csv.count('\n') - 1
+    assert preview['sampled_source_records'] == 2000
+    assert preview['data_loss']['estimated_count'] == 2000 - target_rows
+    assert preview['target_only']['estimated_count'] == 0
+
+
+def test_wilson_interval():
+    """Wilson区间包含样本比例，样本为空时为[0, 1]"""
+    low, high = wilson_interval(10, 100, 0.95)
+    assert low < 0.1 < high and 0.05 < low and high < 0.18
+    assert wilson_interval(0, 0, 0.95) == (0.0, 1.0)
+    assert wilson_interval(0, 50, 0.95)[0] == 0.0
+
+
+@with_client()
+def test_preview(client):
+    """preview按sample_rate抽样返回差异率估计；sample_rate/seed非法或引擎不支持时返回400"""
+    response = post(client, preview='1', sample_rate='1', seed='3')
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert (data['sample_rate'], data['seed']) == (1.0, 3)
+    assert (data['source_total_records'], data['sampled_source_records']) == (3, 3)
+    assert (data['target_total_records'], data['sampled_target_records']) == (3, 3)
+
+    for sample_rate, seed in [('abc', '0'), ('0.5', 'x')]:
+        assert_bad_request(post(client, preview='1', sample_rate=sample_rate, seed=seed),
+                           'sample_rate must be a number')
+    for sample_rate, seed in [('0', '0'), ('1.5', '0'), ('0.5', '-1')]:
+        assert_bad_request(post(client, preview='1', sample_rate=sample_rate, seed=seed),
+                           'sample_rate must be in (0, 1]')
+    assert_bad_request(post(client, preview='1', engine='positional'), 'not supported by the positional engine')
+
+
+if __name__ == '__main__':
+    for test in [test_sample_is_reproducible_and_aligned, test_sample_csv_counts_all_rows,
+                 test_mixed_key_types_across_chunks,
+                 test_estimates_cover_true_rates, test_full_sample_matches_exact_counts,
+                 test_wilson_interval, test_preview]:
+        test()
+        print(f"✓ {test.__name__}")
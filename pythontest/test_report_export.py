@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+机器可读报告测试 - 验证CSV.gz/Parquet/NDJSON报告与结果数据一致，以及报告格式的协商
+"""
+import io
+import json
+import os
+import zipfile
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from werkzeug.datastructures import MIMEAccept
+
+from routes.data.compare import COMPARE_ENGINES, generate_export_report
+from routes.data.excel_report import ReportSheet
+from routes.data.report_export import negotiate_report_format, write_export_archive
+
+FIELD_MAPPING = {'id': 'key', 'name': 'label', 'amount': 'value'}
+
+
+def make_result(rows=60, seed=0):
+    rng = np.random.default_rng(seed)
+    source_df = pd.DataFrame({'id': np.arange(rows), 'name': rng.choice(['a', 'b,"c"', None], rows),
+                              'amount': rng.integers(0, 100, rows).astype(float)})
+    target_df = source_df.iloc[10:].rename(columns=FIELD_MAPPING)
+    target_df['value'] = target_df['value'].where(rng.random(len(target_df)) < 0.5, -1.0)
+    return COMPARE_ENGINES['vectorized'](source_df, target_df, FIELD_MAPPING, ['id'])
+
+
+def read_member(archive, name):
+    data = io.BytesIO(archive.read(name))
+    if name.endswith('.csv.gz'):
+        return pd.read_csv(data, compression='gzip')
+    if name.endswith('.parquet'):
+        return pd.read_parquet(data)
+    return pd.read_json(data, lines=True, compression='gzip')
+
+
+def test_export_formats_match_result():
+    """每种格式按段写出的差异集合与结果数据框一致，摘要写入summary.json"""
+    result = make_result()
+    expected = result.value_diff_frame()
+    sheets = [ReportSheet.from_renderer('Value_Differences', result.value_diff_frame,
+                                        result['summary']['value_diff_count'], chunk_rows=7)]
+    for export_format, suffix in [('csv', '.csv.gz'), ('parquet', '.parquet'), ('ndjson', '.ndjson.gz')]:
+        buffer = io.BytesIO()
+        write_export_archive(buffer, sheets, {'value_diff_count': len(expected)}, export_format)
+        with zipfile.ZipFile(buffer) as archive:
+            assert archive.namelist() == [f'Value_Differences{suffix}', 'summary.json']
+            assert json.loads(archive.read('summary.json')) == {'value_diff_count': len(expected)}
+            actual = read_member(archive, f'Value_Differences{suffix}')
+        assert list(actual.columns) == list(expected.columns)
+        assert len(actual) == len(expected)
+        for column in expected.columns:
+            assert [None if pd.isna(value) else value for value in actual[column]] == \
+                [None if pd.isna(value) else value for value in expected[column]], (export_format, column)
+
+
+def test_parquet_schema_from_column_types():
+    """
+    Parquet列类型取自工作表的数据类型而不是第一段：第一段中全为空的整数/布尔差异列、大整数、
+    日期保持原类型，object列（Decimal、数字和字符串混合）按字符串写出；每段只渲染一次
+    """
+    big = 2 ** 60
+    rows = 8
+    source_df = pd.DataFrame({'id': np.arange(rows), 'code': big + np.arange(rows), 'flag': [True] * rows,
+                              'day': pd.date_range('2024-01-01', periods=rows)})
+    # 前4条只有flag不同，后4条只有code不同
+    target_df = source_df.assign(flag=[False] * 4 + [True] * 4, code=source_df['code'] + np.repeat([0, 1], 4))
+    result = COMPARE_ENGINES['vectorized'](source_df, target_df, {c: c for c in source_df.columns}, ['id'])
+    renders = []
+
+    def render(start, stop):
+        renders.append((start, stop))
+        return result.value_diff_frame(start, stop)
+
+    mixed = pd.DataFrame({'amount': [Decimal('1.10'), None, Decimal('2')], 'value': [1, 'x', None]})
+    sheets = [ReportSheet.from_renderer('Value_Differences', render, rows, chunk_rows=4),
+              ReportSheet.from_frame('Mixed', mixed, chunk_rows=2)]
+    renders.clear()
+    buffer = io.BytesIO()
+    write_export_archive(buffer, sheets, {}, 'parquet')
+    assert renders == [(0, 0), (0, 4), (4, 8)]
+
+    with zipfile.ZipFile(buffer) as archive:
+        # 用pyarrow读取：pandas读取含空值的整数列时会转为float64
+        table = pq.read_table(io.BytesIO(archive.read('Value_Differences.parquet')))
+        mixed_actual = pq.read_table(io.BytesIO(archive.read('Mixed.parquet'))).to_pydict()
+    assert str(table.schema.field('Diff_code_Source').type) == 'int64'
+    assert str(table.schema.field('Diff_flag_Target').type) == 'bool'
+    actual = table.to_pydict()
+    assert actual['Diff_code_Source'] == [None] * 4 + [big + i for i in range(4, 8)]
+    assert actual['Diff_code_Target'][4:] == [big + i for i in range(5, 9)]
+    assert actual['Diff_flag_Target'] == [False] * 4 + [None] * 4
+    assert actual['Source_day'] == source_df['day'].tolist()
+    assert mixed_actual == {'amount': ['1.10', None, '2'], 'value': ['1', 'x', None]}
+
+
+def test_generate_export_report():
+    """报告包含每个有记录的差异集合（不含摘要工作表）和summary.json"""
+    result = make_result()
+    report = generate_export_report(result, 'csv')
+    try:
+        with zipfile.ZipFile(report) as archive:
+            assert archive.namelist() == ['Data_Loss.csv.gz', 'Value_Differences.csv.gz', 'summary.json']
+            assert len(read_member(archive, 'Data_Loss.csv.gz')) == result['summary']['data_loss_count']
+            summary = json.loads(archive.read('summary.json'))
+    finally:
+        os.remove(report)
+    assert summary['value_diff_count'] == result['summary']['value_diff_count']
+    assert 'column_mismatch_counts' in summary
+
+
+def test_negotiate_report_format():
+    """format参数优先；Accept头只在xlsx和zip（csv）之间协商，没有Accept头或*/*时为xlsx，都不可接受时为None"""
+    xlsx = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    assert negotiate_report_format('Parquet', MIMEAccept([('text/csv', 1)])) == 'parquet'
+    assert negotiate_report_format(None, MIMEAccept()) == 'xlsx'
+    assert negotiate_report_format(None, MIMEAccept([('*/*', 1)])) == 'xlsx'
+    assert negotiate_report_format(None, MIMEAccept([('application/zip', 1)])) == 'csv'
+    assert negotiate_report_format(None, MIMEAccept([('application/zip', 1), (xlsx, 0.5)])) == 'csv'
+    assert negotiate_report_format(None, MIMEAccept([('application/*', 1)])) == 'xlsx'
+    assert negotiate_report_format(None, MIMEAccept([('text/csv', 1)])) is None
+    assert negotiate_report_format(None, MIMEAccept([('application/x-ndjson', 1)])) is None
+
+if __name__ == '__main__':
+    for test in [test_export_formats_match_result, test_parquet_schema_from_column_types, test_generate_export_report, test_negotiate_report_format]:
+        test()
+        print(f"✓ {test.__name__}")
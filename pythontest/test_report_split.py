@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+报告拆分测试 - 验证超过行数上限的工作表拆分为编号工作表、多个工作簿打包为zip及其索引
+"""
+import io
+import os
+import zipfile
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from routes.data.compare import COMPARE_ENGINES, generate_excel_report, generate_combined_excel_report, report_sheets
+from routes.data.excel_report import plan_report
+from routes.data.multi_target_compare import compare_dataframes_multi
+
+FIELD_MAPPING = {'id': 'key', 'amount': 'value'}
+
+
+def make_result(rows=100, seed=0):
+    rng = np.random.default_rng(seed)
+    source_df = pd.DataFrame({'id': np.arange(rows), 'amount': rng.integers(0, 100, rows).astype(float)})
+    target_df = source_df.iloc[30:].rename(columns=FIELD_MAPPING)
+    target_df['value'] = target_df['value'].where(np.arange(len(target_df)) % 3 > 0, -1.0)
+    return COMPARE_ENGINES['vectorized'](source_df, target_df, FIELD_MAPPING, ['id'])
+
+
+def sheet_rows(worksheet):
+    return list(worksheet.iter_rows(values_only=True))
+
+
+def test_plan_numbered_sheets():
+    """超过每个工作表行数上限时拆分为编号工作表，只有一个工作簿时最前面是Index工作表"""
+    result = make_result()
+    assert [name for name, _ in plan_report(report_sheets(result))] == ['report.xlsx']
+    assert [sheet.name for sheet in plan_report(report_sheets(result))[0][1]] == [
+        'Data_Loss', 'Value_Differences', 'Summary']
+
+    workbooks = plan_report(report_sheets(result), sheet_max_rows=12, workbook_max_rows=1000)
+    assert len(workbooks) == 1
+    sheets = workbooks[0][1]
+    assert [sheet.name for sheet in sheets] == [
+        'Index', 'Data_Loss_1', 'Data_Loss_2', 'Data_Loss_3', 'Value_Differences_1', 'Value_Differences_2',
+        'Summary']
+    index = next(sheets[0].chunks())
+    assert list(index.columns) == ['Sheet', 'Type', 'Records', 'First_Record', 'Last_Record']
+    assert index.loc[index['Sheet'] == 'Data_Loss_3', ['Records', 'First_Record', 'Last_Record']].values.tolist() \
+        == [[6, 25, 30]]
+    assert pd.concat([sheet.render(0, sheet.rows) for sheet in sheets[1:4]], ignore_index=True).equals(
+        result.data_loss_frame())
+
+
+def test_multi_workbook_archive():
+    """数据行超过每个工作簿的上限时写出zip，各工作表依次装入工作簿，index.xlsx列出每个工作表的位置并包含摘要"""
+    result = make_result()
+    report = generate_excel_report(result, sheet_max_rows=12, workbook_max_rows=30)
+    try:
+        assert report.endswith('.zip')
+        with zipfile.ZipFile(report) as archive:
+            assert archive.namelist() == ['index.xlsx', 'report_1.xlsx', 'report_2.xlsx']
+            assert openpyxl.load_workbook(io.BytesIO(archive.read('index.xlsx'))).sheetnames == ['Index', 'Summary']
+            workbooks = {name: openpyxl.load_workbook(io.BytesIO(archive.read(name)))
+                         for name in archive.namelist()}
+    finally:
+        os.remove(report)
+
+    index = sheet_rows(workbooks['index.xlsx']['Index'])
+    assert index[0] == ('File', 'Sheet', 'Type', 'Records', 'First_Record', 'Last_Record')
+    assert [row[:2] for row in index[1:]] == [
+        ('report_1.xlsx', 'Data_Loss_1'), ('report_1.xlsx', 'Data_Loss_2'), ('report_1.xlsx', 'Data_Loss_3'),
+        ('report_2.xlsx', 'Value_Differences_1'), ('report_2.xlsx', 'Value_Differences_2'),
+        ('index.xlsx', 'Summary')]
+
+    rows = []
+    for file_name, sheet_name in [row[:2] for row in index[1:4]]:
+        worksheet = workbooks[file_name][sheet_name]
+        assert worksheet[1][0].style == 'HeaderStyle'
+        rows.extend(sheet_rows(worksheet)[1:])
+    assert rows == [tuple(values) for values in result.data_loss_frame().itertuples(index=False)]
+
+
+def test_combined_sheet_ranges():
+    """合并报告的工作表按行位置跨目标表渲染，拆分后的内容与不拆分时一致"""
+    source_df = pd.DataFrame({'id': np.arange(50), 'amount': np.arange(50, dtype=float)})
+    targets = {f'region_{i}': source_df.iloc[10 * i:].rename(columns=FIELD_MAPPING) for i in range(3)}
+    results = compare_dataframes_multi(source_df, targets, FIELD_MAPPING, ['id'])
+
+    reports = [generate_combined_excel_report(results),
+               generate_combined_excel_report(results, sheet_max_rows=12, workbook_max_rows=1000)]
+    try:
+        whole, split = [openpyxl.load_workbook(report) for report in reports]
+    finally:
+        for report in reports:
+            os.remove(report)
+
+    expected = sheet_rows(whole['Data_Loss'])
+    assert [row[0] for row in expected[1:]] == ['region_1'] * 10 + ['region_2'] * 20
+    assert split.sheetnames == ['Index', 'Data_Loss_1', 'Data_Loss_2', 'Data_Loss_3', 'Summary']
+    rows = [row for name in split.sheetnames[1:4] for row in sheet_rows(split[name])[1:]]
+    assert rows == expected[1:]
+
+
+if __name__ == '__main__':
+    for test in [test_plan_numbered_sheets, test_multi_workbook_archive, test_combined_sheet_ranges]:
+        test()
+        print(f"✓ {test.__name__}")
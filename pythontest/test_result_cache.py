@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+结果缓存测试 - 验证缓存键、命中统计、过期和大小淘汰
+"""
+import os
+import tempfile
+import time
+
+from routes.data.result_cache import ResultCache, bypass_requested
+from test_compare_routes import with_client, post, SOURCE_CSV
+
+
+def write_report(directory, name, size):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    return path
+
+
+def test_key_covers_all_inputs():
+    """任一输入（文件哈希、映射、引擎）变化都会得到不同的缓存键"""
+    base = dict(source='a', target='b', field_mapping={'id': 'user_id'}, key_fields=['id'],
+                field_types={}, engine='vectorized')
+    key = ResultCache.make_key(**base)
+    assert key == ResultCache.make_key(**dict(reversed(list(base.items()))))
+    for name, value in [('source', 'c'), ('field_mapping', {'id': 'uid'}), ('engine', 'python')]:
+        assert ResultCache.make_key(**{**base, name: value}) != key
+
+
+def test_hit_and_miss():
+    """写入后命中并返回缓存中的副本"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache = ResultCache(os.path.join(work_dir, 'cache'), max_bytes=1024, ttl_seconds=60)
+        assert cache.get('k1') is None
+        report = write_report(work_dir, 'report.xlsx', 100)
+        cache.put('k1', report)
+        os.remove(report)
+        path = cache.get('k1')
+        assert path and os.path.getsize(path) == 100
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+        assert stats['hit_rate'] == 0.5
+
+
+def test_ttl_expiry():
+    """过期条目不再命中并被删除"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache = ResultCache(os.path.join(work_dir, 'cache'), max_bytes=1024, ttl_seconds=0)
+        cache.put('k1', write_report(work_dir, 'report.xlsx', 10))
+        time.sleep(0.01)
+        assert cache.get('k1') is None
+        assert cache.stats()['entries'] == 0
+
+
+def test_size_eviction():
+    """超过大小上限时淘汰最久未使用的条目"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache = ResultCache(os.path.join(work_dir, 'cache'), max_bytes=250, ttl_seconds=60)
+        for key in ['k1', 'k2']:
+            cache.put(key, write_report(work_dir, f'{key}.xlsx', 100))
+        # 访问k1，使k2成为最久未使用
+        assert cache.get('k1')
+        cache.put('k3', write_report(work_dir, 'k3.xlsx', 100))
+        assert cache.get('k2') is None
+        assert cache.get('k1') and cache.get('k3')
+        assert cache.stats()['evictions'] == 1
+
+
+def test_entries_survive_restart():
+    """重新创建缓存实例时从目录恢复条目"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache_dir = os.path.join(work_dir, 'cache')
+        ResultCache(cache_dir, max_bytes=1024, ttl_seconds=60).put(
+            'k1', write_report(work_dir, 'report.xlsx', 10))
+        assert ResultCache(cache_dir, max_bytes=1024, ttl_seconds=60).get('k1')
+
+
+def test_bypass_headers():
+    """Cache-Control: no-cache 或 X-Compare-Cache: bypass 跳过缓存"""
+    assert bypass_requested({'Cache-Control': 'no-cache'})
+    assert bypass_requested({'X-Compare-Cache': 'Bypass'})
+    assert not bypass_requested({'Cache-Control': 'max-age=0'})
+    assert not bypass_requested({})
+
+
+@with_client()
+def test_result_cache_header(client):
+    """X-Compare-Cache标明缓存状态：首次miss，相同输入hit，no-cache/bypass跳过缓存，报告格式不同时不命中"""
+    assert post(client).headers['X-Compare-Cache'] == 'miss'
+    hit = post(client)
+    assert hit.headers['X-Compare-Cache'] == 'hit'
+    assert hit.mimetype == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    assert post(client, headers={'X-Compare-Cache': 'bypass'}).headers['X-Compare-Cache'] == 'bypass'
+    assert post(client, headers={'Cache-Control': 'no-cache'}).headers['X-Compare-Cache'] == 'bypass'
+    assert post(client, format='csv').headers['X-Compare-Cache'] == 'miss'
+    assert post(client, format='csv').mimetype == 'application/zip'
+    assert post(client, source=SOURCE_CSV + '5,Eve,50\n').headers['X-Compare-Cache'] == 'miss'
+
+
+@with_client(RESULT_CACHE_ENABLED=False, DATASET_CACHE_ENABLED=False)
+def test_result_cache_disabled(client):
+    """未启用结果缓存时X-Compare-Cache为disabled，统计信息为null"""
+    assert post(client).headers['X-Compare-Cache'] == 'disabled'
+    assert client.get('/data/cache/stats').get_json()['data'] == {'result_cache': None, 'dataset_cache': None}
+
+
+@with_client()
+def test_cache_stats(client):
+    """/data/cache/stats返回结果缓存的命中/未命中/跳过计数"""
+    post(client)
+    post(client)
+    post(client, headers={'X-Compare-Cache': 'bypass'})
+    response = client.get('/data/cache/stats')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['status'] == 'success' and body['endpoint'] == '/data/cache/stats'
+    stats = body['data']['result_cache']
+    assert (stats['hits'], stats['misses'], stats['bypasses']) == (1, 1, 1)
+    assert stats['hit_rate'] == 0.5 and stats['entries'] == 1
+
+
+if __name__ == '__main__':
+    for test in [test_key_covers_all_inputs, test_hit_and_miss, test_ttl_expiry,
+                 test_size_eviction, test_entries_survive_restart, test_bypass_headers,
+                 test_result_cache_header, test_result_cache_disabled, test_cache_stats]:
+        test()
+        print(f"✓ {test.__name__}")
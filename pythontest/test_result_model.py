@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+列式比较结果测试 - 验证与字典结构兼容，以及报告宽表的按需渲染
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from routes.data.compare import (
+    COMPARE_ENGINES, KEYLESS_COMPARE_ENGINES, compare_dataframes, create_data_loss_dataframe,
+    create_target_only_dataframe, create_value_diff_dataframe, generate_excel_report
+)
+from routes.data.external_compare import compare_csv_files_external
+from routes.data.incremental_compare import compare_incremental
+from routes.data.result_model import CompareResult, summarize_result
+from routes.data.vectorized_compare import compare_dataframes_vectorized
+from test_compare_engines import make_frames, assert_same_result, FIELD_MAPPING
+from test_compare_routes import with_client, post, counts
+
+
+def compare_frames(rows=1000, seed=3):
+    source_df, target_df = make_frames(rows=rows, seed=seed)
+    return source_df, target_df, compare_dataframes_vectorized(source_df, target_df, FIELD_MAPPING, ['id'])
+
+
+def test_dict_compatible():
+    """列式结果可按字典访问，内容与原始实现一致"""
+    source_df, target_df, result = compare_frames()
+    assert isinstance(result, CompareResult)
+    assert set(result) == {'data_loss', 'target_only', 'value_diff', 'duplicate_keys', 'summary'}
+    assert_same_result(compare_dataframes(source_df, target_df, FIELD_MAPPING, ['id']), result)
+    assert result.to_dict()['summary'] == result['summary']
+
+
+def test_bit_matrix():
+    """差异矩阵按位压缩保存，字段差异计数与逐条记录一致"""
+    _, _, result = compare_frames()
+    assert result.diff_bits.dtype == np.uint8
+    assert result.diff_bits.shape == (result.summary['value_diff_count'], 1)
+    counts = {field: 0 for field, _ in result.compare_fields}
+    for item in result['value_diff']:
+        for field in item['differences']:
+            counts[field] += 1
+    assert result.column_diff_counts() == counts
+
+
+def test_frames_match_dict_renderers():
+    """直接渲染的宽表与从字典生成的宽表内容一致"""
+    _, _, result = compare_frames()
+    pd.testing.assert_frame_equal(result.data_loss_frame(), create_data_loss_dataframe(result['data_loss']),
+                                  check_dtype=False)
+    pd.testing.assert_frame_equal(result.target_only_frame(),
+                                  create_target_only_dataframe(result['target_only']), check_dtype=False)
+    expected = create_value_diff_dataframe(result['value_diff'])
+    actual = result.value_diff_frame()
+    assert sorted(actual.columns) == sorted(expected.columns)
+    pd.testing.assert_frame_equal(actual[expected.columns], expected, check_dtype=False)
+
+
+def test_chunked_rendering():
+    """分段渲染的各段拼接后与整体渲染一致"""
+    _, _, result = compare_frames()
+    full = result.value_diff_frame()
+    chunks = [result.value_diff_frame(start, start + 64) for start in range(0, len(full), 64)]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), full)
+
+
+def test_diff_columns_keep_integer_values():
+    """Diff_列中的整数和布尔值保持可空的原类型（大整数不经过float64），分段渲染时各段类型一致"""
+    big = 2 ** 60
+    source_df = pd.DataFrame({'id': [1, 2, 3, 4], 'code': [big + 1, big + 2, big + 3, big + 4],
+                              'flag': [True, True, False, False]})
+    target_df = source_df.assign(code=[big + 1, big + 2, big + 3, big + 5], flag=[True, False, False, False])
+    result = compare_dataframes_vectorized(source_df, target_df, {'id': 'id', 'code': 'code', 'flag': 'flag'},
+                                           ['id'])
+    frame = result.value_diff_frame()
+    assert frame['Key_id'].tolist() == [2, 4]
+    assert frame['Diff_code_Source'].isna().tolist() == [True, False]
+    assert (frame['Diff_code_Source'][1], frame['Diff_code_Target'][1]) == (big + 4, big + 5)
+    assert (frame['Diff_flag_Source'][0], frame['Diff_flag_Target'][0]) == (True, False)
+    assert str(frame['Diff_flag_Source'].dtype) == 'boolean'
+    dtypes = {str(result.value_diff_frame(start, start + 1)['Diff_code_Source'].dtype) for start in range(2)}
+    assert dtypes == {str(result.value_diff_frame(0, 0)['Diff_code_Source'].dtype)} == {'Int64'}
+
+
+def test_excel_report_from_columnar_result():
+    """Excel报告可以直接由列式结果生成"""
+    _, _, result = compare_frames(rows=200)
+    report = generate_excel_report(result)
+    sheets = pd.read_excel(report, sheet_name=None)
+    assert len(sheets['Data_Loss']) == result.summary['data_loss_count']
+    assert len(sheets['Target_Only']) == result.summary['target_only_count']
+    assert len(sheets['Value_Differences']) == result.summary['value_diff_count']
+
+
+def test_summary_only_counts():
+    """只统计计数时不生成逐条记录，结果与字典结构的统计一致"""
+    source_df, target_df, result = compare_frames()
+
+    def fail(self):
+        raise AssertionError('records should not be materialized')
+
+    original = CompareResult.iter_value_diff, CompareResult.iter_data_loss, CompareResult.iter_target_only
+    CompareResult.iter_value_diff = CompareResult.iter_data_loss = CompareResult.iter_target_only = fail
+    try:
+        counts = summarize_result(result)
+    finally:
+        CompareResult.iter_value_diff, CompareResult.iter_data_loss, CompareResult.iter_target_only = original
+
+    expected = summarize_result(compare_dataframes(source_df, target_df, FIELD_MAPPING, ['id']))
+    assert counts == expected
+    assert sum(counts['column_mismatch_counts'].values()) >= counts['value_diff_count']
+
+
+@with_client()
+def test_summary_only(client):
+    """summary_only只返回摘要计数（JSON），不生成报告，不经过结果缓存"""
+    response = post(client, summary_only='true')
+    assert response.status_code == 200 and response.is_json
+    assert 'X-Compare-Cache' not in response.headers
+    data = response.get_json()['data']
+    assert counts(response) == (1, 1, 1)
+    assert data['column_mismatch_counts'] == {'name': 0, 'amount': 1}
+    assert client.get('/data/cache/stats').get_json()['data']['result_cache']['misses'] == 0
+
+
+def test_column_mismatch_counts_across_engines():
+    """各引擎的column_mismatch_counts字段相同：字段映射的非关键字段，只在一个表中存在的字段计数为0"""
+    source_df, target_df = make_frames(rows=500, seed=5)
+    target_df = target_df.drop(columns=['location'])
+    expected = summarize_result(compare_dataframes(source_df, target_df, FIELD_MAPPING, ['id']))
+    assert list(expected['column_mismatch_counts']) == ['name', 'age', 'city', 'salary']
+    assert expected['column_mismatch_counts']['city'] == 0
+
+    results = {name: engine(source_df, target_df, FIELD_MAPPING, ['id']) for name, engine in COMPARE_ENGINES.items()}
+    results['incremental'], _ = compare_incremental(source_df, target_df, FIELD_MAPPING, ['id'])
+    with tempfile.TemporaryDirectory() as work_dir:
+        source_path = os.path.join(work_dir, 'source.csv')
+        target_path = os.path.join(work_dir, 'target.csv')
+        source_df.to_csv(source_path, index=False)
+        target_df.to_csv(target_path, index=False)
+        results['external'] = compare_csv_files_external(source_path, target_path, FIELD_MAPPING, ['id'],
+                                                         work_dir=work_dir)
+    for name, result in results.items():
+        assert summarize_result(result) == expected, name
+
+    # 无关键字段的引擎中关键字段也参与比较
+    for name, engine in KEYLESS_COMPARE_ENGINES.items():
+        column_counts = summarize_result(engine(source_df, target_df, FIELD_MAPPING))['column_mismatch_counts']
+        assert list(column_counts) == list(FIELD_MAPPING) and column_counts['city'] == 0, name
+
+
+if __name__ == '__main__':
+    for test in [test_dict_compatible, test_bit_matrix, test_frames_match_dict_renderers,
+                 test_chunked_rendering, test_diff_columns_keep_integer_values,
+                 test_excel_report_from_columnar_result, test_summary_only_counts, test_summary_only,
+                 test_column_mismatch_counts_across_engines]:
+        test()
+        print(f"✓ {test.__name__}")
@@ -4,6 +4,9 @@ import pandas as pd
 import json
 import os
 from pathlib import Path
+from openpyxl.utils import get_column_letter
+from utils.column_widths import frame_column_widths
+from utils.mapping_file import MAPPING_COLUMNS, read_mapping_file
 
 class CSVCompareGUI:
     def __init__(self, root):
@@ -367,6 +370,11 @@ class CSVCompareGUI:
     
     def save_mapping(self):
         try:
+            # 保留mapping.csv中已配置的字段类型和比较规则（dtype、compare列，界面中不编辑）
+            existing = read_mapping_file("mapping.csv")
+            field_types = dict(zip(existing["source1"], existing["dtype"]))
+            compare_rules = dict(zip(existing["source1"], existing["compare"]))
+            
             # 收集映射数据
             mapping_data = []
             for item in self.mapping_tree.get_children():
@@ -376,11 +384,13 @@ class CSVCompareGUI:
                     "source1": values[0],
                     "source2": values[1],
                     "desc": values[2] if len(values) > 2 else "",
-                    "is_key": "yes" if values[0] in key_fields else "no"
+                    "is_key": "yes" if values[0] in key_fields else "no",
+                    "dtype": field_types.get(str(values[0]), ""),
+                    "compare": compare_rules.get(str(values[0]), "")
                 })
             
             # 保存到CSV
-            mapping_df = pd.DataFrame(mapping_data)
+            mapping_df = pd.DataFrame(mapping_data, columns=MAPPING_COLUMNS)
             mapping_df.to_csv("mapping.csv", index=False)
             messagebox.showinfo("成功", "配置已保存到mapping.csv")
         except Exception as e:
@@ -722,18 +732,9 @@ class CSVCompareGUI:
                     green_fill = PatternFill(start_color="C8E6C9", end_color="C8E6C9", fill_type="solid")
                     yellow_fill = PatternFill(start_color="FFF9C4", end_color="FFF9C4", fill_type="solid")
                     
-                    # 设置列宽
-                    for column in worksheet.columns:
-                        max_length = 0
-                        column = list(column)
-                        for cell in column:
-                            try:
-                                if len(str(cell.value)) > max_length:
-                                    max_length = len(str(cell.value))
-                            except:
-                                pass
-                        adjusted_width = (max_length + 2)
-                        worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
+                    # 设置列宽（按数据框的字符串长度统计，与Web报告共用）
+                    for col_idx, width in enumerate(frame_column_widths(df, max_width=None), start=1):
+                        worksheet.column_dimensions[get_column_letter(col_idx)].width = width
                     
                     # 设置标题行样式
                     for cell in worksheet[1]:
@@ -0,0 +1 @@
+# utils package
\ No newline at end of file
@@ -0,0 +1,33 @@
+"""
+按数据统计计算Excel列宽
+
+不依赖Flask，Web报告（routes/data/excel_report.py）和桌面GUI（ttk_gui.py）共用。
+"""
+from typing import List, Optional
+
+import pandas as pd
+
+# 自动列宽的上限
+MAX_COLUMN_WIDTH = 50
+
+# 估计列宽时最多统计的行数
+WIDTH_SAMPLE_ROWS = 10000
+
+
+def frame_column_widths(frame: pd.DataFrame, max_width: Optional[int] = MAX_COLUMN_WIDTH,
+                        sample_rows: int = WIDTH_SAMPLE_ROWS) -> List[float]:
+    """
+    按表头和值的字符串形式的最大长度计算列宽（最大长度 + 2，max_width为None时不设上限）
+
+    超过 sample_rows 行时按等间隔抽取的样本估计；每列一次向量化的字符串长度统计，空值按空单元格计。
+    """
+    if len(frame) > sample_rows:
+        frame = frame.iloc[::-(-len(frame) // sample_rows)]
+    widths = []
+    for i, column in enumerate(frame.columns):
+        values = frame.iloc[:, i]
+        values = values[values.notna()]
+        longest = int(values.astype(str).str.len().max()) if len(values) else 0
+        width = max(len(str(column)), longest) + 2
+        widths.append(width if max_width is None else min(width, max_width))
+    return widths
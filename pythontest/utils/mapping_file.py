@@ -0,0 +1,22 @@
+"""
+mapping.csv文件的读取
+
+不依赖Flask，映射配置接口（routes/data/mapping.py）和桌面GUI（ttk_gui.py）共用。
+"""
+import os
+
+import pandas as pd
+
+# mapping.csv的列：dtype为字段类型，compare为字段比较规则（均可选）
+MAPPING_COLUMNS = ['source1', 'source2', 'desc', 'is_key', 'dtype', 'compare']
+
+
+def read_mapping_file(path: str) -> pd.DataFrame:
+    """读取mapping.csv，缺少的可选列补为空字符串；文件不存在时返回空表"""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=MAPPING_COLUMNS)
+    df = pd.read_csv(path, dtype=str).fillna('')
+    for column in MAPPING_COLUMNS:
+        if column not in df.columns:
+            df[column] = ''
+    return df